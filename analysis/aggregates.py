@@ -0,0 +1,191 @@
+# analysis/aggregates.py
+# Materialized behavior aggregates, kept next to the trace index
+# (analysis/trace_index.py) and updated in the same SQLite transaction that
+# indexes a trace. Dashboards read totals in O(#nodes + #tools) instead of
+# recomputing compute_behavior_metrics over every trace.
+#
+# Windowed figures come from hourly buckets, so a "last 24h" read sums at
+# most 24 rows per key no matter how many traces exist.
+#
+#   python -m analysis.aggregates [show|rebuild|check]
+
+import json
+import sqlite3
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+BUCKET_SECONDS = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS agg_counts (
+    kind TEXT NOT NULL,      -- 'total', 'node' or 'tool'
+    key TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+CREATE TABLE IF NOT EXISTS agg_buckets (
+    bucket_start INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (bucket_start, kind, key)
+);
+CREATE TABLE IF NOT EXISTS agg_contrib (
+    trace_id TEXT PRIMARY KEY,
+    bucket_start INTEGER NOT NULL,
+    counts TEXT NOT NULL     -- what this trace added, so a re-save can undo it
+);
+"""
+
+
+def trace_contribution(meta: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+    """Counts one trace adds, from its header metadata (analysis/trace_codec.trace_meta)."""
+    step_tools = meta["step_tools"]
+    return {
+        "total": {
+            "traces": 1,
+            "steps": meta["step_count"],
+            "tool_calls": sum(t is not None for t in step_tools),
+        },
+        "node": dict(Counter(meta["nodes"])),
+        "tool": dict(Counter(t for t in step_tools if t is not None)),
+    }
+
+
+def _add(conn: sqlite3.Connection, bucket: int, counts: Dict[str, Dict[str, int]], sign: int) -> None:
+    rows = [(kind, key, sign * v) for kind, kv in counts.items() for key, v in kv.items()]
+    conn.executemany(
+        "INSERT INTO agg_counts VALUES (?, ?, ?) "
+        "ON CONFLICT(kind, key) DO UPDATE SET value = value + excluded.value",
+        rows,
+    )
+    conn.executemany(
+        "INSERT INTO agg_buckets VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(bucket_start, kind, key) DO UPDATE SET value = value + excluded.value",
+        [(bucket, kind, key, v) for kind, key, v in rows],
+    )
+
+
+def apply_trace(conn: sqlite3.Connection, trace_id: str, meta: Dict[str, Any], created_at: float) -> None:
+    """
+    Fold one trace into the aggregates. Must run inside the caller's
+    transaction; re-saving a trace id replaces its earlier contribution.
+    """
+    old = conn.execute(
+        "SELECT bucket_start, counts FROM agg_contrib WHERE trace_id = ?", (trace_id,)
+    ).fetchone()
+    if old is not None:
+        _add(conn, old[0], json.loads(old[1]), -1)
+
+    bucket = int(created_at // BUCKET_SECONDS * BUCKET_SECONDS)
+    counts = trace_contribution(meta)
+    _add(conn, bucket, counts, 1)
+    conn.execute(
+        "INSERT OR REPLACE INTO agg_contrib VALUES (?, ?, ?)", (trace_id, bucket, json.dumps(counts))
+    )
+
+
+def _as_metrics(rows) -> Dict[str, Any]:
+    counts: Dict[str, Dict[str, int]] = {"total": {}, "node": {}, "tool": {}}
+    for kind, key, value in rows:
+        if value:
+            counts[kind][key] = value
+    total_steps = counts["total"].get("steps", 0)
+    tool_calls = counts["total"].get("tool_calls", 0)
+    by_value = lambda d: dict(sorted(d.items(), key=lambda kv: -kv[1]))
+    return {
+        "total_traces": counts["total"].get("traces", 0),
+        "total_steps": total_steps,
+        "tool_calls": tool_calls,
+        "tool_usage_rate": tool_calls / total_steps if total_steps else 0,
+        "tool_counts": by_value(counts["tool"]),
+        "node_counts": by_value(counts["node"]),
+    }
+
+
+def read_aggregates(window_seconds: Optional[float] = None, conn: Optional[sqlite3.Connection] = None) -> Dict[str, Any]:
+    """
+    Behavior metrics (same keys as compute_behavior_metrics, plus total_traces)
+    over all traces, or over the last `window_seconds` at hourly granularity.
+    """
+    if conn is None:
+        from analysis.trace_index import _db
+
+        conn = _db()
+    if window_seconds is None:
+        rows = conn.execute("SELECT kind, key, value FROM agg_counts").fetchall()
+    else:
+        since = int((time.time() - window_seconds) // BUCKET_SECONDS * BUCKET_SECONDS)
+        rows = conn.execute(
+            "SELECT kind, key, SUM(value) FROM agg_buckets WHERE bucket_start >= ? GROUP BY kind, key",
+            (since,),
+        ).fetchall()
+    return _as_metrics(rows)
+
+
+def rebuild_aggregates() -> int:
+    """Recompute every aggregate from the indexed traces; returns traces folded in."""
+    from analysis.trace_index import _db, ensure_index, list_traces, trace_meta_for
+
+    ensure_index()
+    handles = list_traces()
+    conn = _db()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM agg_counts")
+        conn.execute("DELETE FROM agg_buckets")
+        conn.execute("DELETE FROM agg_contrib")
+        for h in handles:
+            apply_trace(conn, h.trace_id, trace_meta_for(h), h.created_at)
+    return len(handles)
+
+
+def ensure_aggregates() -> None:
+    """Backfill once for indexes built before the aggregates existed."""
+    from analysis.trace_index import _db, ensure_index, index_version
+
+    ensure_index()
+    folded = _db().execute("SELECT COUNT(*) FROM agg_contrib").fetchone()[0]
+    if folded != index_version()[0]:
+        rebuild_aggregates()
+
+
+def check_aggregates() -> Dict[str, Any]:
+    """
+    Compare the materialized totals with a full recompute over every trace
+    (steps_to_df + compute_behavior_metrics). Returns the mismatching fields;
+    an empty dict means the aggregates are consistent.
+    """
+    from analysis.behavior_analysis import steps_to_df, compute_behavior_metrics
+    from analysis.trace_index import list_traces
+
+    traces = [h.load() for h in list_traces()]
+    expected = compute_behavior_metrics(steps_to_df(traces)) if traces else {
+        "total_steps": 0, "tool_calls": 0, "tool_counts": {}, "node_counts": {},
+    }
+    actual = read_aggregates()
+    mismatches = {}
+    if actual["total_traces"] != len(traces):
+        mismatches["total_traces"] = (actual["total_traces"], len(traces))
+    for key in ("total_steps", "tool_calls", "tool_counts", "node_counts"):
+        exp = expected[key]
+        exp = {k: int(v) for k, v in exp.items()} if isinstance(exp, dict) else int(exp)
+        if actual[key] != exp:
+            mismatches[key] = (actual[key], exp)
+    return mismatches
+
+
+if __name__ == "__main__":
+    import sys
+
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "show"
+    ensure_aggregates()
+    if cmd == "rebuild":
+        print(f"folded {rebuild_aggregates()} traces into the aggregates")
+    elif cmd == "check":
+        mismatches = check_aggregates()
+        print("consistent" if not mismatches else f"MISMATCH: {mismatches}")
+        sys.exit(1 if mismatches else 0)
+    print(json.dumps(read_aggregates(), indent=2))
+    print("last 24h:", json.dumps(read_aggregates(24 * 3600)))
@@ -1,6 +1,11 @@
 # analysis/memory_analysis.py
 
-from typing import Dict, Any, List
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from analysis.memory_diff import Differ
+from backend.memory_delta import replay
 
 def dict_diff(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
     """Return only the keys that changed between before and after."""
@@ -19,18 +24,56 @@ def dict_diff(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
     return diff
 
 
+def has_memory_patches(trace: Dict[str, Any]) -> bool:
+    """True for delta-encoded traces (StepLog.memory_patch), False for full snapshots."""
+    return any(step.get("memory_patch") is not None for step in trace["steps"])
+
+
+def step_memories(trace: Dict[str, Any]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    (memory_before, memory_after) for every step, rebuilt from the patches of
+    delta-encoded traces or read straight from older full-snapshot traces.
+    """
+    if has_memory_patches(trace):
+        patches = [step.get("memory_patch") for step in trace["steps"]]
+        return list(replay(trace.get("memory_base", {}), patches))
+    return [(step.get("memory_before") or {}, step.get("memory_after") or {}) for step in trace["steps"]]
+
+
 def compute_memory_timeline(trace: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
-    For each step, compute memory diff.
+    For each step, compute memory diff (analysis/memory_diff.py format:
+    only the changed keys, nested values and lines or words of long text).
     Returns list of: { step_id, node, diff }
     """
+    differ = Differ()  # one per trace: values shared between steps are hashed once
+    if not has_memory_patches(trace):
+        return [
+            {
+                "step_id": step["step_id"],
+                "node": step["node"],
+                "diff": differ.diff(step["memory_before"] or {}, step["memory_after"] or {}),
+            }
+            for step in trace["steps"]
+        ]
+
+    # delta-encoded: the patch already names the changed keys, only their
+    # values need diffing against the running memory
     timeline = []
+    memory = dict(trace.get("memory_base", {}))
 
     for step in trace["steps"]:
-        before = step["memory_before"]
-        after = step["memory_after"]
-
-        diff = dict_diff(before, after)
+        patch = step.get("memory_patch") or {}
+        diff = {}
+        for key, value in patch.get("changed", {}).items():
+            if key not in memory:
+                diff[key] = {"op": "set", "value": value}
+            elif not differ.same(memory[key], value):
+                diff[key] = differ.diff_value(memory[key], value)
+            memory[key] = value
+        for key in patch.get("removed", []):
+            memory.pop(key, None)
+            diff[key] = {"op": "del"}
 
         timeline.append({
             "step_id": step["step_id"],
@@ -39,3 +82,28 @@ def compute_memory_timeline(trace: Dict[str, Any]) -> List[Dict[str, Any]]:
         })
 
     return timeline
+
+
+def _timeline(trace: Any) -> List[Dict[str, Any]]:
+    # trace handles (analysis/trace_index.py) are loaded in the worker
+    return compute_memory_timeline(trace if isinstance(trace, dict) else trace.load())
+
+
+def compute_memory_timelines(
+    traces: Iterable[Any],
+    workers: Optional[int] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    compute_memory_timeline for many traces (dicts or TraceHandles) in a
+    process pool, in input order. Handles are cheaper to send than trace
+    bodies: each worker reads its own traces.
+    """
+    traces = list(traces)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(traces) < 2:
+        return [_timeline(t) for t in traces]
+    # send handles without any body already loaded in this process
+    traces = [t if isinstance(t, dict) else type(t)(**t.model_dump()) for t in traces]
+    chunksize = max(1, len(traces) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=min(workers, len(traces))) as pool:
+        return list(pool.map(_timeline, traces, chunksize=chunksize))
@@ -0,0 +1,254 @@
+# analysis/memory_diff.py
+# Structural diffs of agent memory for the memory timeline.
+#
+# Values get a 64-bit xxhash fingerprint (of the string itself, or of its
+# canonical JSON), memoized per object for the life of a Differ. Values met
+# again (list items realigned, a subtree compared at several steps) are then
+# compared as two ints instead of walked, and list items are aligned by
+# fingerprint. Values that are the same object are skipped outright, which
+# covers every unchanged key of memories rebuilt from patches, and only
+# changed values are descended into.
+#
+# A diff names only what changed, down to the smallest nested value:
+#   {"op": "set", "value": v}                      new key, or a value replaced
+#   {"op": "del"}                                  key removed
+#   {"op": "dict", "keys": {key: op, ...}}         some keys of a nested dict
+#   {"op": "list", "edits": [...]}                 ["splice", at, n_removed, [items]]
+#                                                  or ["patch", at, op], in order
+#   {"op": "text", "unit": "line"|"word", "edits": [[at, n_removed, "inserted"], ...]}
+# Positions count items, lines or words of the old value, so an edited
+# paragraph in a 10 KB research dump is stored as that paragraph only.
+#
+#   differ = Differ()
+#   diff = differ.diff(memory_before, memory_after)   # {key: op}
+#   assert apply_diff(memory_before, diff) == memory_after
+#   rows = describe_diff(diff, memory_before)         # one row per change, for display
+
+import difflib
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+import xxhash
+
+Memory = Dict[str, Any]
+Op = Dict[str, Any]
+
+TEXT_DIFF_CHARS = 256  # shorter strings are replaced whole
+MEMO_MIN_CHARS = 64  # shorter strings are cheaper to hash again than to look up
+PREVIEW_CHARS = 200
+
+_WORDS = re.compile(r"\s+|\S+")
+
+# strings are hashed as they are, everything else as JSON: the seeds keep "1" and 1 apart
+_SEED_STR, _SEED_JSON = 1, 2
+_JSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+
+def _json(value: Any) -> bytes:
+    try:
+        return orjson.dumps(value, default=str, option=_JSON_OPTIONS)
+    except orjson.JSONEncodeError:  # lone surrogates, ints past 64 bits
+        return repr(value).encode("utf-8", "surrogatepass")
+
+
+class Differ:
+    """
+    Fingerprints and diffs for one pass over a trace. Fingerprints are memoized
+    by object identity, so values must not be mutated while the Differ is in
+    use; the memo holds a reference to each value to keep its id valid.
+    """
+
+    def __init__(self):
+        self._memo: Dict[int, Tuple[int, Any]] = {}
+
+    # ---------- fingerprints ----------
+
+    def fingerprint(self, value: Any) -> int:
+        if isinstance(value, str):
+            if len(value) < MEMO_MIN_CHARS:
+                return xxhash.xxh3_64_intdigest(value.encode("utf-8", "surrogatepass"), _SEED_STR)
+        elif not isinstance(value, (dict, list, tuple)):
+            return xxhash.xxh3_64_intdigest(_json(value), _SEED_JSON)
+        hit = self._memo.get(id(value))
+        if hit is not None:
+            return hit[0]
+        if isinstance(value, str):
+            fp = xxhash.xxh3_64_intdigest(value.encode("utf-8", "surrogatepass"), _SEED_STR)
+        else:
+            # one pass in C over the whole subtree; sorted keys, like dict equality
+            fp = xxhash.xxh3_64_intdigest(_json(value), _SEED_JSON)
+        self._memo[id(value)] = (fp, value)
+        return fp
+
+    def same(self, before: Any, after: Any) -> bool:
+        if before is after:
+            return True
+        a, b = self._memo.get(id(before)), self._memo.get(id(after))
+        if a is not None and b is not None:
+            return a[0] == b[0]
+        # first sight of one side: == stops at the first difference, hashing reads both in full
+        return before == after
+
+    # ---------- diffs ----------
+
+    def diff(self, before: Memory, after: Memory) -> Dict[str, Op]:
+        """{key: op} for every key added, removed or changed between two memories."""
+        ops: Dict[str, Op] = {}
+        for key, value in after.items():
+            if key not in before:
+                ops[key] = {"op": "set", "value": value}
+            elif not self.same(before[key], value):
+                ops[key] = self.diff_value(before[key], value)
+        for key in before:
+            if key not in after:
+                ops[key] = {"op": "del"}
+        return ops
+
+    def diff_value(self, before: Any, after: Any) -> Op:
+        """The op turning `before` into `after` (assumed to differ)."""
+        if isinstance(before, dict) and isinstance(after, dict):
+            return {"op": "dict", "keys": self.diff(before, after)}
+        if isinstance(before, list) and isinstance(after, list):
+            return self._diff_list(before, after)
+        if isinstance(before, str) and isinstance(after, str) and max(len(before), len(after)) >= TEXT_DIFF_CHARS:
+            return _diff_text(before, after) or {"op": "set", "value": after}
+        return {"op": "set", "value": after}
+
+    def _diff_list(self, before: List[Any], after: List[Any]) -> Op:
+        a = [self.fingerprint(item) for item in before]
+        b = [self.fingerprint(item) for item in after]
+        edits: List[list] = []
+        for tag, i1, i2, j1, j2 in _opcodes(a, b):
+            if tag == "replace" and i2 - i1 == j2 - j1:
+                # item for item: nested dicts and long strings get their own diff
+                edits.extend(
+                    ["patch", i1 + k, self.diff_value(before[i1 + k], after[j1 + k])]
+                    for k in range(i2 - i1) if a[i1 + k] != b[j1 + k]
+                )
+            else:
+                edits.append(["splice", i1, i2 - i1, after[j1:j2]])
+        return {"op": "list", "edits": edits}
+
+
+def _opcodes(a: List[Any], b: List[Any]) -> Iterator[Tuple[str, int, int, int, int]]:
+    """difflib opcodes without "equal", after trimming the common head and tail."""
+    head = 0
+    while head < len(a) and head < len(b) and a[head] == b[head]:
+        head += 1
+    tail = 0
+    while tail < len(a) - head and tail < len(b) - head and a[-1 - tail] == b[-1 - tail]:
+        tail += 1
+    matcher = difflib.SequenceMatcher(None, a[head:len(a) - tail], b[head:len(b) - tail])
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal":
+            yield tag, i1 + head, i2 + head, j1 + head, j2 + head
+
+
+def _split(text: str, unit: str) -> List[str]:
+    return text.splitlines(keepends=True) if unit == "line" else _WORDS.findall(text)
+
+
+def _diff_text(before: str, after: str) -> Optional[Op]:
+    """Line edits for multi-line text, word edits otherwise; None when replacing is as small."""
+    unit = "line" if "\n" in before or "\n" in after else "word"
+    a, b = _split(before, unit), _split(after, unit)
+    edits = [[i1, i2 - i1, "".join(b[j1:j2])] for _, i1, i2, j1, j2 in _opcodes(a, b)]
+    if sum(len(e[2]) + 16 for e in edits) >= len(after):
+        return None
+    return {"op": "text", "unit": unit, "edits": edits}
+
+
+# ---------- applying and describing ----------
+
+def apply_op(value: Any, op: Op) -> Any:
+    kind = op["op"]
+    if kind == "set":
+        return op["value"]
+    if kind == "dict":
+        return apply_diff(value, op["keys"])
+    if kind == "list":
+        out: List[Any] = []
+        pos = 0
+        for edit in op["edits"]:
+            out.extend(value[pos:edit[1]])
+            if edit[0] == "splice":
+                out.extend(edit[3])
+                pos = edit[1] + edit[2]
+            else:
+                out.append(apply_op(value[edit[1]], edit[2]))
+                pos = edit[1] + 1
+        out.extend(value[pos:])
+        return out
+    if kind == "text":
+        units = _split(value, op["unit"])
+        parts: List[str] = []
+        pos = 0
+        for at, removed, inserted in op["edits"]:
+            parts.extend(units[pos:at])
+            parts.append(inserted)
+            pos = at + removed
+        parts.extend(units[pos:])
+        return "".join(parts)
+    raise ValueError(f"unknown diff op {kind!r}")
+
+
+def apply_diff(memory: Memory, diff: Dict[str, Op]) -> Memory:
+    """Return a new dict with the diff applied; `memory` is left untouched."""
+    out = dict(memory)
+    for key, op in diff.items():
+        if op["op"] == "del":
+            out.pop(key, None)
+        else:
+            out[key] = apply_op(out.get(key), op)
+    return out
+
+
+def _preview(value: Any) -> str:
+    text = value if isinstance(value, str) else repr(value)
+    return text if len(text) <= PREVIEW_CHARS else text[:PREVIEW_CHARS] + "…"
+
+
+def describe_diff(diff: Dict[str, Op], before: Memory, path: str = "") -> List[Dict[str, Any]]:
+    """
+    One row per change (path, change, removed, added) with short previews;
+    the text a text edit removed is read back from `before`.
+    """
+    rows: List[Dict[str, Any]] = []
+    for key, op in diff.items():
+        rows.extend(_describe(op, before.get(key) if isinstance(before, dict) else None, f"{path}{key}"))
+    return rows
+
+
+def _describe(op: Op, old: Any, path: str) -> List[Dict[str, Any]]:
+    kind = op["op"]
+    if kind == "set":
+        change = "added" if old is None else "changed"
+        return [{"path": path, "change": change, "removed": "" if old is None else _preview(old),
+                 "added": _preview(op["value"])}]
+    if kind == "del":
+        return [{"path": path, "change": "removed", "removed": _preview(old), "added": ""}]
+    if kind == "dict":
+        return describe_diff(op["keys"], old or {}, f"{path}.")
+    if kind == "list":
+        rows = []
+        for edit in op["edits"]:
+            at = edit[1]
+            if edit[0] == "patch":
+                rows.extend(_describe(edit[2], old[at], f"{path}[{at}]"))
+            else:
+                rows.append({"path": f"{path}[{at}:{at + edit[2]}]", "change": "items",
+                             "removed": _preview(old[at:at + edit[2]]) if edit[2] else "",
+                             "added": _preview(edit[3]) if edit[3] else ""})
+        return rows
+    units = _split(old, op["unit"])
+    return [
+        {"path": f"{path} ({op['unit']} {at + 1})", "change": "text",
+         "removed": _preview("".join(units[at:at + removed])), "added": _preview(inserted)}
+        for at, removed, inserted in op["edits"]
+    ]
+
+
+def fingerprint(value: Any) -> int:
+    """One-off fingerprint; use a Differ to reuse fingerprints across calls."""
+    return Differ().fingerprint(value)
@@ -0,0 +1,87 @@
+# analysis/routing_eval.py
+# Replays saved traces through the local search router (backend/router.py) and
+# compares its decisions with what the planning LLM decided in each trace.
+#
+#   python -m analysis.routing_eval --plan-latency 1.5
+
+import argparse
+import time
+from typing import Any, Dict, List, Optional
+
+from analysis.traces_loader import load_traces
+from backend.config import AgentConfig, DEFAULT_CONFIG
+from backend.router import route_query, parse_plan_decision
+
+
+def llm_decision(trace: Dict[str, Any]) -> Optional[bool]:
+    """The planning LLM's SEARCH verdict, or None if the trace has no LLM plan."""
+    plan_step = next((s for s in trace["steps"] if s["node"] == "plan"), None)
+    if plan_step is None or plan_step.get("tool") != "planning tool":
+        return None
+    decision = parse_plan_decision(plan_step["thought"])
+    if decision is None:
+        # no explicit verdict: use what the research node actually did
+        decision = any(s["node"] == "research" and s.get("tool") for s in trace["steps"])
+    return decision
+
+
+def evaluate_router(
+    traces: List[Dict[str, Any]],
+    config: AgentConfig = DEFAULT_CONFIG,
+    plan_latency: float = 1.5,
+    repeats: int = 200,
+) -> Dict[str, Any]:
+    """
+    Agreement of the router with the LLM, coverage (share of queries the router
+    decides alone) and the planning latency those queries would have saved.
+    `plan_latency` is the assumed seconds per planning LLM call.
+    """
+    rows = []
+    for t in traces:
+        expected = llm_decision(t)
+        if expected is None:
+            continue
+        rows.append((t["user_query"], expected, route_query(t["user_query"], config)))
+
+    n = len(rows)
+    confident = [(exp, r) for _, exp, r in rows if r.confident]
+    agree_all = sum(exp == r.search for _, exp, r in rows)
+    agree_confident = sum(exp == r.search for exp, r in confident)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for query, _, _ in rows:
+            route_query(query, config)
+    router_us = (time.perf_counter() - start) / max(1, repeats * n) * 1e6
+
+    return {
+        "traces": n,
+        "coverage": len(confident) / n if n else 0.0,
+        "agreement": agree_all / n if n else 0.0,
+        "agreement_confident": agree_confident / len(confident) if confident else 0.0,
+        "router_us_per_query": router_us,
+        "latency_saved_s": len(confident) * plan_latency - n * router_us / 1e6,
+        "per_query": [
+            {"query": q, "llm_search": exp, "router_search": r.search,
+             "confident": r.confident, "p": round(r.probability, 3)}
+            for q, exp, r in rows
+        ],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the local search router against saved traces.")
+    parser.add_argument("--plan-latency", type=float, default=1.5, help="seconds per planning LLM call")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_CONFIG.enable_search_threshold)
+    parser.add_argument("--margin", type=float, default=DEFAULT_CONFIG.router_margin)
+    args = parser.parse_args()
+
+    config = DEFAULT_CONFIG.model_copy(update={
+        "enable_search_threshold": args.threshold,
+        "router_margin": args.margin,
+    })
+    report = evaluate_router(load_traces(), config, args.plan_latency)
+    for row in report.pop("per_query"):
+        print(row)
+    for k, v in report.items():
+        print(f"{k}: {v:.4g}" if isinstance(v, float) else f"{k}: {v}")
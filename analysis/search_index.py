@@ -0,0 +1,247 @@
+# analysis/search_index.py
+# Full-text search over every trace (SQLite FTS5), kept next to the trace index
+# (analysis/trace_index.py) and updated in the same transaction that indexes a
+# saved trace. One row per step holds the user query, the step's
+# thought, tool input and tool output, and (on the step that produced it) the
+# final answer, so a search can combine fields: "NVDA" in the query and
+# "empty" in a Valyu output match the same row.
+#
+#   hits = search("valyu empty nvda")
+#   hits = search("error* OR fail*", fields=["thought", "tool_output"], trace_id=...)
+#
+#   python -m analysis.search_index "valyu empty" [--field tool_output] [--node research]
+#   python -m analysis.search_index --rebuild
+
+import re
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+FIELDS = ("user_query", "thought", "tool_input", "tool_output", "answer")
+# bm25 column weights, in FIELDS order; tool outputs are long and mostly boilerplate
+WEIGHTS = (2.0, 1.5, 1.0, 0.5, 1.0)
+MAX_FIELD_CHARS = 200_000
+REBUILD_BATCH = 50  # traces per write transaction in rebuild_search_index
+FAILURE_QUERY = "error* OR fail* OR exception*"  # what Error Replay looks for
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS trace_fts USING fts5(
+    user_query, thought, tool_input, tool_output, answer,
+    trace_id UNINDEXED, step_id UNINDEXED, node UNINDEXED, tool UNINDEXED,
+    tokenize = 'porter unicode61'
+);
+CREATE TABLE IF NOT EXISTS trace_fts_docs (
+    trace_id TEXT PRIMARY KEY,
+    first_rowid INTEGER NOT NULL,   -- a trace's steps are contiguous rows in trace_fts
+    last_rowid INTEGER NOT NULL
+);
+"""
+
+
+class SearchHit(BaseModel):
+    trace_id: str
+    step_id: int
+    node: str
+    tool: Optional[str]
+    query: str  # the trace's user query
+    score: float  # bm25, higher is better
+    snippet: str  # best matching field, matches marked «like this»
+    created_at: float
+
+
+def _text(value: Any) -> str:
+    """Every string and number in a (possibly nested) value, one per line."""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return "\n".join(filter(None, (_text(v) for v in value.values())))
+    if isinstance(value, (list, tuple)):
+        return "\n".join(filter(None, (_text(v) for v in value)))
+    return str(value)
+
+
+def _rows(trace_id: str, trace: Dict[str, Any]) -> List[Tuple]:
+    steps = trace.get("steps") or []
+    query = trace.get("user_query") or ""
+    answer = trace.get("final_answer") or ""
+    answer_step = next((s["step_id"] for s in reversed(steps) if s["node"] == "answer"), None)
+    if answer_step is None and steps:
+        answer_step = steps[-1]["step_id"]
+    return [
+        (
+            query,
+            (s.get("thought") or "")[:MAX_FIELD_CHARS],
+            _text(s.get("tool_input"))[:MAX_FIELD_CHARS],
+            _text(s.get("tool_output"))[:MAX_FIELD_CHARS],
+            answer[:MAX_FIELD_CHARS] if s["step_id"] == answer_step else "",
+            trace_id, s["step_id"], s["node"], s.get("tool"),
+        )
+        for s in steps
+    ]
+
+
+def index_text(conn: sqlite3.Connection, trace_id: str, trace: Dict[str, Any]) -> None:
+    """
+    Add one trace's text to the index. Must run inside the caller's
+    transaction; re-saving a trace id replaces its earlier rows.
+    """
+    _write_rows(conn, trace_id, _rows(trace_id, trace))
+
+
+def _write_rows(conn: sqlite3.Connection, trace_id: str, rows: List[Tuple]) -> None:
+    old = conn.execute("SELECT first_rowid, last_rowid FROM trace_fts_docs WHERE trace_id = ?", (trace_id,)).fetchone()
+    if old is not None:
+        conn.execute("DELETE FROM trace_fts WHERE rowid BETWEEN ? AND ?", old)
+        conn.execute("DELETE FROM trace_fts_docs WHERE trace_id = ?", (trace_id,))
+    if not rows:
+        return
+    (first,) = conn.execute("SELECT COALESCE(MAX(rowid), 0) + 1 FROM trace_fts").fetchone()
+    conn.executemany(
+        f"INSERT INTO trace_fts (rowid, {', '.join(FIELDS)}, trace_id, step_id, node, tool) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [(first + i,) + row for i, row in enumerate(rows)],
+    )
+    conn.execute("INSERT INTO trace_fts_docs VALUES (?, ?, ?)", (trace_id, first, first + len(rows) - 1))
+
+
+def match_expression(text: str) -> str:
+    """
+    Plain search text as an FTS5 query: every word must match, a trailing *
+    keeps prefix matching, OR between words is kept. Quoting each word means
+    punctuation in the text cannot break the query syntax.
+    """
+    terms = []
+    for word in re.findall(r"[\w*]+", text):
+        if word == "OR":
+            terms.append("OR")
+            continue
+        stem = word.rstrip("*").replace("*", "")
+        if stem:
+            terms.append(f'"{stem}"' + ("*" if word.endswith("*") else ""))
+    while terms and terms[-1] == "OR":
+        terms.pop()
+    while terms and terms[0] == "OR":
+        terms.pop(0)
+    return " ".join(terms)
+
+
+def search(
+    text: str,
+    fields: Optional[Iterable[str]] = None,
+    node: Optional[str] = None,
+    tool: Optional[str] = None,
+    trace_id: Optional[str] = None,
+    since: Optional[float] = None,
+    limit: int = 50,
+    conn: Optional[sqlite3.Connection] = None,
+) -> List[SearchHit]:
+    """
+    Steps matching `text`, best first. `fields` limits the match to some of
+    FIELDS; node, tool, trace_id and since (created_at) filter the results.
+    """
+    expression = match_expression(text)
+    if not expression:
+        return []
+    fields = list(fields or ())
+    unknown = set(fields) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"unknown search fields {sorted(unknown)}; use {FIELDS}")
+    if fields:
+        expression = f"{{{' '.join(fields)}}} : ({expression})"
+    if conn is None:
+        from analysis.trace_index import _db
+
+        conn = _db()
+
+    where, params = ["trace_fts MATCH ?"], [expression]
+    for column, value in (("f.node", node), ("f.tool", tool), ("f.trace_id", trace_id)):
+        if value is not None:
+            where.append(f"{column} = ?")
+            params.append(value)
+    if since is not None:
+        where.append("t.created_at >= ?")
+        params.append(since)
+    weights = ", ".join(str(w) for w in WEIGHTS)
+    rows = conn.execute(
+        f"SELECT f.trace_id, f.step_id, f.node, f.tool, t.query, -bm25(trace_fts, {weights}), "
+        "snippet(trace_fts, -1, '«', '»', '…', 16), t.created_at "
+        "FROM trace_fts f JOIN traces t ON t.trace_id = f.trace_id "
+        f"WHERE {' AND '.join(where)} ORDER BY bm25(trace_fts, {weights}) LIMIT ?",
+        (*params, limit),
+    ).fetchall()
+    return [
+        SearchHit(trace_id=r[0], step_id=r[1], node=r[2], tool=r[3], query=r[4], score=round(r[5], 6),
+                  snippet=r[6], created_at=r[7])
+        for r in rows
+    ]
+
+
+def rebuild_search_index(missing_only: bool = False) -> int:
+    """
+    Index the text of every indexed trace (or only those not in the search
+    index yet). Traces are read and split into rows outside any transaction
+    and written REBUILD_BATCH at a time, so save_trace (which writes to the
+    same database) only ever waits for one short batch.
+    """
+    from analysis.trace_index import _db, ensure_index, list_traces
+
+    ensure_index()
+    conn = _db()
+    known = {r[0] for r in conn.execute("SELECT trace_id FROM trace_fts_docs")} if missing_only else set()
+    handles = [h for h in list_traces() if h.trace_id not in known]
+    total = len(handles)
+    if not missing_only:
+        # rows are replaced trace by trace below; only traces gone from the index are dropped here
+        indexed = {h.trace_id for h in handles}
+        stale = [r[0] for r in conn.execute("SELECT trace_id FROM trace_fts_docs") if r[0] not in indexed]
+        for start in range(0, len(stale), REBUILD_BATCH):
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for trace_id in stale[start:start + REBUILD_BATCH]:
+                    _write_rows(conn, trace_id, [])
+    while handles:
+        # handles keep their loaded body: drop each batch once it is written
+        batch, handles = handles[:REBUILD_BATCH], handles[REBUILD_BATCH:]
+        rows = [(h.trace_id, _rows(h.trace_id, h.load())) for h in batch]
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for trace_id, trace_rows in rows:
+                _write_rows(conn, trace_id, trace_rows)
+    return total
+
+
+def ensure_search_index() -> None:
+    """Backfill traces indexed before the search index existed."""
+    from analysis.trace_index import _db, ensure_index, index_version
+
+    ensure_index()
+    indexed = _db().execute("SELECT COUNT(*) FROM trace_fts_docs").fetchone()[0]
+    if indexed < index_version()[0]:
+        rebuild_search_index(missing_only=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Search thoughts, tool calls and answers across all traces.")
+    parser.add_argument("text", nargs="?", default=None)
+    parser.add_argument("--field", action="append", choices=FIELDS, help="search only these fields")
+    parser.add_argument("--node", default=None)
+    parser.add_argument("--tool", default=None)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--rebuild", action="store_true", help="re-index the text of every trace")
+    args = parser.parse_args()
+
+    # run as __main__, this file is a second copy of the module: use the package one
+    from analysis.search_index import ensure_search_index, rebuild_search_index, search
+
+    if args.rebuild:
+        print(f"indexed {rebuild_search_index()} traces")
+    ensure_search_index()
+    if args.text:
+        for hit in search(args.text, args.field, args.node, args.tool, limit=args.limit):
+            print(f"{hit.score:>8.3f}  {hit.trace_id[:40]:<40} step {hit.step_id} {hit.node:<9} "
+                  f"{hit.snippet.replace(chr(10), ' ')[:120]}")
@@ -0,0 +1,327 @@
+# analysis/step_table.py
+# Columnar step table (Parquet) for behavior analytics at scale.
+#
+# One row per step: trace_id, step_id, node, tool, cache_hit, created_at and the
+# StepTiming fields, with node/tool/trace_id dictionary-encoded (categoricals
+# in pandas). Saved traces
+# are appended as a small part file per batch (analysis/traces_loader.py). Parts are merged in size tiers: every
+# MERGE_FANOUT parts of one level become one part of the next, so a save only
+# ever rewrites a few small parts and each step is rewritten once per level.
+# Merges stop at MAX_INLINE_LEVEL; compact_parts() (the `compact` command)
+# merges everything into one part. Metrics are computed with pyarrow.compute
+# over whole columns instead of Python loops over step dicts.
+#
+#   python -m analysis.step_table rebuild|compact|stats
+
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+try:
+    import fcntl
+except ImportError:  # not on POSIX: compaction is not guarded across processes
+    fcntl = None
+
+STEP_TABLE_DIR = Path("data/step_table")
+MERGE_FANOUT = 16  # parts of one level merged into one part of the next
+MAX_INLINE_LEVEL = 3  # appends merge up to parts of ~16**3 appended parts; beyond that, `compact`
+BUILT_MARKER = "built"  # written once the table holds every trace indexed before it
+
+SCHEMA = pa.schema([
+    ("trace_id", pa.dictionary(pa.int32(), pa.string())),
+    ("step_id", pa.int32()),
+    ("node", pa.dictionary(pa.int32(), pa.string())),
+    ("tool", pa.dictionary(pa.int32(), pa.string())),
+    ("cache_hit", pa.bool_()),
+    ("created_at", pa.timestamp("s")),
+    ("wall_seconds", pa.float64()),
+    ("llm_seconds", pa.float64()),
+    ("tool_seconds", pa.float64()),
+    ("prompt_tokens", pa.int32()),
+    ("response_tokens", pa.int32()),
+    ("input_bytes", pa.int64()),
+    ("output_bytes", pa.int64()),
+    ("first_token_seconds", pa.float64()),
+    ("offset_seconds", pa.float64()),
+])
+_DICT_COLUMNS = ["trace_id", "node", "tool"]
+_TIMING_COLUMNS = SCHEMA.names[SCHEMA.get_field_index("wall_seconds"):]
+
+
+def steps_table(traces: Iterable[Tuple[str, Dict[str, Any], float]]) -> pa.Table:
+    """Build the step table for (trace_id, trace, created_at) triples."""
+    cols: Dict[str, List[Any]] = {name: [] for name in SCHEMA.names}
+    for trace_id, trace, created_at in traces:
+        for s in trace["steps"]:
+            cols["trace_id"].append(trace_id)
+            cols["step_id"].append(s["step_id"])
+            cols["node"].append(s["node"])
+            cols["tool"].append(s.get("tool"))
+            cols["cache_hit"].append(s.get("cache_hit"))
+            cols["created_at"].append(int(created_at))
+            timing = s.get("timing") or {}
+            for name in _TIMING_COLUMNS:
+                cols[name].append(timing.get(name))
+    arrays = [
+        pa.array(cols[f.name], type=f.type.value_type).dictionary_encode()
+        if pa.types.is_dictionary(f.type)
+        else pa.array(cols[f.name], type=f.type)
+        for f in SCHEMA
+    ]
+    return pa.Table.from_arrays(arrays, schema=SCHEMA)
+
+
+def _parts(table_dir: Path) -> List[Path]:
+    return sorted(table_dir.glob("part-*.parquet"))
+
+
+_LEVEL = re.compile(r"-L(\d+)\.parquet$")
+
+
+def _level(part: Path) -> Optional[int]:
+    """Merge tier of a part; None for full compactions and rebuilds, which are never merged on save."""
+    match = _LEVEL.search(part.name)
+    return int(match.group(1)) if match else None
+
+
+def _write_part(table: pa.Table, table_dir: Path, level: Optional[int] = None) -> Path:
+    table_dir.mkdir(parents=True, exist_ok=True)
+    tier = f"-L{level}" if level is not None else ""
+    name = f"part-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}{tier}.parquet"
+    tmp = table_dir / f".{name}.tmp"
+    pq.write_table(table, tmp, compression="zstd")
+    path = table_dir / name
+    os.replace(tmp, path)  # readers never see a half-written part
+    return path
+
+
+def append_trace(
+    trace_id: str,
+    trace: Dict[str, Any],
+    created_at: Optional[float] = None,
+    table_dir: Optional[Path] = None,
+) -> None:
+    created_at = created_at if created_at is not None else time.time()
+    append_traces([(trace_id, trace, created_at)], table_dir)
+
+
+def append_traces(items: List[Tuple[str, Dict[str, Any], float]], table_dir: Optional[Path] = None) -> None:
+    """Append (trace_id, trace, created_at) triples as one level-0 part."""
+    table_dir = table_dir or STEP_TABLE_DIR
+    _write_part(steps_table(items), table_dir, level=0)
+    if sum(_level(p) == 0 for p in _parts(table_dir)) >= MERGE_FANOUT:
+        merge_tiers(table_dir)
+
+
+def _conform(table: pa.Table) -> pa.Table:
+    # parts written before a column existed read back with it all-null
+    for field in SCHEMA:
+        if field.name not in table.column_names:
+            table = table.append_column(field, pa.nulls(table.num_rows, field.type))
+    return table.select(SCHEMA.names)
+
+
+def _read_parts(parts: List[Path]) -> pa.Table:
+    # a merged part lists the parts it replaces; skip any that are not deleted yet
+    replaced = set()
+    for p in parts:
+        metadata = pq.read_schema(p).metadata or {}
+        replaced.update(metadata.get(b"replaces", b"").decode().split())
+    tables = [
+        _conform(pq.read_table(p, read_dictionary=_DICT_COLUMNS).replace_schema_metadata(None))
+        for p in parts
+        if p.name not in replaced
+    ]
+    return pa.concat_tables(tables, promote_options="permissive").unify_dictionaries()
+
+
+def load_step_table(table_dir: Optional[Path] = None) -> pa.Table:
+    table_dir = table_dir or STEP_TABLE_DIR
+    for _ in range(3):
+        parts = _parts(table_dir)
+        if not parts:
+            return SCHEMA.empty_table()
+        try:
+            return _read_parts(parts)
+        except FileNotFoundError:
+            continue  # a compaction replaced parts while we listed them
+    raise RuntimeError("step table kept changing while loading")
+
+
+def _merge(parts: List[Path], table_dir: Path, level: Optional[int]) -> None:
+    merged = _read_parts(parts).combine_chunks()
+    merged = merged.replace_schema_metadata({"replaces": " ".join(p.name for p in parts)})
+    _write_part(merged, table_dir, level)
+    for p in parts:
+        p.unlink()
+
+
+def _locked(table_dir: Path):
+    table_dir.mkdir(parents=True, exist_ok=True)
+    lock_file = open(table_dir / "compact.lock", "a")
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)  # released when the file is closed
+    return lock_file
+
+
+def merge_tiers(table_dir: Optional[Path] = None) -> int:
+    """Merge every full tier of small parts, up to MAX_INLINE_LEVEL; returns parts merged."""
+    table_dir = table_dir or STEP_TABLE_DIR
+    merged = 0
+    with _locked(table_dir):
+        for level in range(MAX_INLINE_LEVEL):
+            tier = [p for p in _parts(table_dir) if _level(p) == level]
+            if len(tier) < MERGE_FANOUT:
+                break
+            _merge(tier, table_dir, level + 1)
+            merged += len(tier)
+    return merged
+
+
+def compact_parts(table_dir: Optional[Path] = None) -> int:
+    """Merge all parts into one; returns how many parts were merged."""
+    table_dir = table_dir or STEP_TABLE_DIR
+    with _locked(table_dir):
+        parts = _parts(table_dir)
+        if len(parts) < 2:
+            return 0
+        _merge(parts, table_dir, None)
+        return len(parts)
+
+
+def rebuild_step_table(table_dir: Optional[Path] = None) -> int:
+    """Rebuild from every indexed trace; returns the number of steps written."""
+    from analysis.trace_index import ensure_index, list_traces
+
+    table_dir = table_dir or STEP_TABLE_DIR
+    ensure_index()
+    handles = list_traces()
+    table = steps_table((h.trace_id, h.load(), h.created_at) for h in reversed(handles))
+    old_parts = _parts(table_dir)
+    table = table.replace_schema_metadata({"replaces": " ".join(p.name for p in old_parts)})
+    _write_part(table, table_dir)
+    for p in old_parts:
+        p.unlink()
+    (table_dir / BUILT_MARKER).write_text(f"{time.time()}\n")
+    return table.num_rows
+
+
+def ensure_step_table(table_dir: Optional[Path] = None) -> None:
+    """
+    Build the table from every trace once; afterwards save_trace appends to it.
+    Not keyed on missing parts: the first save would otherwise leave out
+    every trace saved before the table existed.
+    """
+    from analysis.traces_loader import flush_index_updates
+
+    flush_index_updates()  # saves of this process still queued for the table
+    if not ((table_dir or STEP_TABLE_DIR) / BUILT_MARKER).exists():
+        rebuild_step_table(table_dir)
+
+
+# ---------- vectorized metrics ----------
+
+def _counts(column: pa.ChunkedArray) -> Dict[str, int]:
+    counts = pc.value_counts(column.combine_chunks().dictionary_decode().drop_null())
+    pairs = zip(counts.field("values").to_pylist(), counts.field("counts").to_pylist())
+    return dict(sorted(pairs, key=lambda kv: -kv[1]))
+
+
+def compute_step_metrics(table: pa.Table) -> Dict[str, Any]:
+    """Same keys as behavior_analysis.compute_behavior_metrics, computed column-wise."""
+    total_steps = table.num_rows
+    tool_calls = total_steps - table["tool"].null_count
+    tool_counts = _counts(table["tool"]) if total_steps else {}
+    return {
+        "total_steps": total_steps,
+        "tool_calls": tool_calls,
+        "tool_usage_rate": tool_calls / total_steps if total_steps else 0,
+        "tool_counts": tool_counts,
+        "node_counts": _counts(table["node"]) if total_steps else {},
+        "tool_rates": {tool: n / total_steps for tool, n in tool_counts.items()},
+    }
+
+
+def latency_percentiles(
+    table: pa.Table,
+    by: str = "node",
+    column: str = "wall_seconds",
+    quantiles: Tuple[float, ...] = (0.5, 0.95, 0.99),
+):
+    """
+    Latency percentiles of `column` per `by` value ("node" or "tool"), as a
+    DataFrame with columns count, p50, p95, p99. column="call_seconds" uses
+    the time inside the step's tool or LLM call instead of the node wall time.
+    Steps without timing (older traces) are ignored.
+    """
+    import pandas as pd
+
+    if column == "call_seconds":
+        values = pc.coalesce(table["tool_seconds"], table["llm_seconds"])
+    else:
+        values = table[column]
+    df = pd.DataFrame({by: table[by].to_pandas(), "seconds": values.to_pandas()}).dropna()
+    cols = [f"p{round(q * 100)}" for q in quantiles]
+    if df.empty:
+        return pd.DataFrame(columns=["count"] + cols)
+    grouped = df.groupby(by, observed=True)["seconds"]
+    out = grouped.quantile(list(quantiles)).unstack()
+    out.columns = cols
+    out.insert(0, "count", grouped.size())
+    return out.sort_values(cols[-1], ascending=False)
+
+
+def time_bucketed_trends(table: pa.Table, bucket: str = "1D"):
+    """
+    Steps, tool calls and tool usage rate per time bucket (pandas offset alias,
+    e.g. "1h", "1D", "1W"), as a DataFrame indexed by bucket start.
+    """
+    import pandas as pd
+
+    if table.num_rows == 0:
+        return pd.DataFrame(columns=["steps", "tool_calls", "tool_usage_rate"])
+    df = pd.DataFrame({
+        "created_at": table["created_at"].to_pandas(),
+        "has_tool": pc.is_valid(table["tool"]).to_pandas(),
+    })
+    grouped = df.groupby(pd.Grouper(key="created_at", freq=bucket))["has_tool"]
+    out = pd.DataFrame({"steps": grouped.size(), "tool_calls": grouped.sum()})
+    out["tool_usage_rate"] = out["tool_calls"] / out["steps"].where(out["steps"] > 0)
+    return out
+
+
+def node_counts_over_time(table: pa.Table, bucket: str = "1D"):
+    """Per-node step counts per time bucket (columns = nodes)."""
+    import pandas as pd
+
+    if table.num_rows == 0:
+        return pd.DataFrame()
+    df = pd.DataFrame({
+        "created_at": table["created_at"].to_pandas(),
+        "node": table["node"].to_pandas(),
+    })
+    return (
+        df.groupby([pd.Grouper(key="created_at", freq=bucket), "node"], observed=True)
+        .size()
+        .unstack(fill_value=0)
+    )
+
+
+if __name__ == "__main__":
+    import sys
+
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if cmd == "rebuild":
+        print(f"wrote {rebuild_step_table()} steps")
+    elif cmd == "compact":
+        print(f"merged {compact_parts()} parts")
+    table = load_step_table()
+    print(f"{table.num_rows} steps in {len(_parts(STEP_TABLE_DIR))} parts")
+    print(compute_step_metrics(table))
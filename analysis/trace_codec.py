@@ -0,0 +1,161 @@
+# analysis/trace_codec.py
+# Compact binary trace format (".gmtrace").
+#
+# Layout, version 1:
+#   b"GMTR" | u8 version | u32 header length | header | zstd(body)
+#   header: msgpack metadata (query, step count, nodes, tools, ...) stored
+#           uncompressed so it can be read without touching the body
+#   body:   u32 table length | msgpack list of interned strings | msgpack trace
+#
+# Strings of INTERN_MIN_LEN characters or more are stored once in the table and
+# referenced from the trace as msgpack ext type 1 (u32 index). Plans, search
+# dumps and answers repeat across tool_output, memory patches and final memory,
+# so each long string is written once per trace before zstd even sees it.
+#
+#   python -m analysis.trace_codec convert [--delete]   # data/traces/*.json -> .gmtrace
+
+import struct
+from pathlib import Path
+from typing import Any, Dict, List
+
+import ormsgpack
+import zstandard
+
+MAGIC = b"GMTR"
+VERSION = 1
+SUFFIX = ".gmtrace"
+INTERN_MIN_LEN = 64
+ZSTD_LEVEL = 3
+
+_STR_EXT = 1
+_PREFIX = struct.Struct("<4sBI")  # magic, version, header length
+_U32 = struct.Struct("<I")
+
+
+class TraceFormatError(ValueError):
+    pass
+
+
+def trace_meta(trace: Dict[str, Any]) -> Dict[str, Any]:
+    """Summary fields stored in the header of every binary trace."""
+    steps = trace.get("steps", [])
+    return {
+        "user_query": trace.get("user_query", ""),
+        "step_count": len(steps),
+        "nodes": [s["node"] for s in steps],
+        "step_tools": [s.get("tool") for s in steps],
+        "tools": sorted({s["tool"] for s in steps if s.get("tool")}),
+        "answer_len": len(trace.get("final_answer") or ""),
+    }
+
+
+def _intern(obj: Any, table: List[str], index: Dict[str, int]) -> Any:
+    if isinstance(obj, str):
+        if len(obj) < INTERN_MIN_LEN:
+            return obj
+        idx = index.get(obj)
+        if idx is None:
+            idx = index[obj] = len(table)
+            table.append(obj)
+        return ormsgpack.Ext(_STR_EXT, _U32.pack(idx))
+    if isinstance(obj, dict):
+        return {k: _intern(v, table, index) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_intern(v, table, index) for v in obj]
+    return obj
+
+
+def encode_trace(trace: Dict[str, Any], level: int = ZSTD_LEVEL) -> bytes:
+    table: List[str] = []
+    interned = _intern(trace, table, {})
+    strings = ormsgpack.packb(table)
+    body = _U32.pack(len(strings)) + strings + ormsgpack.packb(interned)
+
+    header = ormsgpack.packb(trace_meta(trace))
+    compressed = zstandard.ZstdCompressor(level=level).compress(body)
+    return _PREFIX.pack(MAGIC, VERSION, len(header)) + header + compressed
+
+
+def _split(data: bytes):
+    if len(data) < _PREFIX.size:
+        raise TraceFormatError("truncated trace")
+    magic, version, header_len = _PREFIX.unpack_from(data)
+    if magic != MAGIC:
+        raise TraceFormatError("not a binary trace")
+    if version != VERSION:
+        raise TraceFormatError(f"unsupported trace version {version}")
+    start = _PREFIX.size
+    return data[start:start + header_len], data[start + header_len:]
+
+
+def decode_meta(data: bytes) -> Dict[str, Any]:
+    header, _ = _split(data)
+    return ormsgpack.unpackb(header)
+
+
+def decode_trace(data: bytes) -> Dict[str, Any]:
+    _, compressed = _split(data)
+    body = zstandard.ZstdDecompressor().decompress(compressed)
+    (table_len,) = _U32.unpack_from(body)
+    table = ormsgpack.unpackb(body[_U32.size:_U32.size + table_len])
+
+    def ext_hook(tag: int, payload: bytes) -> Any:
+        if tag != _STR_EXT:
+            raise TraceFormatError(f"unknown ext type {tag}")
+        return table[_U32.unpack(payload)[0]]
+
+    return ormsgpack.unpackb(body[_U32.size + table_len:], ext_hook=ext_hook)
+
+
+def read_trace_meta(path: Path) -> Dict[str, Any]:
+    """Read only the header of a .gmtrace file."""
+    with path.open("rb") as f:
+        prefix = f.read(_PREFIX.size)
+        _split(prefix)
+        header_len = _PREFIX.unpack(prefix)[2]
+        return ormsgpack.unpackb(f.read(header_len))
+
+
+def convert_json_traces(traces_dir: Path, delete: bool = False) -> List[Path]:
+    """
+    Write a .gmtrace next to every *.json trace; optionally remove the JSON.
+    Kept JSON copies are ignored by the loader and index (traces_loader.trace_paths).
+    """
+    import orjson
+
+    written = []
+    for src in sorted(traces_dir.glob("*.json")):
+        trace = orjson.loads(src.read_bytes())
+        dst = src.with_name(src.name.split(".json")[0] + SUFFIX)
+        dst.write_bytes(encode_trace(trace))
+        written.append(dst)
+        if delete:
+            src.unlink()
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Binary trace codec tools.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    conv = sub.add_parser("convert", help="convert JSON traces to .gmtrace")
+    conv.add_argument("--dir", type=Path, default=Path("data/traces"))
+    conv.add_argument("--delete", action="store_true", help="remove the JSON files afterwards")
+    meta = sub.add_parser("meta", help="print the header of .gmtrace files")
+    meta.add_argument("paths", type=Path, nargs="+")
+    args = parser.parse_args()
+
+    if args.cmd == "convert":
+        for p in convert_json_traces(args.dir, args.delete):
+            print(p)
+        from analysis.traces_loader import TRACES_DIR
+
+        if args.dir == TRACES_DIR:
+            from analysis.trace_index import sync_index
+
+            # point the index at the .gmtrace files
+            print(f"re-indexed {sync_index()} traces")
+    else:
+        for p in args.paths:
+            print(p, read_trace_meta(p))
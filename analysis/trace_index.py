@@ -0,0 +1,265 @@
+# analysis/trace_index.py
+# Persistent metadata index over all traces (SQLite), updated after save_trace.
+# Dashboards list traces from the index and load a trace body only when it is
+# selected, via TraceHandle.load().
+#
+#   python -m analysis.trace_index sync      # index traces saved before the index existed
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, PrivateAttr
+
+from analysis.aggregates import SCHEMA as AGGREGATES_SCHEMA, apply_trace
+from analysis.search_index import SCHEMA as SEARCH_SCHEMA, index_text
+from analysis.trace_codec import SUFFIX as BINARY_SUFFIX, read_trace_meta, trace_meta
+
+INDEX_PATH = Path("data/trace_index.sqlite")
+STORE_PREFIX = "store:"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS traces (
+    trace_id TEXT PRIMARY KEY,
+    location TEXT NOT NULL,
+    query TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    step_count INTEGER NOT NULL,
+    tools TEXT NOT NULL,
+    answer_len INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS traces_created ON traces(created_at);
+CREATE TABLE IF NOT EXISTS index_state (
+    key TEXT PRIMARY KEY,    -- 'synced': a full sync_index has run
+    value REAL NOT NULL
+);
+"""
+
+
+class TraceHandle(BaseModel):
+    """Index row for one trace; the full body is read on first load()."""
+    trace_id: str
+    location: str  # file path, or "store:<name>" for analysis/trace_store.py
+    query: str
+    created_at: float
+    step_count: int
+    tools: List[str]
+    answer_len: int
+
+    _body: Optional[Dict[str, Any]] = PrivateAttr(default=None)
+
+    def load(self) -> Dict[str, Any]:
+        if self._body is None:
+            if self.location.startswith(STORE_PREFIX):
+                from analysis.trace_store import get_trace_store
+
+                self._body = get_trace_store().get(self.location[len(STORE_PREFIX):])
+            else:
+                from analysis.traces_loader import load_trace
+
+                self._body = load_trace(Path(self.location))
+        return self._body
+
+
+_local = threading.local()
+
+
+def _db(path: Optional[Path] = None) -> sqlite3.Connection:
+    path = path or INDEX_PATH
+    conns = getattr(_local, "conns", None)
+    if conns is None or _local.pid != os.getpid():
+        conns = _local.conns = {}
+        _local.pid = os.getpid()
+    conn = conns.get(path)
+    if conn is None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA + AGGREGATES_SCHEMA + SEARCH_SCHEMA)
+        conns[path] = conn
+    return conn
+
+
+def index_trace(
+    trace_id: str,
+    location: str,
+    trace: Dict[str, Any],
+    created_at: Optional[float] = None,
+    index_path: Optional[Path] = None,
+) -> None:
+    _index_meta(trace_id, location, trace_meta(trace), created_at, index_path, trace)
+
+
+def index_traces(
+    items: List[Tuple[str, str, Dict[str, Any], float]],
+    index_path: Optional[Path] = None,
+) -> None:
+    """index_trace for (trace_id, location, trace, created_at) tuples, in one transaction."""
+    conn = _db(index_path)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        for trace_id, location, trace, created_at in items:
+            _write_meta(conn, trace_id, location, trace_meta(trace), created_at, trace)
+
+
+def _index_meta(
+    trace_id: str,
+    location: str,
+    meta: Dict[str, Any],
+    created_at: Optional[float],
+    index_path: Optional[Path],
+    trace: Optional[Dict[str, Any]] = None,
+) -> None:
+    created_at = created_at if created_at is not None else time.time()
+    conn = _db(index_path)
+    with conn:  # index row, behavior aggregates and search rows commit together
+        conn.execute("BEGIN IMMEDIATE")
+        _write_meta(conn, trace_id, location, meta, created_at, trace)
+
+
+def _write_meta(
+    conn: sqlite3.Connection,
+    trace_id: str,
+    location: str,
+    meta: Dict[str, Any],
+    created_at: float,
+    trace: Optional[Dict[str, Any]],
+) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO traces VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            trace_id,
+            location,
+            meta["user_query"],
+            created_at,
+            meta["step_count"],
+            json.dumps(meta["tools"]),
+            meta["answer_len"],
+        ),
+    )
+    apply_trace(conn, trace_id, meta, created_at)
+    if trace is not None:
+        # without the body (binary headers), ensure_search_index fills it in on first search
+        index_text(conn, trace_id, trace)
+
+
+def _row_to_handle(row: Tuple) -> TraceHandle:
+    trace_id, location, query, created_at, step_count, tools, answer_len = row
+    return TraceHandle(
+        trace_id=trace_id,
+        location=location,
+        query=query,
+        created_at=created_at,
+        step_count=step_count,
+        tools=json.loads(tools),
+        answer_len=answer_len,
+    )
+
+
+def list_traces(limit: Optional[int] = None, index_path: Optional[Path] = None) -> List[TraceHandle]:
+    """Newest first."""
+    sql = "SELECT * FROM traces ORDER BY created_at DESC"
+    params: Tuple = ()
+    if limit is not None:
+        sql += " LIMIT ?"
+        params = (limit,)
+    return [_row_to_handle(r) for r in _db(index_path).execute(sql, params)]
+
+
+def get_trace(trace_id: str, index_path: Optional[Path] = None) -> Optional[TraceHandle]:
+    row = _db(index_path).execute("SELECT * FROM traces WHERE trace_id = ?", (trace_id,)).fetchone()
+    return _row_to_handle(row) if row else None
+
+
+def trace_meta_for(handle: TraceHandle) -> Dict[str, Any]:
+    """Header metadata for an indexed trace, reading only the header when possible."""
+    if handle.location.endswith(BINARY_SUFFIX):
+        meta = read_trace_meta(Path(handle.location))
+    elif handle.location.startswith(STORE_PREFIX):
+        from analysis.trace_store import get_trace_store
+
+        meta = get_trace_store().meta(handle.location[len(STORE_PREFIX):])
+    else:
+        meta = {}
+    if "step_tools" not in meta:  # JSON trace, or a header written before step_tools existed
+        meta = trace_meta(handle.load())
+    return meta
+
+
+def index_version(index_path: Optional[Path] = None) -> Tuple[int, float]:
+    """(count, newest created_at): changes whenever a trace is added; handy as a cache key."""
+    count, newest = _db(index_path).execute("SELECT COUNT(*), MAX(created_at) FROM traces").fetchone()
+    return count, newest or 0.0
+
+
+def sync_index(traces_dir: Optional[Path] = None, index_path: Optional[Path] = None) -> int:
+    """
+    Index traces that are not in the index yet (files saved before it existed,
+    or the segmented store). Binary traces only need their header read.
+    Returns the number of traces added.
+    """
+    from analysis.traces_loader import TRACES_DIR, load_trace, trace_paths
+
+    traces_dir = traces_dir or TRACES_DIR
+    known = {r[0] for r in _db(index_path).execute("SELECT location FROM traces")}
+    added = 0
+
+    # a converted trace moves its row from the .json to the .gmtrace location once
+    for p in trace_paths(traces_dir):
+        if str(p) in known:
+            continue
+        trace_id = p.name.split(".")[0]
+        meta = read_trace_meta(p) if p.suffix == BINARY_SUFFIX else {}
+        trace = None
+        if "step_tools" not in meta:
+            trace = load_trace(p)
+            meta = trace_meta(trace)
+        _index_meta(trace_id, str(p), meta, p.stat().st_mtime, index_path, trace)
+        added += 1
+
+    from backend.config import DEFAULT_TRACE_STORE_CONFIG
+
+    if (Path(DEFAULT_TRACE_STORE_CONFIG.path) / "index.sqlite").exists():
+        from analysis.trace_store import get_trace_store
+
+        store = get_trace_store()
+        for name in store.names():
+            if STORE_PREFIX + name in known:
+                continue
+            meta = store.meta(name)
+            trace = None
+            if "step_tools" not in meta:
+                trace = store.get(name)
+                meta = trace_meta(trace)
+            _index_meta(name, STORE_PREFIX + name, meta, None, index_path, trace)
+            added += 1
+
+    _db(index_path).execute("INSERT OR REPLACE INTO index_state VALUES ('synced', ?)", (time.time(),))
+    return added
+
+
+def ensure_index(index_path: Optional[Path] = None) -> None:
+    """
+    Index every existing trace once; afterwards save_trace keeps it current.
+    Not keyed on an empty index: a save made before the first sync would
+    otherwise hide every trace already on disk.
+    """
+    from analysis.traces_loader import flush_index_updates
+
+    flush_index_updates()  # saves of this process still queued for the index
+    synced = _db(index_path).execute("SELECT 1 FROM index_state WHERE key = 'synced'").fetchone()
+    if synced is None:
+        sync_index(index_path=index_path)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ["sync"]:
+        print(f"indexed {sync_index()} new traces")
+    for h in list_traces(limit=20):
+        print(h.trace_id, h.step_count, h.tools, repr(h.query[:60]))
@@ -0,0 +1,326 @@
+# analysis/trace_store.py
+# Append-only, segmented trace store.
+#
+# Traces are appended to rolling segment files (seg-000001.log, ...) as framed
+# .gmtrace records (analysis/trace_codec.py); a SQLite index maps each trace
+# name to (segment, offset, length). Writes are sequential appends, reads are a
+# single seek. Overwritten or deleted traces leave dead bytes behind, which
+# compaction reclaims; retention drops traces by age or total size.
+#
+# Frame: u32 payload length | u32 crc32(payload) | payload
+#
+#   python -m analysis.trace_store import|compact|stats
+
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from analysis.trace_codec import encode_trace, decode_trace, decode_meta
+from backend.config import TraceStoreConfig, DEFAULT_TRACE_STORE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # not on POSIX: only in-process locking
+    fcntl = None
+
+_FRAME = struct.Struct("<II")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    name TEXT PRIMARY KEY,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_segment ON records(segment);
+CREATE INDEX IF NOT EXISTS records_created ON records(created_at);
+"""
+
+
+class TraceStore:
+    def __init__(self, config: TraceStoreConfig = DEFAULT_TRACE_STORE_CONFIG):
+        self.config = config
+        self.root = Path(config.path)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._thread_lock = threading.RLock()
+        self._local = threading.local()
+        self._stop = threading.Event()
+        with self._db() as db:
+            db.executescript(_SCHEMA)
+
+    # ---------- plumbing ----------
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.root / "index.sqlite", timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        # one writer at a time, across threads and processes
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.root / "store.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.root / f"seg-{segment:06d}.log"
+
+    def segments(self) -> List[int]:
+        return sorted(int(p.stem.split("-")[1]) for p in self.root.glob("seg-*.log"))
+
+    def _active_segment(self) -> int:
+        segments = self.segments()
+        if not segments:
+            return 1
+        last = segments[-1]
+        if self._segment_path(last).stat().st_size >= self.config.segment_max_bytes:
+            return last + 1
+        return last
+
+    def _append(self, payload: bytes) -> Tuple[int, int]:
+        segment = self._active_segment()
+        with self._segment_path(segment).open("ab") as f:
+            offset = f.tell()
+            f.write(_FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+        return segment, offset
+
+    def _read(self, segment: int, offset: int, length: int) -> bytes:
+        with self._segment_path(segment).open("rb") as f:
+            f.seek(offset)
+            size, crc = _FRAME.unpack(f.read(_FRAME.size))
+            payload = f.read(size)
+        if size != length or zlib.crc32(payload) != crc:
+            raise IOError(f"corrupt trace record in segment {segment} at {offset}")
+        return payload
+
+    def _lookup(self, name: str) -> Optional[Tuple[int, int, int]]:
+        return self._db().execute(
+            "SELECT segment, offset, length FROM records WHERE name = ?", (name,)
+        ).fetchone()
+
+    # ---------- public API ----------
+    def put(self, name: str, trace: Dict[str, Any]) -> None:
+        payload = encode_trace(trace)
+        with self._write_lock():
+            segment, offset = self._append(payload)
+            self._db().execute(
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)",
+                (name, segment, offset, len(payload), time.time()),
+            )
+
+    def get_bytes(self, name: str) -> bytes:
+        for _ in range(2):
+            loc = self._lookup(name)
+            if loc is None:
+                raise KeyError(name)
+            try:
+                return self._read(*loc)
+            except FileNotFoundError:
+                continue  # segment compacted away under us; the index has moved on
+        raise KeyError(name)
+
+    def get(self, name: str) -> Dict[str, Any]:
+        return decode_trace(self.get_bytes(name))
+
+    def meta(self, name: str) -> Dict[str, Any]:
+        return decode_meta(self.get_bytes(name))
+
+    def delete(self, name: str) -> None:
+        with self._write_lock():
+            self._db().execute("DELETE FROM records WHERE name = ?", (name,))
+
+    def names(self) -> List[str]:
+        return [r[0] for r in self._db().execute("SELECT name FROM records ORDER BY segment, offset")]
+
+    def __contains__(self, name: str) -> bool:
+        return self._lookup(name) is not None
+
+    def __len__(self) -> int:
+        return self._db().execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def iter_traces(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """All live traces in segment order, so reads sweep each file front to back."""
+        rows = self._db().execute(
+            "SELECT name, segment, offset, length FROM records ORDER BY segment, offset"
+        ).fetchall()
+        handle, current = None, None
+        try:
+            for name, segment, offset, length in rows:
+                if segment != current:
+                    if handle:
+                        handle.close()
+                    try:
+                        handle = self._segment_path(segment).open("rb")
+                    except FileNotFoundError:
+                        handle, current = None, None
+                        continue
+                    current = segment
+                handle.seek(offset)
+                size, crc = _FRAME.unpack(handle.read(_FRAME.size))
+                payload = handle.read(size)
+                if size == length and zlib.crc32(payload) == crc:
+                    yield name, decode_trace(payload)
+        finally:
+            if handle:
+                handle.close()
+
+    # ---------- maintenance ----------
+    def segment_stats(self) -> Dict[int, Dict[str, int]]:
+        live = dict(self._db().execute(
+            "SELECT segment, SUM(length + ?) FROM records GROUP BY segment", (_FRAME.size,)
+        ).fetchall())
+        return {
+            seg: {"bytes": self._segment_path(seg).stat().st_size, "live_bytes": live.get(seg, 0)}
+            for seg in self.segments()
+        }
+
+    def compact(self) -> int:
+        """Rewrite sealed segments below the live ratio; returns bytes reclaimed."""
+        reclaimed = 0
+        with self._write_lock():
+            stats = self.segment_stats()
+            active = self._active_segment()
+            for seg, s in stats.items():
+                if seg >= active:
+                    continue
+                if s["bytes"] and s["live_bytes"] / s["bytes"] >= self.config.compact_below_live_ratio:
+                    continue
+                db = self._db()
+                rows = db.execute(
+                    "SELECT name, offset, length FROM records WHERE segment = ? ORDER BY offset", (seg,)
+                ).fetchall()
+                db.execute("BEGIN IMMEDIATE")
+                try:
+                    for name, offset, length in rows:
+                        new_seg, new_off = self._append(self._read(seg, offset, length))
+                        db.execute(
+                            "UPDATE records SET segment = ?, offset = ? WHERE name = ?",
+                            (new_seg, new_off, name),
+                        )
+                    db.execute("COMMIT")
+                except BaseException:
+                    db.execute("ROLLBACK")
+                    raise
+                self._segment_path(seg).unlink()
+                reclaimed += s["bytes"] - s["live_bytes"]
+        return reclaimed
+
+    def enforce_retention(self) -> int:
+        """Apply the age and size limits; returns the number of traces dropped."""
+        dropped = 0
+        with self._write_lock():
+            db = self._db()
+            if self.config.retention_max_age_seconds is not None:
+                cutoff = time.time() - self.config.retention_max_age_seconds
+                dropped += db.execute("DELETE FROM records WHERE created_at < ?", (cutoff,)).rowcount
+            if self.config.retention_max_bytes is not None:
+                segments = self.segments()
+                total = sum(self._segment_path(s).stat().st_size for s in segments)
+                # whole oldest segments go first; the active one is never dropped
+                for seg in segments[:-1]:
+                    if total <= self.config.retention_max_bytes:
+                        break
+                    size = self._segment_path(seg).stat().st_size
+                    dropped += db.execute("DELETE FROM records WHERE segment = ?", (seg,)).rowcount
+                    self._segment_path(seg).unlink()
+                    total -= size
+            # segments left with no live records can go right away
+            live = {r[0] for r in db.execute("SELECT DISTINCT segment FROM records")}
+            segments = self.segments()
+            for seg in segments[:-1]:
+                if seg not in live:
+                    self._segment_path(seg).unlink()
+        return dropped
+
+    def start_maintenance(self) -> threading.Thread:
+        """Run retention + compaction every maintenance_interval_seconds on a daemon thread."""
+
+        def loop() -> None:
+            while not self._stop.wait(self.config.maintenance_interval_seconds):
+                try:
+                    self.enforce_retention()
+                    self.compact()
+                except Exception:
+                    logger.exception("trace store maintenance failed")
+
+        thread = threading.Thread(target=loop, name="trace-store-maintenance", daemon=True)
+        thread.start()
+        return thread
+
+    def stop_maintenance(self) -> None:
+        self._stop.set()
+
+    def import_files(self, traces_dir: Path, delete: bool = False) -> int:
+        """Move one-file-per-trace JSON/.gmtrace files into the store."""
+        from analysis.traces_loader import load_trace, trace_paths
+
+        count = 0
+        for path in trace_paths(traces_dir):
+            name = path.name.split(".")[0]
+            self.put(name, load_trace(path))
+            if delete:
+                path.unlink()
+                path.with_name(f"{name}.json").unlink(missing_ok=True)  # left over from a conversion
+            count += 1
+        return count
+
+
+_store: Optional[TraceStore] = None
+_store_lock = threading.Lock()
+
+
+_maintenance: Optional[threading.Thread] = None
+
+
+def get_trace_store(
+    config: TraceStoreConfig = DEFAULT_TRACE_STORE_CONFIG,
+    maintain: bool = False,
+) -> TraceStore:
+    """Process-wide store; `maintain=True` (used by writers) also starts background maintenance."""
+    global _store, _maintenance
+    with _store_lock:
+        if _store is None:
+            _store = TraceStore(config)
+        if maintain and _maintenance is None:
+            _maintenance = _store.start_maintenance()
+        return _store
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Segmented trace store maintenance.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import", help="append data/traces files to the store")
+    imp.add_argument("--dir", type=Path, default=Path("data/traces"))
+    imp.add_argument("--delete", action="store_true")
+    sub.add_parser("compact")
+    sub.add_parser("stats")
+    args = parser.parse_args()
+
+    store = get_trace_store()
+    if args.cmd == "import":
+        print(f"imported {store.import_files(args.dir, args.delete)} traces")
+    elif args.cmd == "compact":
+        print(f"dropped {store.enforce_retention()} traces, reclaimed {store.compact()} bytes")
+    print(f"{len(store)} traces", store.segment_stats())
@@ -1,20 +1,149 @@
-import json
+import logging
+import os
+import threading
+import time
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple
+from uuid import uuid4
+
+import orjson
+
 from backend.models import AgentState
+from analysis.trace_codec import SUFFIX as BINARY_SUFFIX, encode_trace, decode_trace
 
 TRACES_DIR = Path("data/traces")
+# "json" (pretty-printed, human readable) or "binary" (analysis/trace_codec.py)
+TRACE_FORMAT = os.getenv("GLASSMIND_TRACE_FORMAT", "json")
+# "files" (one file per trace in TRACES_DIR) or "store" (analysis/trace_store.py)
+TRACE_BACKEND = os.getenv("GLASSMIND_TRACE_BACKEND", "files")
+
+logger = logging.getLogger(__name__)
+INDEXER_POLL_SECONDS = 0.1  # how soon the indexer notices the main thread has exited
+
+def make_trace_name(query: str) -> str:
+    """Unique, filesystem-safe trace name for a query (no .json extension)."""
+    ts = uuid4().hex
+    safe_snippet = "".join(c for c in query[:20] if c.isalnum() or c in ("-", "_")).rstrip()
+    return f"trace_{ts}_{safe_snippet or 'query'}"
+
+def save_trace(
+    state: AgentState,
+    trace_name: str,
+    traces_dir: Optional[Path] = None,
+    fmt: Optional[str] = None,
+) -> Path:
+    trace = state.model_dump()
+    if TRACE_BACKEND == "store" and traces_dir is None:
+        from analysis.trace_index import STORE_PREFIX
+        from analysis.trace_store import get_trace_store
 
-def save_trace(state: AgentState, trace_name: str) -> Path:
-    TRACES_DIR.mkdir(parents=True, exist_ok=True)
-    path = TRACES_DIR / f"{trace_name}.json"
-    with path.open("w") as f:
-        json.dump(state.model_dump(), f, indent=2)
+        store = get_trace_store(maintain=True)
+        store.put(trace_name, trace)
+        _after_save(trace_name, STORE_PREFIX + trace_name, trace)
+        return store.root
+
+    custom_dir = traces_dir is not None
+    traces_dir = traces_dir or TRACES_DIR
+    traces_dir.mkdir(parents=True, exist_ok=True)
+    if (fmt or TRACE_FORMAT) == "binary":
+        path = traces_dir / f"{trace_name}{BINARY_SUFFIX}"
+        path.write_bytes(encode_trace(trace))
+    else:
+        path = traces_dir / f"{trace_name}.json"
+        path.write_bytes(orjson.dumps(trace, option=orjson.OPT_INDENT_2))
+    if not custom_dir:
+        _after_save(trace_name, str(path), trace)
     return path
 
-def load_traces() -> List[dict]:
-    traces = []
-    for p in TRACES_DIR.glob("*.json"):
-        with p.open() as f:
-            traces.append(json.load(f))
-    return traces
+def _after_save(trace_name: str, location: str, trace: dict) -> None:
+    """
+    Queue the derived index updates (trace index, aggregates, search rows, step
+    table) for the background indexer, so a save only writes the trace itself.
+    """
+    with _pending_cond:
+        _pending.append((trace_name, location, trace, time.time()))
+        _start_indexer()
+        _pending_cond.notify()
+
+# (trace name, location, trace, created_at) saved but not yet in the derived indexes
+_pending: List[Tuple[str, str, dict, float]] = []
+_pending_cond = threading.Condition()
+_flush_lock = threading.Lock()  # one batch at a time, in save order
+_indexer: Optional[threading.Thread] = None
+
+def _start_indexer() -> None:
+    global _indexer
+    if _indexer is None:
+        # imported here, not on the indexer at exit: pyarrow loads its pandas shim
+        # lazily, and that import fails once the interpreter is shutting down
+        import analysis.step_table  # noqa: F401
+        import analysis.trace_index  # noqa: F401
+        import pyarrow.pandas_compat  # noqa: F401
+
+        # not a daemon: at interpreter exit it finishes the queue, then returns
+        _indexer = threading.Thread(target=_index_loop, name="trace-indexer")
+        _indexer.start()
+
+def _index_loop() -> None:
+    main = threading.main_thread()
+    while True:
+        with _pending_cond:
+            while not _pending:
+                if not main.is_alive():
+                    return
+                _pending_cond.wait(INDEXER_POLL_SECONDS)
+        try:
+            flush_index_updates()
+        except Exception:
+            # the trace itself is saved; `python -m analysis.trace_index sync` and
+            # `python -m analysis.step_table rebuild` bring the indexes back in step
+            logger.exception("updating the trace indexes failed")
+
+def flush_index_updates() -> None:
+    """Write every queued save to the derived indexes: one transaction and one step-table part."""
+    from analysis.step_table import append_traces
+    from analysis.trace_index import index_traces
+
+    with _flush_lock:
+        with _pending_cond:
+            batch = list(_pending)
+            _pending.clear()
+        if batch:
+            index_traces(batch)
+            append_traces([(name, trace, created_at) for name, _, trace, created_at in batch])
+
+def _reset_indexer() -> None:
+    # a forked child gets no indexer thread; it starts its own and drops the parent's queue
+    global _pending_cond, _flush_lock, _indexer
+    _pending.clear()
+    _pending_cond = threading.Condition()
+    _flush_lock = threading.Lock()
+    _indexer = None
+
+# fork only between batches: a child must not inherit SQLite mid-transaction
+os.register_at_fork(
+    before=lambda: _flush_lock.acquire(),
+    after_in_parent=lambda: _flush_lock.release(),
+    after_in_child=_reset_indexer,
+)
+
+def load_trace(path: Path) -> dict:
+    data = path.read_bytes()
+    if path.suffix == BINARY_SUFFIX:
+        return decode_trace(data)
+    return orjson.loads(data)
+
+def trace_paths(traces_dir: Optional[Path] = None) -> List[Path]:
+    """One file per trace; a .gmtrace wins over the JSON it was converted from."""
+    traces_dir = traces_dir or TRACES_DIR
+    paths = {p.name.split(".")[0]: p for p in traces_dir.glob("*.json")}
+    paths.update((p.name.split(".")[0], p) for p in traces_dir.glob(f"*{BINARY_SUFFIX}"))
+    return sorted(paths.values())
+
+def load_traces(traces_dir: Optional[Path] = None) -> List[dict]:
+    if TRACE_BACKEND == "store" and traces_dir is None:
+        from analysis.trace_store import get_trace_store
+
+        return [trace for _, trace in get_trace_store().iter_traces()]
+
+    return [load_trace(p) for p in trace_paths(traces_dir)]
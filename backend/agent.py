@@ -1,40 +1,107 @@
-import requests
+import asyncio
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List
 import os
-from valyu import Valyu
 from dotenv import load_dotenv, dotenv_values
-from langsmith.run_helpers import traceable
+from observability.tracing import traced
+from .tool_cache import tool_cache
+from .step_meta import timed_call
+from .cassette import recorded
+from .resilience import get_caller
 
 load_dotenv()
 VALYU_API_KEY = os.getenv("VALYU_API_KEY")
-valyu = Valyu(api_key=VALYU_API_KEY)
+_valyu = None
+_valyu_lock = threading.Lock()
 
-@traceable(name="web_search_tool")
+if TYPE_CHECKING:
+    from valyu import Valyu
+
+
+def get_valyu() -> "Valyu":
+    # created on the first real call and shared by every thread afterwards, so
+    # replaying a cassette needs no key and importing this module skips the SDK
+    global _valyu
+    if _valyu is None:
+        with _valyu_lock:
+            if _valyu is None:
+                from valyu import Valyu
+
+                _valyu = Valyu(api_key=VALYU_API_KEY)
+    return _valyu
+
+
+@traced("web_search_tool", kind="tool")
+@recorded("web_search_tool", kind="tool")
+@tool_cache.cached("web_search_tool")
 def web_search_tool(query: str) -> str:
     finance_query = f"{query} -- extensive company or investment research and also stock OR ETF OR earnings OR financial results or about it"
-    # Valyu DeepSearch API
-    response = valyu.search(
-        finance_query
-    )
-    content=""
-    # Access results
-    for result in response.results:
-        content = result.content
-        # print(f"Title: {result.title}")
-        # print(f"URL: {result.url}")
-        # print(f"Content: {result.content}")
-
-    return f"[FINANCE SEARCH RESULTS for: {query}] ---> {content}"
-
-@traceable(name="summarizing_tool")
+    with timed_call("tool") as call:
+        call["input_bytes"] = len(finance_query.encode())
+        # Valyu DeepSearch API
+        response = get_caller("valyu").call(
+            get_valyu().search, finance_query
+        )
+        # keep every result, not just the last one
+        content = "\n\n".join(result.content for result in response.results if result.content)
+
+        output = f"[FINANCE SEARCH RESULTS for: {query}] ---> {content}"
+        call["output_bytes"] = len(output.encode())
+    return output
+
+@traced("search_results_tool", kind="tool")
+@recorded("search_results_tool", kind="tool")
+@tool_cache.cached("search_results_tool")
+def search_results_tool(query: str, max_results: int = 10) -> List[Dict[str, Any]]:
+    """One Valyu search, returned as structured results (backend/research.py fans these out)."""
+    with timed_call("tool") as call:
+        call["input_bytes"] = len(query.encode())
+        response = get_caller("valyu").call(
+            get_valyu().search, query, max_num_results=max_results
+        )
+        results = [
+            {
+                "title": getattr(r, "title", None),
+                "url": getattr(r, "url", None),
+                "content": r.content or "",
+                "relevance_score": getattr(r, "relevance_score", None),
+            }
+            for r in response.results
+        ]
+        call["output_bytes"] = sum(len(r["content"].encode()) for r in results)
+    return results
+
+@traced("summarizing_tool", kind="tool")
+@recorded("summarizing_tool", kind="tool")
+@tool_cache.cached("summarizing_tool")
 def summarize_tool(text: str) -> str:
 
-    response = valyu.answer(
-        text,
-        system_instructions="Summarize this"
-    )
+    with timed_call("tool") as call:
+        call["input_bytes"] = len(text.encode())
+        response = get_caller("valyu").call(
+            get_valyu().answer,
+            text,
+            system_instructions="Summarize this"
+        )
 
-    # Access the answer
-    summary = response.contents
+        # Access the answer
+        summary = response.contents
+        call["output_bytes"] = len(str(summary).encode())
 
     # Placeholder – later call LLM for summary
     return f"Summary of {text}: {summary}"
+
+
+# Async variants for backend/async_graph.py. The Valyu SDK is blocking only,
+# so the call runs on the default thread pool and the event loop stays free.
+@traced("web_search_tool_async", kind="tool")
+async def web_search_tool_async(query: str) -> str:
+    return await asyncio.to_thread(web_search_tool, query)
+
+@traced("search_results_tool_async", kind="tool")
+async def search_results_tool_async(query: str, max_results: int = 10) -> List[Dict[str, Any]]:
+    return await asyncio.to_thread(search_results_tool, query, max_results)
+
+@traced("summarizing_tool_async", kind="tool")
+async def summarize_tool_async(text: str) -> str:
+    return await asyncio.to_thread(summarize_tool, text)
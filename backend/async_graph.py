@@ -0,0 +1,252 @@
+# backend/async_graph.py
+# asyncio version of the plan -> research -> answer pipeline in backend/graph.py,
+# run as tasks on the node graph (backend/node_graph.py).
+# The LLM and search backends are injectable so batch runs can wrap them in
+# rate limiters and benchmarks can swap in local stand-ins.
+
+import asyncio
+import functools
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+from dotenv import load_dotenv
+from observability.tracing import traced
+from .config import AgentConfig, DEFAULT_CONFIG
+from .models import AgentState, StepLog
+from .speculation import AsyncSpeculativeSearch
+from .research import fan_out_search_async, format_results, sub_queries
+from .memory_delta import make_patch
+from .context_packing import pack_context
+from .checkpoint import RunCheckpoint
+from .node_graph import BudgetExceeded, Node, NodeGraph
+from .step_meta import collect_step_meta, resilience_log, step_timing, track_first_token
+from .prompts import plan_prompt, answer_prompt, NO_RESEARCH_CONTEXT
+from .router import RouteDecision, route_query, memory_wants_search
+
+LLMFn = Callable[[str], Awaitable[str]]  # streaming callers also pass on_token=TokenFn
+SearchFn = Callable[[str], Awaitable[str]]
+ResultsFn = Callable[..., Awaitable[List[Dict[str, Any]]]]  # (query, max_results=) -> structured results
+TokenFn = Callable[[str], None]
+
+load_dotenv()
+
+
+def default_llm() -> LLMFn:
+    from .llm import gemini_llm_async
+    return gemini_llm_async
+
+
+def default_search() -> SearchFn:
+    from .agent import web_search_tool_async
+    return web_search_tool_async
+
+
+def default_search_results() -> ResultsFn:
+    from .agent import search_results_tool_async
+    return search_results_tool_async
+
+
+# node 1: plan
+@traced("plan_node")
+async def plan_node(state: AgentState, llm: LLMFn, route: Optional[RouteDecision] = None) -> AgentState:
+    started = time.perf_counter()
+    memory_before = state.memory.copy()
+    if route is not None and route.confident:
+        # local router is sure either way: no planning LLM round trip
+        plan, tool, meta = route.explain(), "local router", {}
+        state.memory["route"] = "search" if route.search else "no_search"
+    else:
+        with collect_step_meta() as meta:
+            plan = await llm(plan_prompt(state.user_query))
+        tool = "planning tool"
+
+    state.memory["plan"] = plan
+
+    step = StepLog(
+        step_id=len(state.steps) + 1,
+        node="plan",
+        thought=plan,
+        tool=tool,
+        tool_input=None,
+        tool_output=None,
+        memory_patch=make_patch(memory_before, state.memory),
+        cache_hit=meta.get("cache_hit"),
+        timing=step_timing(meta, started),
+        resilience=resilience_log(meta),
+    )
+    state.steps.append(step)
+    return state
+
+# node 2: research
+@traced("research_node")
+async def research_node(
+    state: AgentState,
+    search: SearchFn,
+    speculative: Optional[AsyncSpeculativeSearch] = None,
+    fanout: bool = False,
+) -> AgentState:
+    """With `fanout`, `search` is a fan_out_search_async partial returning structured results."""
+    started = time.perf_counter()
+    memory_before = state.memory.copy()
+
+    if memory_wants_search(state.memory):
+        tool = "multi_search" if fanout else "web_search_tool"
+        tool_input = sub_queries(state.user_query) if fanout else state.user_query
+        speculation, meta, thought = None, {}, f"Using {tool} based on plan."
+        try:
+            if speculative is not None:
+                tool_output, speculation, meta = await speculative.take()
+            else:
+                with collect_step_meta() as meta:
+                    tool_output = await search(state.user_query)
+            # the answer prompt gets text; the step keeps the structured results
+            state.memory["research_raw"] = format_results(state.user_query, tool_output) if fanout else tool_output
+        except Exception as e:
+            # search still failing after retries: answer without research
+            # instead of losing the run; the step shows up in Error Replay
+            tool_output = f"[ERROR] {tool} failed: {type(e).__name__}: {e}"
+            thought = f"{tool} failed; answering without research."
+
+        step = StepLog(
+            step_id=len(state.steps) + 1,
+            node="research",
+            thought=thought,
+            tool=tool,
+            tool_input=tool_input,
+            tool_output=tool_output,
+            memory_patch=make_patch(memory_before, state.memory),
+            cache_hit=meta.get("cache_hit"),
+            speculation=speculation,
+            timing=step_timing(meta, started),
+            resilience=resilience_log(meta),
+        )
+    else:
+        speculation = speculative.discard() if speculative is not None else None
+        step = StepLog(
+            step_id=len(state.steps) + 1,
+            node="research",
+            thought="Skipping web search, plan said no.",
+            tool=None,
+            tool_input=None,
+            tool_output=None,
+            memory_patch=make_patch(memory_before, state.memory),
+            speculation=speculation,
+            timing=step_timing({}, started),
+        )
+    state.steps.append(step)
+    return state
+
+# node 3: answer
+@traced("answer_node")
+async def answer_node(
+    state: AgentState, llm: LLMFn, on_token: Optional[TokenFn] = None, config: AgentConfig = DEFAULT_CONFIG
+) -> AgentState:
+    started = time.perf_counter()
+    memory_before = state.memory.copy()
+
+    packing = None
+    if "research_raw" in state.memory:
+        # best passages for the query within the token budget (backend/context_packing.py)
+        context, packing = pack_context(state.user_query, state.memory["research_raw"], config.context_budget_tokens)
+    else:
+        context = NO_RESEARCH_CONTEXT
+    prompt = answer_prompt(state.user_query, context)
+    with collect_step_meta() as meta:
+        if on_token is not None:
+            # stream the answer; the step records time to the first chunk
+            answer = await llm(prompt, on_token=track_first_token(meta, started, on_token))
+        else:
+            answer = await llm(prompt)
+    state.final_answer = answer
+
+    step = StepLog(
+        step_id=len(state.steps) + 1,
+        node="answer",
+        thought="Generating final answer from context.",
+        tool="answer_tool",
+        tool_input=None,
+        tool_output=None,
+        memory_patch=make_patch(memory_before, state.memory),
+        cache_hit=meta.get("cache_hit"),
+        timing=step_timing(meta, started),
+        resilience=resilience_log(meta),
+        packing=packing,
+    )
+    state.steps.append(step)
+    return state
+
+
+@traced("run_agent")
+async def run_agent(
+    user_query: str,
+    llm: Optional[LLMFn] = None,
+    search: Optional[SearchFn] = None,
+    config: AgentConfig = DEFAULT_CONFIG,
+    on_token: Optional[TokenFn] = None,
+    search_results: Optional[ResultsFn] = None,
+    run_id: Optional[str] = None,
+    extra_nodes: Sequence[Node] = (),
+) -> AgentState:
+    """
+    Async run_agent. Defaults to Gemini + Valyu; pass `llm`/`search` to override
+    (`search_results` is the structured search used when config.research_fanout).
+    With `on_token`, answer chunks are passed to it as they arrive.
+    With `run_id`, state is checkpointed per node and an earlier attempt is resumed.
+    Nodes run on the node graph (backend/node_graph.py); `extra_nodes` are async nodes
+    placed between plan and answer, and the step/time budgets end a run early.
+    """
+    llm = llm or default_llm()
+    if config.research_fanout:
+        search = functools.partial(
+            fan_out_search_async, search=search_results or default_search_results(),
+            top_k=config.research_top_k, per_query=config.research_results_per_query,
+        )
+    else:
+        search = search or default_search()
+
+    speculative: Optional[AsyncSpeculativeSearch] = None
+
+    async def plan(state: AgentState) -> AgentState:
+        nonlocal speculative
+        route = route_query(user_query, config) if config.local_routing else None
+        # speculative mode: the search runs while the plan LLM call is in flight
+        # (pointless when the local router already settled the decision)
+        speculate = config.speculative_search and not (route is not None and route.confident)
+        speculative = AsyncSpeculativeSearch(search, user_query) if speculate else None
+        return await plan_node(state, llm, route)
+
+    graph = NodeGraph([
+        Node("plan", plan),
+        Node("research", lambda state: research_node(state, search, speculative, config.research_fanout),
+             deps=("plan",)),
+        *extra_nodes,
+        Node("answer", lambda state: answer_node(state, llm, on_token, config),
+             deps=("research", *(n.name for n in extra_nodes))),
+    ])
+
+    # checkpoint reads/writes are blocking SQLite calls: keep them off the event loop
+    run = await asyncio.to_thread(RunCheckpoint, run_id, user_query) if run_id else RunCheckpoint(None, user_query)
+
+    async def save(node: str, state: AgentState) -> None:
+        if run.store is None:
+            run.save(node, state)
+        else:
+            await asyncio.to_thread(run.save, node, state)
+
+    async def fail(e: BaseException) -> None:
+        if run.store is not None:
+            await asyncio.to_thread(run.fail, e)
+
+    if run.stopped:
+        return run.state
+    try:
+        return await graph.arun(
+            run.state, done=run.completed, on_finish=save,
+            max_steps=config.max_steps, time_budget=config.time_budget_seconds,
+        )
+    except BudgetExceeded as e:
+        if run.store is not None:
+            await asyncio.to_thread(run.stop, str(e), e.state)
+        return e.state
+    except Exception as e:
+        await fail(e)
+        raise
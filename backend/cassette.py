@@ -0,0 +1,344 @@
+# backend/cassette.py
+# Record/replay of LLM and tool calls ("cassettes") for offline runs.
+#
+# Functions decorated with @recorded (gemini_llm, the Valyu tools) consult the
+# active cassette first. In "record" mode the real call runs and its
+# request/response is appended; in "replay" mode the recorded response is
+# returned without touching the network, so run_agent, trace writing and the
+# dashboards run unchanged on a machine without API keys.
+#
+#   python -m backend.cassette record data/cassettes/demo.json "Tell me about NVDA"
+#   python -m backend.cassette replay data/cassettes/demo.json --repeat 100 --save
+#   python -m backend.cassette from-traces           # replay every saved trace
+#
+# GLASSMIND_CASSETTE=<path> with GLASSMIND_CASSETTE_MODE=record|replay turns a
+# cassette on for any entry point (batch.py, the Streamlit pages, ...).
+
+import asyncio
+import atexit
+import functools
+import os
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+
+from .step_meta import timed_call
+
+CASSETTE_VERSION = 1
+
+
+class CassetteMiss(LookupError):
+    """Replay found no recorded response for a call."""
+
+
+class Cassette:
+    """
+    Recorded calls keyed by (name, arguments). Identical calls are answered
+    in the order they were recorded. With strict=False a call whose arguments
+    were not recorded falls back to the next unused response of the same name
+    (used for cassettes rebuilt from saved traces, whose prompts may differ
+    from today's prompt templates).
+    """
+
+    def __init__(self, mode: str = "replay", path: Optional[Path] = None, strict: bool = True):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"unknown cassette mode {mode!r}")
+        self.mode = mode
+        self.path = Path(path) if path is not None else None
+        self.strict = strict
+        self.queries: List[str] = []
+        self.interactions: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._by_key: Dict[bytes, Deque[int]] = defaultdict(deque)
+        self._by_name: Dict[str, Deque[int]] = defaultdict(deque)
+        self._used: set = set()
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- persistence ----------
+
+    @classmethod
+    def load(cls, path: Path, mode: str = "replay", strict: bool = True) -> "Cassette":
+        data = orjson.loads(Path(path).read_bytes())
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"unsupported cassette version {data.get('version')}")
+        cassette = cls(mode, path, strict)
+        cassette.queries = data.get("queries", [])
+        for interaction in data["interactions"]:
+            cassette._add(interaction)
+        return cassette
+
+    def save(self, path: Optional[Path] = None) -> Path:
+        path = Path(path or self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            data = {"version": CASSETTE_VERSION, "queries": self.queries, "interactions": self.interactions}
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        os.replace(tmp, path)
+        return path
+
+    # ---------- recording / replaying ----------
+
+    @staticmethod
+    def key(name: str, args: Tuple, kwargs: Dict[str, Any]) -> bytes:
+        return orjson.dumps([name, list(args), kwargs], option=orjson.OPT_SORT_KEYS)
+
+    def _add(self, interaction: Dict[str, Any]) -> None:
+        idx = len(self.interactions)
+        self.interactions.append(interaction)
+        self._by_key[self.key(interaction["name"], interaction["args"], interaction["kwargs"])].append(idx)
+        self._by_name[interaction["name"]].append(idx)
+
+    def record(self, name: str, args: Tuple, kwargs: Dict[str, Any], response: Any) -> None:
+        with self._lock:
+            self._add({"name": name, "args": list(args), "kwargs": kwargs, "response": response})
+
+    def lookup(self, name: str, args: Tuple, kwargs: Dict[str, Any]) -> Any:
+        with self._lock:
+            idx = self._next(self._by_key.get(self.key(name, args, kwargs)))
+            if idx is None and not self.strict:
+                idx = self._next(self._by_name.get(name))
+            if idx is None:
+                self.misses += 1
+                preview = repr(args)[:120]
+                raise CassetteMiss(f"no recorded {name} call for {preview}")
+            self._used.add(idx)
+            self.hits += 1
+            return self.interactions[idx]["response"]
+
+    def _next(self, candidates: Optional[Deque[int]]) -> Optional[int]:
+        while candidates:
+            idx = candidates.popleft()
+            if idx not in self._used:
+                return idx
+        return None
+
+    def add_query(self, query: str) -> None:
+        with self._lock:
+            if query not in self.queries:
+                self.queries.append(query)
+
+    def rewind(self) -> None:
+        """Make every recorded response available again (for repeated replays)."""
+        with self._lock:
+            interactions, self.interactions = self.interactions, []
+            self._by_key.clear()
+            self._by_name.clear()
+            self._used.clear()
+            for interaction in interactions:
+                self._add(interaction)
+
+
+_active: Optional[Cassette] = None
+_env_checked = False
+
+
+def active_cassette() -> Optional[Cassette]:
+    global _active, _env_checked
+    if not _env_checked:
+        _env_checked = True
+        path = os.getenv("GLASSMIND_CASSETTE")
+        if path and _active is None:
+            mode = os.getenv("GLASSMIND_CASSETTE_MODE", "replay")
+            if mode == "replay":
+                _active = Cassette.load(Path(path))
+            else:
+                _active = Cassette("record", Path(path))
+                atexit.register(_active.save)
+    return _active
+
+
+@contextmanager
+def use_cassette(cassette: Cassette) -> Iterator[Cassette]:
+    """
+    Activate `cassette` for every recorded call in the process (all threads),
+    saving it on exit when recording.
+    """
+    global _active
+    previous, _active = active_cassette(), cassette
+    try:
+        yield cassette
+    finally:
+        _active = previous
+        if cassette.mode == "record" and cassette.path is not None:
+            cassette.save()
+
+
+def recorded(name: str, kind: str, stream_arg: Optional[str] = None) -> Callable:
+    """
+    Route calls through the active cassette. `kind` ("llm" or "tool") is the
+    step timing bucket a replayed call is reported in; `name` is shared by sync
+    and async twins so either can replay the other's recording.
+    `stream_arg` names a chunk callback argument: it is left out of the
+    recording key, and a replayed response is passed to it as one chunk.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        def _split(kwargs) -> Tuple[Dict[str, Any], Optional[Callable[[str], None]]]:
+            if stream_arg is None or stream_arg not in kwargs:
+                return kwargs, None
+            kwargs = dict(kwargs)
+            return kwargs, kwargs.pop(stream_arg)
+
+        def _replay(args, kwargs, cassette: Cassette) -> Any:
+            kwargs, on_chunk = _split(kwargs)
+            with timed_call(kind) as call:
+                response = cassette.lookup(name, args, kwargs)
+                call["output_bytes"] = len(str(response).encode())
+            if on_chunk is not None:
+                on_chunk(response)
+            return response
+
+        def _record(args, kwargs, cassette: Cassette, response: Any) -> None:
+            cassette.record(name, args, _split(kwargs)[0], response)
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                cassette = active_cassette()
+                if cassette is None:
+                    return await fn(*args, **kwargs)
+                if cassette.mode == "replay":
+                    return _replay(args, kwargs, cassette)
+                response = await fn(*args, **kwargs)
+                _record(args, kwargs, cassette, response)
+                return response
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            cassette = active_cassette()
+            if cassette is None:
+                return fn(*args, **kwargs)
+            if cassette.mode == "replay":
+                return _replay(args, kwargs, cassette)
+            response = fn(*args, **kwargs)
+            _record(args, kwargs, cassette, response)
+            return response
+        return wrapper
+
+    return decorator
+
+
+# ---------- cassettes from saved traces ----------
+
+def cassette_from_trace(trace: Dict[str, Any]) -> Cassette:
+    """
+    Rebuild the LLM and tool responses of one saved trace: the plan (when the
+    planning LLM ran), the search output and the final answer. Prompts are
+    rebuilt with today's templates; the cassette is non-strict so a changed
+    template still replays.
+    """
+    from .prompts import plan_prompt, answer_prompt, NO_RESEARCH_CONTEXT
+    from .research import format_results
+
+    query = trace["user_query"]
+    cassette = Cassette("replay", strict=False)
+    cassette.queries = [query]
+    context = NO_RESEARCH_CONTEXT
+    for step in trace["steps"]:
+        if step["node"] == "plan" and step.get("tool") == "planning tool":
+            cassette.record("gemini_llm", (plan_prompt(query),), {}, step["thought"])
+        elif step["node"] == "research" and step.get("tool") == "web_search_tool":
+            cassette.record("web_search_tool", (step["tool_input"],), {}, step["tool_output"])
+            context = step["tool_output"]
+        elif step["node"] == "research" and step.get("tool") == "multi_search" \
+                and isinstance(step.get("tool_output"), dict):
+            # only the merged results were kept: every sub-query replays them,
+            # which merges back to the same ranking
+            kept = [{k: r.get(k) for k in ("title", "url", "content", "relevance_score")}
+                    for r in step["tool_output"]["results"]]
+            for sub_query in step["tool_input"].values():
+                cassette.record("search_results_tool", (sub_query,), {"max_results": len(kept)}, kept)
+            context = format_results(query, step["tool_output"])
+    if trace.get("final_answer") is not None:
+        cassette.record("gemini_llm", (answer_prompt(query, context),), {}, trace["final_answer"])
+    return cassette
+
+
+def replayable(trace: Dict[str, Any]) -> bool:
+    """False for runs that never reached the answer node (budget stops, crashes): nothing to replay it from."""
+    return any(s["node"] == "answer" for s in trace["steps"])
+
+
+def replay_trace(trace: Dict[str, Any], config=None):
+    """Re-run a saved trace's query through backend.graph.run_agent offline."""
+    from .config import DEFAULT_CONFIG
+    from .graph import run_agent
+
+    if not replayable(trace):
+        raise ValueError(f"trace for {trace['user_query'][:60]!r} has no answer step to replay")
+    config = config or DEFAULT_CONFIG
+    # run the same pipeline the trace recorded, so every call finds its response
+    if any(s.get("tool") == "multi_search" for s in trace["steps"]):
+        config = config.model_copy(update={"research_fanout": True})
+    if any(s["node"] == "plan" and s.get("tool") == "local router" for s in trace["steps"]):
+        config = config.model_copy(update={"local_routing": True})
+    with use_cassette(cassette_from_trace(trace)):
+        return run_agent(trace["user_query"], config)
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+    import time
+
+    parser = argparse.ArgumentParser(description="Record and replay LLM/tool calls.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    rec = sub.add_parser("record", help="run queries live and record every call")
+    rec.add_argument("path", type=Path)
+    rec.add_argument("queries", nargs="+")
+    rep = sub.add_parser("replay", help="re-run a cassette's queries offline")
+    rep.add_argument("path", type=Path)
+    rep.add_argument("--repeat", type=int, default=1)
+    rep.add_argument("--save", action="store_true", help="also write traces (to a temp dir)")
+    ft = sub.add_parser("from-traces", help="replay every saved trace offline")
+    ft.add_argument("--dir", type=Path, default=None)
+    args = parser.parse_args()
+
+    # run as __main__, this file is a second copy of the module: use the one
+    # the decorated functions see
+    from backend.cassette import Cassette, replay_trace, replayable, use_cassette
+    from backend.graph import run_agent
+
+    if args.cmd == "record":
+        cassette = Cassette("record", args.path)
+        with use_cassette(cassette):
+            for q in args.queries:
+                cassette.add_query(q)
+                run_agent(q)
+        print(f"recorded {len(cassette.interactions)} calls to {args.path}")
+
+    elif args.cmd == "replay":
+        from analysis.traces_loader import save_trace, make_trace_name
+
+        cassette = Cassette.load(args.path)
+        with tempfile.TemporaryDirectory() as tmp, use_cassette(cassette):
+            start = time.perf_counter()
+            runs = 0
+            for _ in range(args.repeat):
+                cassette.rewind()
+                for q in cassette.queries:
+                    state = run_agent(q)
+                    if args.save:
+                        save_trace(state, make_trace_name(q), Path(tmp))
+                    runs += 1
+            elapsed = time.perf_counter() - start
+        print(f"{runs} runs in {elapsed:.3f}s ({elapsed / max(runs, 1) * 1e3:.2f} ms/run), "
+              f"{cassette.hits} replayed calls, {cassette.misses} misses")
+
+    else:
+        from analysis.traces_loader import load_traces
+
+        for trace in load_traces(args.dir):
+            if not replayable(trace):
+                print(f"skip {trace['user_query'][:60]!r} (stopped before the answer)")
+                continue
+            state = replay_trace(trace)
+            same = state.final_answer == trace.get("final_answer")
+            print(f"{'ok  ' if same else 'DIFF'} {trace['user_query'][:60]!r}")
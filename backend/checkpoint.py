@@ -0,0 +1,264 @@
+# backend/checkpoint.py
+# Per-node checkpoints of AgentState, keyed by run id.
+#
+# run_agent(..., run_id=...) saves the state after every node. Called again
+# with the same run id after a failure or a crash, it starts from the first
+# node that did not finish, so the planning call and the search are not paid
+# for twice. A run whose trace was saved is marked with the trace name, which
+# lets batch.py skip it entirely on a rerun.
+#
+# One SQLite file (WAL, a connection per thread and process, like the LLM
+# cache); the state is stored as zstd-compressed JSON. langgraph-checkpoint is
+# pinned, but its SQLite saver ships in a separate package and expects a
+# compiled langgraph graph, so the store is kept local and small.
+#
+#   python -m backend.checkpoint list
+#   python -m backend.checkpoint resume      # finish every interrupted run, save traces
+#   python -m backend.checkpoint prune
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+import zstandard
+
+from .config import CheckpointConfig, DEFAULT_CHECKPOINT_CONFIG
+from .models import AgentState
+
+NODES = ("plan", "research", "answer")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    user_query TEXT NOT NULL,
+    status TEXT NOT NULL,            -- running | failed | cancelled | stopped (by the run budget) | done
+    completed TEXT NOT NULL,         -- JSON list of finished nodes
+    state BLOB,                      -- zstd(JSON AgentState) after the last finished node
+    error TEXT,
+    trace_name TEXT,                 -- set once the finished run's trace was saved
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_status ON runs(status);
+"""
+
+
+class Checkpoint:
+    def __init__(self, run_id: str, user_query: str, status: str, completed: List[str],
+                 state: Optional[AgentState], error: Optional[str], trace_name: Optional[str]):
+        self.run_id = run_id
+        self.user_query = user_query
+        self.status = status
+        self.completed = completed
+        self.state = state
+        self.error = error
+        self.trace_name = trace_name
+
+
+class CheckpointStore:
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def start(self, run_id: str, user_query: str) -> None:
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR IGNORE INTO runs VALUES (?, ?, 'running', '[]', NULL, NULL, NULL, ?, ?)",
+            (run_id, user_query, now, now),
+        )
+
+    def save(self, run_id: str, state: AgentState, completed: List[str]) -> None:
+        status = "done" if completed[-1] == NODES[-1] else "running"
+        blob = zstandard.compress(state.model_dump_json().encode())
+        self._conn().execute(
+            "UPDATE runs SET status = ?, completed = ?, state = ?, error = NULL, updated_at = ? WHERE run_id = ?",
+            (status, orjson.dumps(completed), blob, time.time(), run_id),
+        )
+
+    def fail(self, run_id: str, error: BaseException) -> None:
+        self._conn().execute(
+            "UPDATE runs SET status = 'failed', error = ?, updated_at = ? WHERE run_id = ?",
+            (f"{type(error).__name__}: {error}", time.time(), run_id),
+        )
+
+    def cancel(self, run_id: str) -> None:
+        """Cancelled by the user: kept for an explicit resume, never picked up by `resume`."""
+        self._conn().execute(
+            "UPDATE runs SET status = 'cancelled', error = 'cancelled', updated_at = ? WHERE run_id = ?",
+            (time.time(), run_id),
+        )
+
+    def stop(self, run_id: str, reason: str, state: AgentState) -> None:
+        """A budget stop is final: the partial state is what the run produced, resuming would not change it."""
+        blob = zstandard.compress(state.model_dump_json().encode())
+        self._conn().execute(
+            "UPDATE runs SET status = 'stopped', state = ?, error = ?, updated_at = ? WHERE run_id = ?",
+            (blob, reason, time.time(), run_id),
+        )
+
+    def mark_saved(self, run_id: str, trace_name: str) -> None:
+        self._conn().execute(
+            "UPDATE runs SET trace_name = ?, updated_at = ? WHERE run_id = ?", (trace_name, time.time(), run_id)
+        )
+
+    def load(self, run_id: str) -> Optional[Checkpoint]:
+        row = self._conn().execute(
+            "SELECT run_id, user_query, status, completed, state, error, trace_name FROM runs WHERE run_id = ?",
+            (run_id,),
+        ).fetchone()
+        return _checkpoint(row) if row is not None else None
+
+    def unfinished(self, prefix: str = "") -> List[Checkpoint]:
+        """
+        Runs that did not finish, or finished (or were stopped) without a saved
+        trace. Runs the user cancelled are left out.
+        """
+        rows = self._conn().execute(
+            "SELECT run_id, user_query, status, completed, state, error, trace_name FROM runs "
+            "WHERE (status NOT IN ('done', 'stopped') OR trace_name IS NULL) AND status != 'cancelled' "
+            "AND run_id LIKE ? ORDER BY created_at",
+            (prefix + "%",),
+        ).fetchall()
+        return [_checkpoint(r) for r in rows]
+
+    def delete(self, prefix: str) -> int:
+        """Forget every run whose id starts with `prefix`."""
+        return self._conn().execute("DELETE FROM runs WHERE run_id LIKE ?", (prefix + "%",)).rowcount
+
+    def prune(self, older_than_seconds: float) -> int:
+        """Drop saved runs last touched more than `older_than_seconds` ago."""
+        cutoff = time.time() - older_than_seconds
+        return self._conn().execute(
+            "DELETE FROM runs WHERE trace_name IS NOT NULL AND updated_at < ?", (cutoff,)
+        ).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._conn().execute(
+            "SELECT CASE WHEN trace_name IS NOT NULL THEN 'saved' ELSE status END, COUNT(*) FROM runs GROUP BY 1"
+        ).fetchall()
+        return dict(rows)
+
+
+def _checkpoint(row: Tuple) -> Checkpoint:
+    run_id, user_query, status, completed, blob, error, trace_name = row
+    state = AgentState.model_validate_json(zstandard.decompress(blob)) if blob is not None else None
+    return Checkpoint(run_id, user_query, status, orjson.loads(completed), state, error, trace_name)
+
+
+_store: Optional[CheckpointStore] = None
+_store_lock = threading.Lock()
+
+
+def get_checkpoint_store(config: CheckpointConfig = DEFAULT_CHECKPOINT_CONFIG) -> CheckpointStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CheckpointStore(config.path)
+    return _store
+
+
+class RunCheckpoint:
+    """
+    The checkpoint of one run as seen by run_agent. Without a run id nothing
+    is stored and every node runs, so run_agent uses the same code either way.
+    """
+
+    def __init__(self, run_id: Optional[str], user_query: str, store: Optional[CheckpointStore] = None):
+        self.run_id = run_id
+        if run_id is None:
+            store = None
+        elif store is None:
+            store = get_checkpoint_store()
+        self.store = store
+        self.completed: List[str] = []
+        self.stopped = False  # the run already ended at its budget: run_agent returns the saved state
+        self.state = AgentState(user_query=user_query)
+        if self.store is None:
+            return
+        existing = self.store.load(run_id)
+        if existing is None:
+            self.store.start(run_id, user_query)
+            return
+        if existing.user_query != user_query:
+            raise ValueError(f"run {run_id!r} was started for a different query: {existing.user_query!r}")
+        if existing.state is not None:
+            self.state = existing.state
+            self.completed = existing.completed
+        self.stopped = existing.status == "stopped"
+
+    def done(self, node: str) -> bool:
+        return node in self.completed
+
+    def save(self, node: str, state: AgentState) -> None:
+        self.completed.append(node)
+        self.state = state
+        if self.store is not None:
+            self.store.save(self.run_id, state, self.completed)
+
+    def fail(self, error: BaseException) -> None:
+        if self.store is not None:
+            self.store.fail(self.run_id, error)
+
+    def stop(self, reason: str, state: AgentState) -> None:
+        if self.store is not None:
+            self.store.stop(self.run_id, reason, state)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect and resume checkpointed agent runs.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="run counts by status, then the unfinished runs")
+    res = sub.add_parser("resume", help="finish unfinished runs and save their traces")
+    res.add_argument("--prefix", default="", help="only runs whose id starts with this")
+    prn = sub.add_parser("prune", help="drop saved runs past the retention period")
+    prn.add_argument("--older-than-days", type=float, default=None)
+    args = parser.parse_args()
+
+    # run as __main__, this file is a second copy of the module: use the one
+    # backend.graph uses
+    from backend.checkpoint import get_checkpoint_store
+
+    store = get_checkpoint_store()
+    if args.cmd == "list":
+        print(store.counts())
+        for cp in store.unfinished():
+            print(f"{cp.status:<8} {cp.run_id:<40} done={','.join(cp.completed) or '-':<22} "
+                  f"{cp.user_query[:50]!r} {cp.error or ''}")
+    elif args.cmd == "resume":
+        from analysis.traces_loader import make_trace_name, save_trace
+        from backend.graph import run_agent
+
+        for cp in store.unfinished(args.prefix):
+            try:
+                state = run_agent(cp.user_query, run_id=cp.run_id)
+            except Exception as e:
+                print(f"[checkpoint] {cp.run_id} failed again: {e}")
+                continue
+            trace_name = make_trace_name(cp.user_query)
+            save_trace(state, trace_name)
+            store.mark_saved(cp.run_id, trace_name)
+            print(f"{cp.run_id}: resumed after {','.join(cp.completed) or 'nothing'}, saved {trace_name}")
+    else:
+        days = args.older_than_days
+        seconds = days * 24 * 3600 if days is not None else DEFAULT_CHECKPOINT_CONFIG.retention_seconds
+        print(f"pruned {store.prune(seconds)} runs")
@@ -1,7 +1,102 @@
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 class AgentConfig(BaseModel):
     enable_search_threshold: float = 0.4  # probability or heuristic
-    max_steps: int = 10
+    max_steps: int = 10  # steps per run; enforced by backend/node_graph.py
+    time_budget_seconds: Optional[float] = None  # wall-clock limit per run; no node starts after it
+    local_routing: bool = False  # let backend/router.py skip the planning LLM when confident
+    router_margin: float = 0.25  # |p - threshold| below this is ambiguous -> ask the LLM
+    speculative_search: bool = False  # start web search alongside the planning call
+    research_fanout: bool = False  # parallel sub-queries (backend/research.py) instead of one search
+    research_top_k: int = 8  # merged results kept for the answer
+    research_results_per_query: int = 10
+    context_budget_tokens: Optional[int] = None  # pack research into this many tokens (e.g. 3000); None: all of it
 
 DEFAULT_CONFIG = AgentConfig()
+
+class BatchConfig(BaseModel):
+    concurrency: int = 32  # agent runs in flight at once
+    llm_rps: float = 10.0  # Gemini requests per second across the batch
+    llm_burst: int = 10
+    search_rps: float = 5.0  # Valyu requests per second across the batch
+    search_burst: int = 5
+
+DEFAULT_BATCH_CONFIG = BatchConfig()
+
+class LLMCacheConfig(BaseModel):
+    enabled: bool = True
+    path: str = "data/cache/llm_cache.sqlite"
+    max_bytes: int = 256 * 1024 * 1024  # size cap, least recently used entries go first
+    ttl_seconds: float = 24 * 3600  # entries older than this are never served
+
+DEFAULT_LLM_CACHE_CONFIG = LLMCacheConfig()
+
+class ToolCacheConfig(BaseModel):
+    enabled: bool = True
+    # per-tool time to live; tools not listed (or with ttl <= 0) are only coalesced
+    ttl_seconds: Dict[str, float] = {
+        "web_search_tool": 15 * 60,
+        "search_results_tool": 15 * 60,
+        "summarizing_tool": 60 * 60,
+    }
+    max_entries: int = 10_000
+
+DEFAULT_TOOL_CACHE_CONFIG = ToolCacheConfig()
+
+class TraceStoreConfig(BaseModel):
+    path: str = "data/trace_store"
+    segment_max_bytes: int = 64 * 1024 * 1024  # roll to a new segment past this size
+    compact_below_live_ratio: float = 0.5  # rewrite sealed segments that are mostly dead
+    retention_max_age_seconds: Optional[float] = None  # drop traces older than this
+    retention_max_bytes: Optional[int] = None  # drop oldest segments past this total
+    maintenance_interval_seconds: float = 300.0
+
+DEFAULT_TRACE_STORE_CONFIG = TraceStoreConfig()
+
+class TracingConfig(BaseModel):
+    enabled: bool = True  # False: traced() calls the function directly
+    sample_rate: float = 1.0  # head-based: decided once per root span, children follow
+    ring_size: int = 4096  # most recent finished spans kept in memory
+    exporters: List[str] = ["jsonl"]  # "jsonl", "langsmith"
+    jsonl_path: str = "data/spans/spans.jsonl"
+    max_queue: int = 8192  # spans waiting per exporter before the drop policy applies
+    drop_policy: str = "drop_newest"  # or "drop_oldest"
+    batch_size: int = 512
+    flush_interval_seconds: float = 1.0
+
+DEFAULT_TRACING_CONFIG = TracingConfig()
+
+class ResilienceConfig(BaseModel):
+    max_attempts: int = 3  # first try + retries
+    backoff_initial_seconds: float = 0.5  # full-jitter exponential backoff between attempts
+    backoff_max_seconds: float = 8.0
+    # per-attempt deadline by provider; providers not listed use default_deadline_seconds
+    deadline_seconds: Dict[str, float] = {"gemini": 60.0, "valyu": 30.0}
+    default_deadline_seconds: float = 30.0
+    pool_size: int = 32  # worker threads per provider for sync calls (hung calls stay on their own pool)
+    hedge: bool = True  # send a duplicate request once the first one is slower than usual
+    hedge_percentile: float = 0.95  # of recent successful latencies
+    hedge_min_samples: int = 20  # no hedging until this many latencies were seen
+    hedge_min_delay_seconds: float = 0.2
+    breaker_failure_threshold: int = 5  # consecutive failed attempts that open the circuit
+    breaker_reset_seconds: float = 30.0  # then one trial call is let through
+
+DEFAULT_RESILIENCE_CONFIG = ResilienceConfig()
+
+class CheckpointConfig(BaseModel):
+    path: str = "data/checkpoints/checkpoints.sqlite"
+    retention_seconds: float = 7 * 24 * 3600  # finished runs older than this are pruned
+
+DEFAULT_CHECKPOINT_CONFIG = CheckpointConfig()
+
+class JobServiceConfig(BaseModel):
+    path: str = "data/jobs/jobs.sqlite"
+    workers: int = 8  # agent runs in flight at once
+    llm_concurrency: int = 4  # Gemini calls in flight across all workers
+    search_concurrency: int = 4  # Valyu calls in flight across all workers
+    max_queued: int = 1000  # submit() refuses new jobs past this many waiting
+    poll_seconds: float = 0.25  # idle workers, cancel checks and answer progress writes
+    retention_seconds: float = 7 * 24 * 3600  # finished jobs older than this are pruned
+
+DEFAULT_JOB_SERVICE_CONFIG = JobServiceConfig()
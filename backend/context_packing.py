@@ -0,0 +1,140 @@
+# backend/context_packing.py
+# Token-budgeted context for the answer prompt. The research text is split into
+# passages, ranked against the user query with BM25 (local, no network), and
+# the best passages are packed into the budget. Kept passages stay in their
+# original order so the prompt reads like the source.
+#
+#   context, log = pack_context(user_query, research_raw, budget_tokens=3000)
+
+import math
+import re
+import time
+from collections import Counter
+from typing import Iterator, List, Optional, Tuple
+
+from .models import PackingLog, PassageLog
+
+HEADER = re.compile(r"^\[FINANCE SEARCH RESULTS for: .*?\] ---> ", re.S)
+MAX_PASSAGE_CHARS = 1200  # longer paragraphs are cut at sentence ends
+MIN_PASSAGE_CHARS = 80  # shorter ones (titles, list stubs) join the next paragraph
+PREVIEW_CHARS = 60
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its me of on or our so that the "
+    "their this to was were what when which who will with about tell do does should".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4  # ~4 characters per token, as in the step timing
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS]
+
+
+def _windows(text: str) -> Iterator[str]:
+    # text with no sentence ends (tables, JSON dumps): cut at a space near the limit
+    while len(text) > MAX_PASSAGE_CHARS:
+        cut = text.rfind(" ", 0, MAX_PASSAGE_CHARS)
+        if cut < MAX_PASSAGE_CHARS // 2:
+            cut = MAX_PASSAGE_CHARS
+        yield text[:cut]
+        text = text[cut:].lstrip()
+    if text:
+        yield text
+
+
+def split_passages(text: str) -> List[str]:
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    passages: List[str] = []
+    carry = ""
+    for para in paragraphs:
+        para = f"{carry}\n{para}" if carry else para
+        carry = ""
+        if len(para) < MIN_PASSAGE_CHARS:
+            carry = para
+            continue
+        if len(para) <= MAX_PASSAGE_CHARS:
+            passages.append(para)
+            continue
+        chunk = ""
+        sentences = (w for sentence in re.split(r"(?<=[.!?])\s+", para) for w in _windows(sentence))
+        for sentence in sentences:
+            if chunk and len(chunk) + len(sentence) + 1 > MAX_PASSAGE_CHARS:
+                passages.append(chunk)
+                chunk = ""
+            chunk = f"{chunk} {sentence}" if chunk else sentence
+        if chunk:
+            passages.append(chunk)
+    if carry:
+        passages.append(carry)
+    return passages
+
+
+class BM25:
+    """Okapi BM25 over a fixed list of passages."""
+
+    def __init__(self, passages: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = [Counter(tokenize(p)) for p in passages]
+        self.lengths = [sum(d.values()) for d in self.docs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        df: Counter = Counter()
+        for d in self.docs:
+            df.update(d.keys())
+        n = len(self.docs)
+        self.idf = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+
+    def scores(self, query: str) -> List[float]:
+        terms = [t for t in set(tokenize(query)) if t in self.idf]
+        out = []
+        for doc, length in zip(self.docs, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            out.append(sum(
+                self.idf[t] * doc[t] * (self.k1 + 1) / (doc[t] + norm) for t in terms if t in doc
+            ))
+        return out
+
+
+def pack_context(query: str, research: str, budget_tokens: Optional[int]) -> Tuple[str, Optional[PackingLog]]:
+    """
+    Research text cut down to `budget_tokens`, best BM25 passages first.
+    Returns the text unchanged (and no log) when there is no budget.
+    """
+    if budget_tokens is None:
+        return research, None
+    start = time.perf_counter()
+    match = HEADER.match(research)
+    header = match.group(0) if match else ""
+    passages = split_passages(research[len(header):])
+    scores = BM25(passages).scores(query)
+    tokens = [estimate_tokens(p) for p in passages]
+
+    used = estimate_tokens(header)
+    kept = set()
+    # highest score first; a passage that does not fit is skipped, smaller ones may still fit
+    for i in sorted(range(len(passages)), key=lambda i: (-scores[i], i)):
+        if used + tokens[i] <= budget_tokens:
+            kept.add(i)
+            used += tokens[i]
+
+    original = estimate_tokens(research)
+    if len(kept) == len(passages):
+        context = research  # everything fits: the prompt stays byte-identical
+    else:
+        context = header + "\n\n".join(p for i, p in enumerate(passages) if i in kept)
+    packed = estimate_tokens(context)
+    log = PackingLog(
+        budget_tokens=budget_tokens,
+        original_tokens=original,
+        packed_tokens=packed,
+        saved_tokens=max(0, original - packed),
+        seconds=time.perf_counter() - start,
+        passages=[
+            PassageLog(index=i, tokens=tokens[i], score=round(scores[i], 4), kept=i in kept,
+                       preview=p[:PREVIEW_CHARS])
+            for i, p in enumerate(passages)
+        ],
+    )
+    return context, log
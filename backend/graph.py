@@ -1,33 +1,40 @@
 # backend/graph.py
 
-from typing import Dict, Any
+import functools
+import time
+from typing import Dict, Any, Callable, Optional, Sequence, Tuple
+from .config import AgentConfig, DEFAULT_CONFIG
 from .models import AgentState, StepLog
 from .agent import web_search_tool, summarize_tool
-from .llm import gemini_llm 
-from langsmith import Client
-from langsmith import traceable
+from .llm import TokenFn, gemini_llm
+from .speculation import SpeculativeSearch
+from .research import fan_out_search, format_results, sub_queries
+from .memory_delta import make_patch
+from .context_packing import pack_context
+from .checkpoint import RunCheckpoint
+from .node_graph import BudgetExceeded, Node, NodeGraph
+from .step_meta import collect_step_meta, resilience_log, step_timing, track_first_token
+from .prompts import plan_prompt, answer_prompt, NO_RESEARCH_CONTEXT
+from .router import RouteDecision, route_query, memory_wants_search
+from observability.tracing import traced
 # load_env.py
 from dotenv import load_dotenv
 load_dotenv()
-# load langsmith
-client = Client()
 
 # node 1: plan
-@traceable(name="plan_node")
-def plan_node(state: AgentState) -> AgentState:
+@traced("plan_node")
+def plan_node(state: AgentState, route: Optional[RouteDecision] = None) -> AgentState:
+    started = time.perf_counter()
     memory_before = state.memory.copy()
-    prompt = (
-        "You are an **investment research assistant**. "
-        "The user will ask about stocks, ETFs, sectors, or macro topics.\n\n"
-        f"User query: {state.user_query}\n\n"
-        "Decide if you need web search to answer this.\n"
-        "Think step by step about:\n"
-        "- What assets or tickers are involved\n"
-        "- Time horizon (short term / long term)\n"
-        "- Key risk factors or metrics to look up\n"
-        "Then say clearly whether you will SEARCH or NOT SEARCH."
-    )
-    plan = gemini_llm(prompt) 
+    if route is not None and route.confident:
+        # local router is sure either way: no planning LLM round trip
+        plan, tool, meta = route.explain(), "local router", {}
+        state.memory["route"] = "search" if route.search else "no_search"
+    else:
+        prompt = plan_prompt(state.user_query)
+        with collect_step_meta() as meta:
+            plan = gemini_llm(prompt)
+        tool = "planning tool"
 
     state.memory["plan"] = plan
 
@@ -35,11 +42,13 @@ def plan_node(state: AgentState) -> AgentState:
         step_id=len(state.steps) + 1,
         node="plan",
         thought=plan,
-        tool="planning tool",
+        tool=tool,
         tool_input=None,
         tool_output=None,
-        memory_before=memory_before,
-        memory_after=state.memory.copy(),
+        memory_patch=make_patch(memory_before, state.memory),
+        cache_hit=meta.get("cache_hit"),
+        timing=step_timing(meta, started),
+        resilience=resilience_log(meta),
     )
     state.steps.append(step)
     
@@ -47,31 +56,63 @@ def plan_node(state: AgentState) -> AgentState:
     return {
         "node": "plan",
         "thought": plan,
-        "tool": "planning tool",
+        "tool": tool,
         "memory_after": state.memory,
     }, state
 
-@traceable(name="research_node")
-def research_node(state: AgentState) -> AgentState:
+def research_search(config: AgentConfig) -> Tuple[str, Callable[[str], Any]]:
+    """(tool name, search function) for the configured research mode."""
+    if config.research_fanout:
+        return "multi_search", functools.partial(
+            fan_out_search, top_k=config.research_top_k, per_query=config.research_results_per_query
+        )
+    return "web_search_tool", web_search_tool
+
+@traced("research_node")
+def research_node(
+    state: AgentState,
+    speculative: Optional[SpeculativeSearch] = None,
+    config: AgentConfig = DEFAULT_CONFIG,
+) -> AgentState:
+    started = time.perf_counter()
     memory_before = state.memory.copy()
 
-    if "search" in state.memory.get("plan", "").lower():
-        tool_input = state.user_query
-        tool_output = web_search_tool(tool_input)
-        state.memory["research_raw"] = tool_output
+    if memory_wants_search(state.memory):
+        tool, search = research_search(config)
+        tool_input = sub_queries(state.user_query) if config.research_fanout else state.user_query
+        speculation, meta, thought = None, {}, f"Using {tool} based on plan."
+        try:
+            if speculative is not None:
+                tool_output, speculation, meta = speculative.take()
+            else:
+                with collect_step_meta() as meta:
+                    tool_output = search(state.user_query)
+            # the answer prompt gets text; the step keeps the structured results
+            state.memory["research_raw"] = (
+                format_results(state.user_query, tool_output) if config.research_fanout else tool_output
+            )
+        except Exception as e:
+            # search still failing after retries: answer without research
+            # instead of losing the run; the step shows up in Error Replay
+            tool_output = f"[ERROR] {tool} failed: {type(e).__name__}: {e}"
+            thought = f"{tool} failed; answering without research."
 
         step = StepLog(
             step_id=len(state.steps) + 1,
             node="research",
-            thought="Using web_search_tool based on plan.",
-            tool="web_search_tool",
+            thought=thought,
+            tool=tool,
             tool_input=tool_input,
             tool_output=tool_output,
-            memory_before=memory_before,
-            memory_after=state.memory.copy(),
+            memory_patch=make_patch(memory_before, state.memory),
+            cache_hit=meta.get("cache_hit"),
+            speculation=speculation,
+            timing=step_timing(meta, started),
+            resilience=resilience_log(meta),
         )
         state.steps.append(step)
     else:
+        speculation = speculative.discard() if speculative is not None else None
         step = StepLog(
             step_id=len(state.steps) + 1,
             node="research",
@@ -79,31 +120,33 @@ def research_node(state: AgentState) -> AgentState:
             tool=None,
             tool_input=None,
             tool_output=None,
-            memory_before=memory_before,
-            memory_after=state.memory.copy(),
+            memory_patch=make_patch(memory_before, state.memory),
+            speculation=speculation,
+            timing=step_timing({}, started),
         )
         state.steps.append(step)
     return state
 
-@traceable(name="answer_node")
-def answer_node(state: AgentState) -> AgentState:
+@traced("answer_node")
+def answer_node(
+    state: AgentState, on_token: Optional[TokenFn] = None, config: AgentConfig = DEFAULT_CONFIG
+) -> AgentState:
+    started = time.perf_counter()
     memory_before = state.memory.copy()
 
-    context = state.memory.get("research_raw", "No external research was used.")
-    prompt = (
-        "You are an **investment research assistant**.\n\n"
-        f"User query: {state.user_query}\n"
-        f"External research:\n{context}\n\n"
-        "Write a structured, educational answer with sections like:\n"
-        "- Business / asset overview\n"
-        "- Recent news or catalysts\n"
-        "- Key metrics or fundamentals (if mentioned)\n"
-        "- Risks and uncertainties\n"
-        "- Summary\n\n"
-        "IMPORTANT: This is **not** financial advice. "
-        "Be explicit that your answer is informational only."
-    )
-    answer = gemini_llm(prompt)
+    packing = None
+    if "research_raw" in state.memory:
+        # best passages for the query within the token budget (backend/context_packing.py)
+        context, packing = pack_context(state.user_query, state.memory["research_raw"], config.context_budget_tokens)
+    else:
+        context = NO_RESEARCH_CONTEXT
+    prompt = answer_prompt(state.user_query, context)
+    with collect_step_meta() as meta:
+        if on_token is not None:
+            # stream the answer; the step records time to the first chunk
+            answer = gemini_llm(prompt, on_token=track_first_token(meta, started, on_token))
+        else:
+            answer = gemini_llm(prompt)
     state.final_answer = answer
 
     step = StepLog(
@@ -113,19 +156,62 @@ def answer_node(state: AgentState) -> AgentState:
         tool="answer_tool",
         tool_input=None,
         tool_output=None,
-        memory_before=memory_before,
-        memory_after=state.memory.copy(),
+        memory_patch=make_patch(memory_before, state.memory),
+        cache_hit=meta.get("cache_hit"),
+        timing=step_timing(meta, started),
+        resilience=resilience_log(meta),
+        packing=packing,
     )
     state.steps.append(step)
     return state
 
-def run_agent(user_query: str) -> AgentState:
-    
-    state = AgentState(user_query=user_query)
-    result, state = plan_node(state)
-    state = research_node(state)
-    state = answer_node(state)
-    return state
-
+@traced("run_agent")
+def run_agent(
+    user_query: str,
+    config: AgentConfig = DEFAULT_CONFIG,
+    on_token: Optional[TokenFn] = None,
+    run_id: Optional[str] = None,
+    extra_nodes: Sequence[Node] = (),
+) -> AgentState:
+    """
+    Run plan -> research -> answer on the node graph (backend/node_graph.py); with `on_token`,
+    answer chunks are passed to it as they arrive. `extra_nodes` run between plan and answer,
+    alongside research when they only depend on "plan".
+    With `run_id` the state is checkpointed after every node (backend/checkpoint.py) and a
+    run that failed or was interrupted continues from the first unfinished node.
+    A run that hits config.max_steps or config.time_budget_seconds ends early: the returned
+    state has no final answer and ends with a `budget` step. The stop is final: the checkpoint
+    is marked stopped, and calling again with the same run_id returns the stopped state.
+    """
+    speculative: Optional[SpeculativeSearch] = None
 
+    def plan(state: AgentState) -> AgentState:
+        nonlocal speculative
+        route = route_query(user_query, config) if config.local_routing else None
+        # speculative mode: the search runs while the plan LLM call is in flight
+        # (pointless when the local router already settled the decision)
+        speculate = config.speculative_search and not (route is not None and route.confident)
+        speculative = SpeculativeSearch(research_search(config)[1], user_query) if speculate else None
+        return plan_node(state, route)[1]
 
+    graph = NodeGraph([
+        Node("plan", plan),
+        Node("research", lambda state: research_node(state, speculative, config), deps=("plan",)),
+        *extra_nodes,
+        Node("answer", lambda state: answer_node(state, on_token, config),
+             deps=("research", *(n.name for n in extra_nodes))),
+    ])
+    run = RunCheckpoint(run_id, user_query)
+    if run.stopped:
+        return run.state
+    try:
+        return graph.run(
+            run.state, done=run.completed, on_finish=run.save,
+            max_steps=config.max_steps, time_budget=config.time_budget_seconds,
+        )
+    except BudgetExceeded as e:
+        run.stop(str(e), e.state)
+        return e.state
+    except Exception as e:
+        run.fail(e)
+        raise
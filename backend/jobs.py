@@ -0,0 +1,504 @@
+# backend/jobs.py
+# Local agent service: run requests go into a persistent job queue and are
+# executed by a bounded pool of workers, so a slow run never blocks the page
+# that asked for it and many users cannot start unbounded runs.
+#
+# The queue is one SQLite file (WAL, a connection per thread and process, like
+# the checkpoint store). Workers are coroutines on the service's own event
+# loop running backend/async_graph.py; Gemini and Valyu calls are capped per
+# provider across all of them. Each job runs under a checkpoint run id, so a
+# failed or interrupted job is resumed from its last finished node when it is
+# queued again. While a job runs, the answer streamed so far is written to its
+# row, so a poller sees it grow.
+#
+#   service = get_service()                 # starts the workers in this process
+#   job = service.submit("Is Nvidia stock a good buy?")
+#   service.get(job.job_id).status          # queued | running | done | failed | cancelled
+#   service.cancel(job.job_id)
+#
+#   python -m backend.jobs serve            # workers in their own process
+#   python -m backend.jobs submit "query" | status JOB_ID | cancel JOB_ID | list | prune
+
+import asyncio
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+from .config import AgentConfig, DEFAULT_CONFIG, JobServiceConfig, DEFAULT_JOB_SERVICE_CONFIG
+
+STATUSES = ("queued", "running", "done", "failed", "cancelled")
+FINISHED = ("done", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    user_query TEXT NOT NULL,
+    config TEXT NOT NULL,               -- AgentConfig JSON
+    run_id TEXT NOT NULL,               -- checkpoint run id (backend/checkpoint.py)
+    status TEXT NOT NULL,               -- queued | running | done | failed | cancelled
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    answer TEXT,                        -- streamed so far while running, final when done
+    trace_name TEXT,
+    error TEXT,
+    first_token_seconds REAL,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    queued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL                   -- refreshed by the worker while running
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs(status, queued_at);
+"""
+_COLUMNS = (
+    "job_id, user_query, config, run_id, status, cancel_requested, answer, trace_name, error, "
+    "first_token_seconds, worker, attempts, queued_at, started_at, finished_at"
+)
+
+
+class QueueFull(Exception):
+    """submit() while max_queued jobs are already waiting."""
+
+
+class Job:
+    def __init__(self, job_id: str, user_query: str, config: str, run_id: str, status: str,
+                 cancel_requested: int, answer: Optional[str], trace_name: Optional[str], error: Optional[str],
+                 first_token_seconds: Optional[float], worker: Optional[str], attempts: int,
+                 queued_at: float, started_at: Optional[float], finished_at: Optional[float]):
+        self.job_id = job_id
+        self.user_query = user_query
+        self.config = AgentConfig.model_validate_json(config)
+        self.run_id = run_id
+        self.status = status
+        self.cancel_requested = bool(cancel_requested)
+        self.answer = answer
+        self.trace_name = trace_name
+        self.error = error
+        self.first_token_seconds = first_token_seconds
+        self.worker = worker
+        self.attempts = attempts
+        self.queued_at = queued_at
+        self.started_at = started_at
+        self.finished_at = finished_at
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    @property
+    def wait_seconds(self) -> Optional[float]:
+        """Time spent in the queue before a worker took the job."""
+        return self.started_at - self.queued_at if self.started_at is not None else None
+
+    @property
+    def run_seconds(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+
+class JobStore:
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def submit(self, user_query: str, config: AgentConfig = DEFAULT_CONFIG, run_id: Optional[str] = None,
+               max_queued: Optional[int] = None) -> Job:
+        job_id = uuid4().hex
+        conn = self._conn()
+        # IMMEDIATE: the queue-depth check and the insert see the same queue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if max_queued is not None:
+                (queued,) = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()
+                if queued >= max_queued:
+                    raise QueueFull(f"{queued} jobs already queued")
+            conn.execute(
+                "INSERT INTO jobs (job_id, user_query, config, run_id, status, queued_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, user_query, config.model_dump_json(), run_id or f"job-{job_id}", time.time()),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(job_id)
+
+    def claim(self, worker: str) -> Optional[Job]:
+        """Oldest queued job, marked running for `worker`; None if the queue is empty."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT job_id FROM jobs WHERE status = 'queued' ORDER BY queued_at LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                now = time.time()
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                    "started_at = ?, heartbeat_at = ? WHERE job_id = ?",
+                    (worker, now, now, row[0]),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(row[0]) if row is not None else None
+
+    def heartbeat(self, job_id: str, answer: Optional[str] = None) -> bool:
+        """Mark the job alive (and store the answer so far); True if cancellation was requested."""
+        conn = self._conn()
+        if answer is None:
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE job_id = ?", (time.time(), job_id))
+        else:
+            conn.execute("UPDATE jobs SET heartbeat_at = ?, answer = ? WHERE job_id = ?", (time.time(), answer, job_id))
+        row = conn.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def finish(self, job_id: str, status: str, answer: Optional[str] = None, trace_name: Optional[str] = None,
+               error: Optional[str] = None, first_token_seconds: Optional[float] = None) -> None:
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, answer = COALESCE(?, answer), trace_name = ?, error = ?, "
+            "first_token_seconds = ?, finished_at = ? WHERE job_id = ?",
+            (status, answer, trace_name, error, first_token_seconds, time.time(), job_id),
+        )
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job now, or ask the worker running it to stop. False if already finished."""
+        conn = self._conn()
+        now = time.time()
+        if conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE job_id = ? AND status = 'queued'",
+            (now, job_id),
+        ).rowcount:
+            return True
+        return bool(conn.execute(
+            "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = 'running'", (job_id,)
+        ).rowcount)
+
+    def requeue(self, job_id: str) -> bool:
+        """
+        Queue a failed or cancelled job again; it resumes from its checkpoint.
+        Budget stops saved their trace and are final, so they are not requeued.
+        """
+        return bool(self._conn().execute(
+            "UPDATE jobs SET status = 'queued', cancel_requested = 0, error = NULL, worker = NULL, "
+            "queued_at = ?, started_at = NULL, finished_at = NULL "
+            "WHERE job_id = ? AND status IN ('failed', 'cancelled') AND trace_name IS NULL",
+            (time.time(), job_id),
+        ).rowcount)
+
+    def recover(self, stale_seconds: float) -> int:
+        """Queue again running jobs whose worker stopped sending heartbeats (a crashed process)."""
+        return self._conn().execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL, queued_at = ?, started_at = NULL "
+            "WHERE status = 'running' AND heartbeat_at < ?",
+            (time.time(), time.time() - stale_seconds),
+        ).rowcount
+
+    def release(self, worker: str) -> int:
+        """Queue again the jobs `worker` was running (the service is shutting down)."""
+        return self._conn().execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL, started_at = NULL WHERE status = 'running' AND worker = ?",
+            (worker,),
+        ).rowcount
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._conn().execute(f"SELECT {_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return Job(*row) if row is not None else None
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based place in the queue; None unless the job is queued."""
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM jobs q, jobs j WHERE j.job_id = ? AND j.status = 'queued' "
+            "AND q.status = 'queued' AND q.queued_at <= j.queued_at",
+            (job_id,),
+        ).fetchone()
+        return row[0] or None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Job]:
+        if status is None:
+            rows = self._conn().execute(
+                f"SELECT {_COLUMNS} FROM jobs ORDER BY queued_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        else:
+            rows = self._conn().execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE status = ? ORDER BY queued_at DESC LIMIT ?", (status, limit)
+            ).fetchall()
+        return [Job(*r) for r in rows]
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def prune(self, older_than_seconds: float) -> int:
+        cutoff = time.time() - older_than_seconds
+        return self._conn().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed', 'cancelled') AND finished_at < ?", (cutoff,)
+        ).rowcount
+
+
+class AgentService:
+    """
+    Workers for one job queue, on an event loop in a background thread.
+    `llm`, `search` and `search_results` default to Gemini and Valyu (see
+    async_graph.run_agent); benchmarks pass local stand-ins.
+    """
+
+    def __init__(
+        self,
+        config: JobServiceConfig = DEFAULT_JOB_SERVICE_CONFIG,
+        llm=None,
+        search=None,
+        search_results=None,
+        traces_dir: Optional[Path] = None,
+        store: Optional[JobStore] = None,
+    ):
+        self.config = config
+        self.store = store or JobStore(config.path)
+        self.traces_dir = traces_dir
+        self._backends = (llm, search, search_results)
+        self._limiters: Dict[str, Any] = {}
+        self._name = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._started = threading.Event()
+
+    # ---------- client side (any thread) ----------
+
+    def submit(self, user_query: str, config: AgentConfig = DEFAULT_CONFIG, run_id: Optional[str] = None) -> Job:
+        job = self.store.submit(user_query, config, run_id, max_queued=self.config.max_queued)
+        self._notify()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.store.get(job_id)
+
+    def position(self, job_id: str) -> Optional[int]:
+        return self.store.position(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        return self.store.cancel(job_id)
+
+    def requeue(self, job_id: str) -> bool:
+        ok = self.store.requeue(job_id)
+        self._notify()
+        return ok
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue counts plus, per provider, calls in flight now and at most."""
+        out: Dict[str, Any] = {"jobs": self.store.counts()}
+        for name, limiter in self._limiters.items():
+            out[name] = {"limit": limiter.limit, "in_flight": limiter.in_flight, "peak": limiter.peak}
+        return out
+
+    def _notify(self) -> None:
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    # ---------- lifecycle ----------
+
+    def start(self) -> "AgentService":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._main, name="agent-service", daemon=True)
+            self._thread.start()
+            self._started.wait()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the workers; jobs still running are queued again and resume from their checkpoint."""
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._stopping.set)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def serve_forever(self) -> None:
+        """Run the workers on the calling thread until interrupted."""
+        try:
+            asyncio.run(self._serve())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.store.release(self._name)
+
+    def _main(self) -> None:
+        asyncio.run(self._serve())
+
+    # ---------- workers (service loop) ----------
+
+    async def _serve(self) -> None:
+        from .async_graph import default_llm, default_search, default_search_results
+        from .ratelimit import AsyncConcurrencyLimiter
+
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stopping = asyncio.Event()
+        llm, search, search_results = self._backends
+        self._limiters = {
+            "llm": AsyncConcurrencyLimiter(self.config.llm_concurrency),
+            "search": AsyncConcurrencyLimiter(self.config.search_concurrency),
+        }
+        # one search limit for both search paths: fan-out sub-queries count against it too
+        self._llm = self._limiters["llm"].wrap(llm or default_llm())
+        self._search = self._limiters["search"].wrap(search or default_search())
+        self._search_results = self._limiters["search"].wrap(search_results or default_search_results())
+        await asyncio.to_thread(self.store.recover, self._stale_seconds())
+        self._started.set()
+
+        workers = [asyncio.create_task(self._worker(f"{self._name}/{i}")) for i in range(max(1, self.config.workers))]
+        await self._stopping.wait()
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await asyncio.to_thread(self.store.release, self._name)
+
+    def _stale_seconds(self) -> float:
+        # a worker heartbeats every poll; a row this quiet belongs to a dead process
+        return max(30.0, 40 * self.config.poll_seconds)
+
+    async def _worker(self, name: str) -> None:
+        while True:
+            job = await asyncio.to_thread(self.store.claim, name)
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.config.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Job) -> None:
+        from analysis.traces_loader import make_trace_name, save_trace
+        from .async_graph import run_agent
+        from .checkpoint import get_checkpoint_store
+
+        chunks: List[str] = []
+        run = asyncio.create_task(run_agent(
+            job.user_query, llm=self._llm, search=self._search, config=job.config, on_token=chunks.append,
+            search_results=self._search_results, run_id=job.run_id,
+        ))
+        written = 0
+        try:
+            while True:
+                done, _ = await asyncio.wait({run}, timeout=self.config.poll_seconds)
+                if done:
+                    break
+                answer = "".join(chunks) if len(chunks) != written else None
+                written = len(chunks)
+                if await asyncio.to_thread(self.store.heartbeat, job.job_id, answer):
+                    run.cancel()
+                    await asyncio.wait({run})
+                    # or `backend.checkpoint resume` would finish the run the user cancelled
+                    await asyncio.to_thread(get_checkpoint_store().cancel, job.run_id)
+                    await asyncio.to_thread(self.store.finish, job.job_id, "cancelled", "".join(chunks) or None)
+                    return
+            state = run.result()
+        except asyncio.CancelledError:
+            # the service is stopping: leave the job running, stop() queues it again
+            run.cancel()
+            raise
+        except Exception as e:
+            await asyncio.to_thread(self.store.finish, job.job_id, "failed", "".join(chunks) or None,
+                                    None, f"{type(e).__name__}: {e}")
+            return
+
+        trace_name = make_trace_name(job.user_query)
+        await asyncio.to_thread(save_trace, state, trace_name, self.traces_dir)
+        await asyncio.to_thread(get_checkpoint_store().mark_saved, job.run_id, trace_name)
+        answer_step = next((s for s in reversed(state.steps) if s.node == "answer"), None)
+        first_token = answer_step.timing.first_token_seconds if answer_step and answer_step.timing else None
+        if state.final_answer is None:
+            # stopped by the step or time budget (backend/node_graph.py)
+            error = state.steps[-1].thought if state.steps else "no answer"
+            await asyncio.to_thread(self.store.finish, job.job_id, "failed", None, trace_name, error)
+        else:
+            await asyncio.to_thread(self.store.finish, job.job_id, "done", state.final_answer, trace_name,
+                                    None, first_token)
+
+
+_service: Optional[AgentService] = None
+_service_lock = threading.Lock()
+
+
+def get_service(config: JobServiceConfig = DEFAULT_JOB_SERVICE_CONFIG) -> AgentService:
+    """The process-wide service, started on first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = AgentService(config).start()
+    return _service
+
+
+def _describe(job: Job) -> str:
+    wait = f"{job.wait_seconds:.1f}s" if job.wait_seconds is not None else "-"
+    ran = f"{job.run_seconds:.1f}s" if job.run_seconds is not None else "-"
+    return (f"{job.job_id}  {job.status:<9} waited {wait:>7} ran {ran:>7}  {job.user_query[:50]!r} "
+            f"{job.trace_name or ''}{job.error or ''}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local agent job queue.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    srv = sub.add_parser("serve", help="run workers until Ctrl-C")
+    srv.add_argument("--workers", type=int, default=DEFAULT_JOB_SERVICE_CONFIG.workers)
+    sbm = sub.add_parser("submit", help="queue a query")
+    sbm.add_argument("query")
+    sbm.add_argument("--fanout", action="store_true")
+    for name in ("status", "cancel", "requeue"):
+        sub.add_parser(name).add_argument("job_id")
+    lst = sub.add_parser("list", help="counts by status, then recent jobs")
+    lst.add_argument("--status", choices=STATUSES, default=None)
+    sub.add_parser("prune", help="drop finished jobs past the retention period")
+    args = parser.parse_args()
+
+    # run as __main__, this file is a second copy of the module: use the package one
+    from backend.jobs import AgentService, JobStore
+
+    if args.cmd == "serve":
+        config = DEFAULT_JOB_SERVICE_CONFIG.model_copy(update={"workers": args.workers})
+        print(f"[jobs] serving {config.path} with {config.workers} workers")
+        AgentService(config).serve_forever()
+    else:
+        store = JobStore(DEFAULT_JOB_SERVICE_CONFIG.path)
+        if args.cmd == "submit":
+            job = store.submit(args.query, DEFAULT_CONFIG.model_copy(update={"research_fanout": args.fanout}),
+                               max_queued=DEFAULT_JOB_SERVICE_CONFIG.max_queued)
+            print(job.job_id)
+        elif args.cmd == "status":
+            job = store.get(args.job_id)
+            print(_describe(job) if job else "no such job")
+            if job and job.answer:
+                print(job.answer)
+        elif args.cmd == "cancel":
+            print("cancelled" if store.cancel(args.job_id) else "not queued or running")
+        elif args.cmd == "requeue":
+            print("queued" if store.requeue(args.job_id) else "not failed or cancelled")
+        elif args.cmd == "list":
+            print(store.counts())
+            for job in store.list(args.status):
+                print(_describe(job))
+        else:
+            print(f"pruned {store.prune(DEFAULT_JOB_SERVICE_CONFIG.retention_seconds)} jobs")
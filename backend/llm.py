@@ -1,33 +1,149 @@
 # backend/llm.py
 import os
-from langsmith import traceable
-import google.generativeai as genai
+import threading
+from typing import Any, Callable, Dict, Optional
+from observability.tracing import traced
+from .llm_cache import get_llm_cache
+from .step_meta import mark_cache, timed_call
+from .cassette import recorded
+from .resilience import get_caller
 
 # Load API key
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY missing in .env")
+_models: Dict[str, Any] = {}
+_models_lock = threading.Lock()
 
-genai.configure(api_key=GEMINI_API_KEY)
+
+def get_model(model: str) -> Any:
+    """
+    The GenerativeModel for `model`, built on first use and reused afterwards.
+    The SDK (~0.8s to import) is loaded and configured here too, so importing
+    this module is cheap and replaying a cassette needs no key.
+    """
+    model_obj = _models.get(model)
+    if model_obj is None:
+        with _models_lock:
+            model_obj = _models.get(model)
+            if model_obj is None:
+                if not GEMINI_API_KEY:
+                    raise ValueError("GEMINI_API_KEY missing in .env")
+                import google.generativeai as genai
+
+                if not _models:
+                    genai.configure(api_key=GEMINI_API_KEY)
+                model_obj = _models[model] = genai.GenerativeModel(model)
+    return model_obj
 
 # pick your model; gemini-1.5-flash is fast + cheap
 DEFAULT_MODEL = "gemini-2.5-flash-lite"
 
+TokenFn = Callable[[str], None]  # receives each chunk of a streamed response
+
 
-@traceable(name="gemini_llm", run_type="llm")
-def gemini_llm(prompt: str, model: str = DEFAULT_MODEL) -> str:
+@traced("gemini_llm", kind="llm")
+@recorded("gemini_llm", kind="llm", stream_arg="on_token")
+def gemini_llm(
+    prompt: str, model: str = DEFAULT_MODEL, use_cache: bool = True, on_token: Optional[TokenFn] = None
+) -> str:
     """
     Calls the Google Gemini model and returns a plain string.
-    LangSmith will capture prompt + output + timing automatically.
+    LangSmith will capture prompt + output + timing automatically; time,
+    token counts and payload sizes also go into the current step's timing.
+    Identical (prompt, model) pairs are served from the response cache
+    (backend/llm_cache.py) unless use_cache=False.
+    With `on_token`, the response is streamed and each chunk is passed to it
+    as it arrives (a cached response arrives as one chunk).
+    """
+    with timed_call("llm") as call:
+        call["input_bytes"] = len(prompt.encode())
+        cache = get_llm_cache() if use_cache else None
+        if cache is not None:
+            cached = cache.get(prompt, model)
+            mark_cache(cached is not None)
+            if cached is not None:
+                call["output_bytes"] = len(cached.encode())
+                if on_token is not None:
+                    on_token(cached)
+                return cached
+
+        try:
+            model_obj = get_model(model)
+            # retries, per-attempt deadline, hedging, circuit breaker (backend/resilience.py);
+            # a stream is only retried until it is opened, never mid-answer
+            if on_token is None:
+                response = get_caller("gemini").call(model_obj.generate_content, prompt)
+                text = _response_text(response)
+            else:
+                response = get_caller("gemini").call(model_obj.generate_content, prompt, stream=True)
+                text = "".join(_emit(chunk, on_token) for chunk in response)
+        except Exception as e:
+            raise RuntimeError(f"Gemini API error: {e}") from e
+
+        call.update(_token_counts(response), output_bytes=len(text.encode()))
+        if cache is not None:
+            cache.put(prompt, model, text)
+        return text
+
+
+@traced("gemini_llm_async", kind="llm")
+@recorded("gemini_llm", kind="llm", stream_arg="on_token")
+async def gemini_llm_async(
+    prompt: str, model: str = DEFAULT_MODEL, use_cache: bool = True, on_token: Optional[TokenFn] = None
+) -> str:
+    """
+    Async twin of gemini_llm for the asyncio pipeline (backend/async_graph.py).
+    Awaits the network round trip instead of blocking the event loop.
     """
-    try:
-        model_obj = genai.GenerativeModel(model)
-        response = model_obj.generate_content(prompt)
-    except Exception as e:
-        raise RuntimeError(f"Gemini API error: {e}") from e
+    with timed_call("llm") as call:
+        call["input_bytes"] = len(prompt.encode())
+        cache = get_llm_cache() if use_cache else None
+        if cache is not None:
+            cached = cache.get(prompt, model)
+            mark_cache(cached is not None)
+            if cached is not None:
+                call["output_bytes"] = len(cached.encode())
+                if on_token is not None:
+                    on_token(cached)
+                return cached
+
+        try:
+            model_obj = get_model(model)
+            if on_token is None:
+                response = await get_caller("gemini").acall(model_obj.generate_content_async, prompt)
+                text = _response_text(response)
+            else:
+                response = await get_caller("gemini").acall(model_obj.generate_content_async, prompt, stream=True)
+                text = "".join([_emit(chunk, on_token) async for chunk in response])
+        except Exception as e:
+            raise RuntimeError(f"Gemini API error: {e}") from e
+
+        call.update(_token_counts(response), output_bytes=len(text.encode()))
+        if cache is not None:
+            cache.put(prompt, model, text)
+        return text
+
 
+def _response_text(response) -> str:
     # Extract text safely
     if not response or not hasattr(response, "text"):
         raise RuntimeError("Gemini returned empty response or invalid structure.")
 
     return response.text
+
+
+def _emit(chunk, on_token: TokenFn) -> str:
+    # a chunk without text parts (e.g. only safety ratings) contributes nothing
+    piece = chunk.text if chunk.parts else ""
+    if piece:
+        on_token(piece)
+    return piece
+
+
+def _token_counts(response) -> dict:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return {}
+    return {
+        "prompt_tokens": getattr(usage, "prompt_token_count", None),
+        "response_tokens": getattr(usage, "candidates_token_count", None),
+    }
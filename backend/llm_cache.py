@@ -0,0 +1,238 @@
+# backend/llm_cache.py
+# Persistent, content-addressed cache for LLM responses.
+#
+# Entries live in one SQLite file keyed on sha256(model, prompt). SQLite in WAL
+# mode gives us safe concurrent readers/writers across processes on one host;
+# each thread (and each forked process) opens its own connection.
+#
+# Hits are plain reads: access times and hit/miss counts are buffered in memory
+# and written in one transaction with the next put, or every ACCESS_FLUSH_EVERY
+# lookups / ACCESS_FLUSH_SECONDS, so lookups never queue on the write lock.
+
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .config import LLMCacheConfig, DEFAULT_LLM_CACHE_CONFIG
+
+ACCESS_FLUSH_EVERY = 256  # buffered lookups before access times are written
+ACCESS_FLUSH_SECONDS = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0), ('bytes', 0);
+"""
+
+
+def cache_key(prompt: str, model: str) -> str:
+    h = hashlib.sha256()
+    h.update(model.encode())
+    h.update(b"\0")
+    h.update(prompt.encode())
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache with a byte size cap. Hit/miss counters are stored in the
+    same database, so `stats()` reports totals across every process using it.
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: float):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        # key -> last access, and hit/miss counts, not yet written (see _flush_access)
+        self._pending_lock = threading.Lock()
+        self._pending_pid = os.getpid()
+        self._pending_access: Dict[str, float] = {}
+        self._pending_counts = {"hits": 0, "misses": 0}
+        self._pending_since = time.monotonic()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, prompt: str, model: str) -> Optional[str]:
+        key = cache_key(prompt, model)
+        now = time.time()
+        row = self._conn().execute(
+            "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None and now - row[1] > self.ttl_seconds:
+            row = None  # expired entries are deleted by the next put
+        self._note_access(key if row is not None else None, now)
+        return row[0] if row is not None else None
+
+    def _note_access(self, key: Optional[str], now: float) -> None:
+        with self._pending_lock:
+            if self._pending_pid != os.getpid():  # forked: the parent writes its own
+                self._pending_pid = os.getpid()
+                self._pending_access.clear()
+                self._pending_counts = {"hits": 0, "misses": 0}
+            if key is None:
+                self._pending_counts["misses"] += 1
+            else:
+                self._pending_counts["hits"] += 1
+                self._pending_access[key] = now
+            due = (sum(self._pending_counts.values()) >= ACCESS_FLUSH_EVERY
+                   or time.monotonic() - self._pending_since >= ACCESS_FLUSH_SECONDS)
+        if due:
+            self.flush()
+
+    def _take_pending(self) -> Tuple[Dict[str, float], Dict[str, int]]:
+        with self._pending_lock:
+            if self._pending_pid != os.getpid():
+                return {}, {"hits": 0, "misses": 0}
+            access, counts = self._pending_access, self._pending_counts
+            self._pending_access = {}
+            self._pending_counts = {"hits": 0, "misses": 0}
+            self._pending_since = time.monotonic()
+        return access, counts
+
+    def _write_access(self, conn: sqlite3.Connection, access: Dict[str, float], counts: Dict[str, int]) -> None:
+        conn.executemany("UPDATE entries SET last_access = MAX(last_access, ?) WHERE key = ?",
+                         [(ts, key) for key, ts in access.items()])
+        for name, delta in counts.items():
+            if delta:
+                self._bump(conn, name, delta)
+
+    def flush(self) -> None:
+        """Write buffered access times and hit/miss counts."""
+        access, counts = self._take_pending()
+        if not access and not any(counts.values()):
+            return
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._write_access(conn, access, counts)
+
+    def put(self, prompt: str, model: str, value: str) -> None:
+        key = cache_key(prompt, model)
+        size = len(value.encode())
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        access, counts = self._take_pending()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._write_access(conn, access, counts)  # before eviction reads last_access
+            old = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, value, size, now, now),
+            )
+            self._bump(conn, "bytes", size - (old[0] if old else 0))
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        # expired entries first, then least recently used until under the cap
+        expired = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries WHERE created_at < ?",
+            (now - self.ttl_seconds,),
+        ).fetchone()[0]
+        if expired:
+            conn.execute("DELETE FROM entries WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._bump(conn, "bytes", -expired)
+
+        total = self._counter(conn, "bytes")
+        while total > self.max_bytes:
+            victims = conn.execute(
+                "SELECT key, size FROM entries ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not victims:
+                break
+            for key, size in victims:
+                self._delete(conn, key, size)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def _delete(self, conn: sqlite3.Connection, key: str, size: int) -> None:
+        conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._bump(conn, "bytes", -size)
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, name: str, delta: int) -> None:
+        conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (delta, name))
+
+    @staticmethod
+    def _counter(conn: sqlite3.Connection, name: str) -> int:
+        return conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        self.flush()
+        conn = self._conn()
+        hits = self._counter(conn, "hits")
+        misses = self._counter(conn, "misses")
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": entries,
+            "bytes": self._counter(conn, "bytes"),
+        }
+
+    def clear(self) -> None:
+        self._take_pending()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM entries")
+            conn.execute("UPDATE counters SET value = 0")
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache(config: LLMCacheConfig = DEFAULT_LLM_CACHE_CONFIG) -> Optional[ResponseCache]:
+    """Process-wide cache built from config on first use; None when disabled."""
+    global _cache
+    if not config.enabled:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(config.path, config.max_bytes, config.ttl_seconds)
+                atexit.register(_cache.flush)
+    return _cache
+
+
+if __name__ == "__main__":
+    # python -m backend.llm_cache [stats|clear]
+    import sys
+
+    cache = get_llm_cache(DEFAULT_LLM_CACHE_CONFIG.model_copy(update={"enabled": True}))
+    if sys.argv[1:] == ["clear"]:
+        cache.clear()
+    print(cache.stats())
@@ -0,0 +1,46 @@
+# backend/memory_delta.py
+# Delta-encoded memory snapshots. A trace stores the memory the run started
+# with (`memory_base`) plus one patch per step; full before/after snapshots are
+# rebuilt on demand instead of being copied into every StepLog.
+#
+# Patch format (plain dicts so traces stay JSON):
+#   {"changed": {key: new_value, ...}, "removed": [key, ...]}
+
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+Memory = Dict[str, Any]
+Patch = Dict[str, Any]
+
+
+def make_patch(before: Memory, after: Memory) -> Patch:
+    """Keys added or changed between before and after, plus keys removed."""
+    changed = {}
+    for key, value in after.items():
+        if key not in before:
+            changed[key] = value
+            continue
+        old = before[key]
+        # identity check first: unchanged values are usually the same object
+        if old is not value and old != value:
+            changed[key] = value
+    removed = [key for key in before if key not in after]
+    return {"changed": changed, "removed": removed}
+
+
+def apply_patch(memory: Memory, patch: Optional[Patch]) -> Memory:
+    """Return a new dict with the patch applied; `memory` is left untouched."""
+    out = dict(memory)
+    if patch:
+        for key in patch.get("removed", ()):
+            out.pop(key, None)
+        out.update(patch.get("changed", {}))
+    return out
+
+
+def replay(base: Memory, patches: Iterable[Optional[Patch]]) -> Iterator[Tuple[Memory, Memory]]:
+    """Yield (memory_before, memory_after) for each patch in order."""
+    memory = dict(base)
+    for patch in patches:
+        after = apply_patch(memory, patch)
+        yield memory, after
+        memory = after
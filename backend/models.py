@@ -1,5 +1,43 @@
 from typing import List, Dict, Any, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
+
+class SpeculationLog(BaseModel):
+    outcome: str  # "used" or "discarded"
+    search_seconds: Optional[float] = None  # None if discarded before it finished
+    saved_seconds: Optional[float] = None  # search time hidden behind planning
+
+class ResilienceLog(BaseModel):
+    retries: int = 0  # attempts after the first, across the step's calls
+    hedges: int = 0  # duplicate requests sent
+    hedge_wins: int = 0  # ... that answered before the original
+    timeouts: int = 0  # attempts that hit their deadline
+
+class StepTiming(BaseModel):
+    wall_seconds: float  # whole node, including bookkeeping
+    llm_seconds: Optional[float] = None  # inside gemini_llm (cache lookups included)
+    tool_seconds: Optional[float] = None  # inside Valyu tool calls
+    prompt_tokens: Optional[int] = None
+    response_tokens: Optional[int] = None
+    input_bytes: Optional[int] = None  # prompt / tool input, UTF-8
+    output_bytes: Optional[int] = None  # response / tool output, UTF-8
+    first_token_seconds: Optional[float] = None  # node start -> first streamed answer chunk
+    offset_seconds: Optional[float] = None  # node start, seconds after the run started (backend/node_graph.py)
+    parallel_with: Optional[List[str]] = None  # nodes that ran at the same time as this one
+
+class PassageLog(BaseModel):
+    index: int  # position in the research text
+    tokens: int
+    score: float  # BM25 against the user query
+    kept: bool
+    preview: str  # first characters, to tell passages apart in the UI
+
+class PackingLog(BaseModel):
+    budget_tokens: int
+    original_tokens: int  # research context before packing (~chars / 4)
+    packed_tokens: int
+    saved_tokens: int
+    seconds: float
+    passages: List[PassageLog] = []
 
 class StepLog(BaseModel):
     step_id: int
@@ -8,11 +46,27 @@ class StepLog(BaseModel):
     tool: Optional[str] = None
     tool_input: Optional[Any] = None
     tool_output: Optional[Any] = None
-    memory_before: Dict[str, Any]
-    memory_after: Dict[str, Any]
+    # new traces store only memory_patch (see backend/memory_delta.py);
+    # full snapshots are kept here only by traces written before that
+    memory_before: Optional[Dict[str, Any]] = None
+    memory_after: Optional[Dict[str, Any]] = None
+    memory_patch: Optional[Dict[str, Any]] = None
+    cache_hit: Optional[bool] = None  # None: the step made no cacheable call
+    speculation: Optional[SpeculationLog] = None  # set when a speculative search ran
+    timing: Optional[StepTiming] = None  # None for traces written before timing existed
+    resilience: Optional[ResilienceLog] = None  # set when a call was retried or hedged
+    packing: Optional[PackingLog] = None  # answer step: research passages kept for the prompt
 
 class AgentState(BaseModel):
     user_query: str
     memory: Dict[str, Any] = {}
+    memory_base: Dict[str, Any] = {}  # memory before step 1; steps patch forward from it
     steps: List[StepLog] = []
     final_answer: Optional[str] = None
+
+    @model_validator(mode="after")
+    def _default_memory_base(self):
+        if "memory_base" not in self.model_fields_set:
+            first = self.steps[0].memory_before if self.steps else None
+            self.memory_base = dict(first if first is not None else self.memory)
+        return self
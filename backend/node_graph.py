@@ -0,0 +1,275 @@
+# backend/node_graph.py
+# A small dependency-graph executor for agent nodes. Each node names the nodes
+# it depends on and starts as soon as they have all finished, so independent
+# nodes (two research branches after the plan, say) run at the same time: on a
+# thread pool in the sync engine, as asyncio tasks in the async one.
+#
+# A node runs on its own copy of the state and is merged back when it
+# finishes: its steps are numbered in completion order and its memory changes
+# are applied on top of whatever other branches changed meanwhile, so the
+# trace has the same StepLog shape (and replayable memory patches) as a serial
+# run. Each step's timing records when its node started relative to the run
+# and which nodes overlapped it.
+#
+# AgentConfig.max_steps and time_budget_seconds are enforced here: once either
+# runs out no further node starts, a `budget` step is recorded and
+# BudgetExceeded (carrying the partial state) is raised.
+#
+#   graph = NodeGraph([
+#       Node("plan", plan),
+#       Node("research", research, deps=("plan",)),
+#       Node("news", news, deps=("plan",)),           # runs alongside research
+#       Node("answer", answer, deps=("research", "news")),
+#   ])
+#   state = graph.run(state, max_steps=10, time_budget=60)
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+
+from .memory_delta import apply_patch, make_patch
+from .models import AgentState, StepLog, StepTiming
+
+NodeFn = Callable[[AgentState], Any]  # returns the state (sync) or an awaitable of it (async)
+FinishFn = Callable[[str, AgentState], Any]  # called after each node is merged (checkpointing)
+
+
+class Node:
+    def __init__(self, name: str, fn: NodeFn, deps: Sequence[str] = ()):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+
+
+class BudgetExceeded(Exception):
+    """The run hit its step or time budget; `state` holds everything up to the stop."""
+
+    def __init__(self, reason: str, state: AgentState):
+        super().__init__(reason)
+        self.state = state
+
+
+class _Budget:
+    def __init__(self, max_steps: Optional[int], time_budget: Optional[float], started: float):
+        self.max_steps = max_steps
+        self.time_budget = time_budget
+        self.deadline = started + time_budget if time_budget is not None else None
+
+    def remaining(self) -> Optional[float]:
+        return max(0.0, self.deadline - time.perf_counter()) if self.deadline is not None else None
+
+    def exhausted(self, steps: int) -> Optional[str]:
+        """Why no further node may start, given `steps` recorded or in flight; None if one may."""
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            return f"time budget of {self.time_budget:g}s used up"
+        if self.max_steps is not None and steps >= self.max_steps:
+            return f"step budget of {self.max_steps} reached"
+        return None
+
+
+class _Branch:
+    """One node's run: its copy of the state, what the state was at the fork, when it ran."""
+
+    def __init__(self, name: str, state: AgentState):
+        self.name = name
+        # nodes assign memory keys and append steps; neither may touch the shared state
+        self.state = state.model_copy(update={"memory": dict(state.memory), "steps": list(state.steps)})
+        # the engine replaces state.memory on merge instead of mutating it, so this stays as forked
+        self.memory = state.memory
+        self.step_count = len(state.steps)
+        self.final_answer = state.final_answer
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.steps: List[StepLog] = []
+
+
+class NodeGraph:
+    def __init__(self, nodes: Iterable[Node]):
+        nodes = list(nodes)
+        self.nodes: Dict[str, Node] = {n.name: n for n in nodes}
+        if len(self.nodes) != len(nodes):
+            raise ValueError("node names must be unique")
+        for n in nodes:
+            for dep in n.deps:
+                if dep not in self.nodes:
+                    raise ValueError(f"node {n.name!r} depends on unknown node {dep!r}")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order: List[str] = []
+        placed = set()
+        while len(order) < len(self.nodes):
+            ready = [n for n in self.nodes.values() if n.name not in placed and all(d in placed for d in n.deps)]
+            if not ready:
+                raise ValueError(f"dependency cycle among {sorted(set(self.nodes) - placed)}")
+            for n in ready:
+                order.append(n.name)
+                placed.add(n.name)
+        return order
+
+    def _ready(self, pending: List[str], finished: set) -> List[str]:
+        return [name for name in pending if all(d in finished for d in self.nodes[name].deps)]
+
+    # ---------- bookkeeping shared by both engines ----------
+
+    def _merge(self, state: AgentState, branch: _Branch, result: AgentState,
+               merged: List[_Branch], run_started: float) -> None:
+        state.memory = apply_patch(state.memory, make_patch(branch.memory, result.memory))
+        if result.final_answer != branch.final_answer:
+            state.final_answer = result.final_answer
+        # branches that were still running when this one started overlapped it
+        overlapping = [b for b in merged if b.finished > branch.started]
+        for step in result.steps[branch.step_count:]:
+            step.step_id = len(state.steps) + 1
+            if step.timing is not None:
+                step.timing.offset_seconds = branch.started - run_started
+                step.timing.parallel_with = [b.name for b in overlapping] or None
+            state.steps.append(step)
+            branch.steps.append(step)
+        for other in overlapping:
+            for step in other.steps:
+                if step.timing is not None:
+                    step.timing.parallel_with = (step.timing.parallel_with or []) + [branch.name]
+        merged.append(branch)
+
+    def _stop(self, state: AgentState, reason: str, skipped: List[str], run_started: float) -> BudgetExceeded:
+        state.steps.append(StepLog(
+            step_id=len(state.steps) + 1,
+            node="budget",
+            thought=f"Stopped: {reason}; skipped {', '.join(skipped)}.",
+            tool_output=f"[ERROR] run budget exceeded: {reason}",
+            memory_patch=make_patch(state.memory, state.memory),
+            timing=StepTiming(wall_seconds=0.0, offset_seconds=time.perf_counter() - run_started),
+        ))
+        return BudgetExceeded(reason, state)
+
+    # ---------- sync ----------
+
+    def run(
+        self,
+        state: AgentState,
+        done: Iterable[str] = (),
+        on_finish: Optional[FinishFn] = None,
+        max_steps: Optional[int] = None,
+        time_budget: Optional[float] = None,
+    ) -> AgentState:
+        """
+        Run every node not in `done` (nodes finished by an earlier attempt).
+        A lone ready node runs on the calling thread; several run on the pool.
+        """
+        run_started = time.perf_counter()
+        budget = _Budget(max_steps, time_budget, run_started)
+        finished = set(done)
+        pending = [name for name in self.order if name not in finished]
+        running: Dict[Future, _Branch] = {}
+        merged: List[_Branch] = []
+
+        def finish(branch: _Branch, result: AgentState) -> None:
+            self._merge(state, branch, result, merged, run_started)
+            finished.add(branch.name)
+            if on_finish is not None:
+                on_finish(branch.name, state)
+
+        while pending or running:
+            ready = self._ready(pending, finished)
+            reason = None
+            for name in ready:
+                # every node in flight will add (at least) one step
+                reason = budget.exhausted(len(state.steps) + len(running))
+                if reason is not None:
+                    break
+                pending.remove(name)
+                branch = _Branch(name, state)
+                if len(ready) == 1 and not running:
+                    # nothing to overlap with: stay on this thread (Streamlit callbacks need it)
+                    result = self.nodes[name].fn(branch.state)
+                    branch.finished = time.perf_counter()
+                    finish(branch, result)
+                    break
+                future = _get_executor().submit(contextvars.copy_context().run, _call, self.nodes[name].fn, branch)
+                running[future] = branch
+            if not running:
+                if reason is not None and pending:
+                    raise self._stop(state, reason, pending, run_started)
+                continue
+            completed, _ = wait(running, timeout=budget.remaining(), return_when=FIRST_COMPLETED)
+            if not completed:
+                # out of time with nodes in flight: they finish in the background, unrecorded
+                reason = budget.exhausted(len(state.steps))
+                raise self._stop(state, reason, [b.name for b in running.values()] + pending, run_started)
+            for future in completed:
+                finish(running.pop(future), future.result())
+        return state
+
+    # ---------- async ----------
+
+    async def arun(
+        self,
+        state: AgentState,
+        done: Iterable[str] = (),
+        on_finish: Optional[Callable[[str, AgentState], Awaitable[None]]] = None,
+        max_steps: Optional[int] = None,
+        time_budget: Optional[float] = None,
+    ) -> AgentState:
+        """run() for async node functions; each ready node is its own task."""
+        run_started = time.perf_counter()
+        budget = _Budget(max_steps, time_budget, run_started)
+        finished = set(done)
+        pending = [name for name in self.order if name not in finished]
+        running: Dict[asyncio.Task, _Branch] = {}
+        merged: List[_Branch] = []
+        try:
+            while pending or running:
+                reason = None
+                for name in self._ready(pending, finished):
+                    reason = budget.exhausted(len(state.steps) + len(running))
+                    if reason is not None:
+                        break
+                    pending.remove(name)
+                    branch = _Branch(name, state)
+                    running[asyncio.create_task(_acall(self.nodes[name].fn, branch))] = branch
+                if not running:
+                    raise self._stop(state, reason, pending, run_started)
+                completed, _ = await asyncio.wait(running, timeout=budget.remaining(), return_when=asyncio.FIRST_COMPLETED)
+                if not completed:
+                    reason = budget.exhausted(len(state.steps))
+                    raise self._stop(state, reason, [b.name for b in running.values()] + pending, run_started)
+                for task in completed:
+                    branch = running.pop(task)
+                    self._merge(state, branch, task.result(), merged, run_started)
+                    finished.add(branch.name)
+                    if on_finish is not None:
+                        await on_finish(branch.name, state)
+        finally:
+            for task in running:
+                task.cancel()
+        return state
+
+
+def _call(fn: NodeFn, branch: _Branch) -> AgentState:
+    try:
+        return fn(branch.state)
+    finally:
+        branch.finished = time.perf_counter()
+
+
+async def _acall(fn: NodeFn, branch: _Branch) -> AgentState:
+    try:
+        return await fn(branch.state)
+    finally:
+        branch.finished = time.perf_counter()
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="graph-node")
+        return _executor
@@ -0,0 +1,40 @@
+# backend/prompts.py
+# Prompt builders shared by the sync (graph.py) and async (async_graph.py) pipelines.
+
+
+def plan_prompt(user_query: str) -> str:
+    return (
+        "You are an **investment research assistant**. "
+        "The user will ask about stocks, ETFs, sectors, or macro topics.\n\n"
+        f"User query: {user_query}\n\n"
+        "Decide if you need web search to answer this.\n"
+        "Think step by step about:\n"
+        "- What assets or tickers are involved\n"
+        "- Time horizon (short term / long term)\n"
+        "- Key risk factors or metrics to look up\n"
+        "Then say clearly whether you will SEARCH or NOT SEARCH."
+    )
+
+
+def plan_wants_search(plan: str) -> bool:
+    """The research node searches whenever the plan mentions 'search'."""
+    return "search" in (plan or "").lower()
+
+
+def answer_prompt(user_query: str, context: str) -> str:
+    return (
+        "You are an **investment research assistant**.\n\n"
+        f"User query: {user_query}\n"
+        f"External research:\n{context}\n\n"
+        "Write a structured, educational answer with sections like:\n"
+        "- Business / asset overview\n"
+        "- Recent news or catalysts\n"
+        "- Key metrics or fundamentals (if mentioned)\n"
+        "- Risks and uncertainties\n"
+        "- Summary\n\n"
+        "IMPORTANT: This is **not** financial advice. "
+        "Be explicit that your answer is informational only."
+    )
+
+
+NO_RESEARCH_CONTEXT = "No external research was used."
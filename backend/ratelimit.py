@@ -0,0 +1,75 @@
+# backend/ratelimit.py
+
+import asyncio
+import functools
+import time
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class AsyncRateLimiter:
+    """
+    Token bucket shared by every coroutine that talks to one provider.
+    `rate` tokens are added per second, up to `burst` saved tokens.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def wrap(self, fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        """Return `fn` gated by this limiter."""
+
+        @functools.wraps(fn)
+        async def limited(*args, **kwargs) -> T:
+            await self.acquire()
+            return await fn(*args, **kwargs)
+
+        return limited
+
+
+class AsyncConcurrencyLimiter:
+    """
+    At most `limit` calls to one provider in flight at once, across every
+    coroutine that shares the limiter. `peak` is the most seen so far.
+    """
+
+    def __init__(self, limit: int):
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.limit = limit
+        self.in_flight = 0
+        self.peak = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    def wrap(self, fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        """Return `fn` gated by this limiter."""
+
+        @functools.wraps(fn)
+        async def limited(*args, **kwargs) -> T:
+            async with self._semaphore:
+                self.in_flight += 1
+                self.peak = max(self.peak, self.in_flight)
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    self.in_flight -= 1
+
+        return limited
@@ -0,0 +1,181 @@
+# backend/research.py
+# Fan-out research: one user query becomes several sub-queries (fundamentals,
+# news, risks) that are searched concurrently. Results are deduplicated by URL
+# and by content hash, then merged into one ranked top-k with reciprocal rank
+# fusion, so a page found by several sub-queries ranks above one found once.
+#
+# Research latency is the slowest sub-query, not the sum: the sync version runs
+# them on a thread pool, the async version with asyncio.gather.
+
+import asyncio
+import contextvars
+import hashlib
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .step_meta import collect_step_meta, merge_step_meta
+
+ResultsFn = Callable[..., List[Dict[str, Any]]]  # (query, max_results=) -> results
+AsyncResultsFn = Callable[..., Awaitable[List[Dict[str, Any]]]]
+
+FACETS: Dict[str, str] = {
+    "fundamentals": "{query} -- company fundamentals: revenue, earnings, margins, valuation",
+    "news": "{query} -- latest news, recent developments and guidance",
+    "risks": "{query} -- key risks, headwinds, competition and controversies",
+}
+RRF_K = 60  # reciprocal rank fusion constant: 1 / (RRF_K + rank)
+
+
+def sub_queries(query: str) -> Dict[str, str]:
+    return {facet: template.format(query=query) for facet, template in FACETS.items()}
+
+
+def content_hash(text: str) -> str:
+    """Hash of the text with case and whitespace normalised (mirrors on other URLs)."""
+    normalised = re.sub(r"\s+", " ", text).strip().lower()
+    return hashlib.sha1(normalised.encode()).hexdigest()
+
+
+def url_key(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return None
+    url = url.strip().lower().split("#", 1)[0]
+    url = re.sub(r"^https?://(www\.)?", "", url)
+    return url.rstrip("/")
+
+
+def merge_results(per_facet: Dict[str, List[Dict[str, Any]]], top_k: int) -> List[Dict[str, Any]]:
+    """
+    Deduplicate results across facets (same URL or same content) and rank them
+    by reciprocal rank fusion. Each merged result lists the facets that found it.
+    """
+    merged: List[Dict[str, Any]] = []
+    by_key: Dict[str, int] = {}
+    for facet, results in per_facet.items():
+        for rank, r in enumerate(results, start=1):
+            keys = [k for k in (url_key(r.get("url")), "#" + content_hash(r.get("content") or "")) if k]
+            idx = next((by_key[k] for k in keys if k in by_key), None)
+            if idx is None:
+                idx = len(merged)
+                merged.append({
+                    "title": r.get("title"),
+                    "url": r.get("url"),
+                    "content": r.get("content") or "",
+                    "relevance_score": r.get("relevance_score"),
+                    "facets": [],
+                    "score": 0.0,
+                })
+            item = merged[idx]
+            for k in keys:
+                by_key.setdefault(k, idx)
+            if facet not in item["facets"]:
+                item["facets"].append(facet)
+                item["score"] += 1.0 / (RRF_K + rank)
+            if (r.get("relevance_score") or 0) > (item["relevance_score"] or 0):
+                item["relevance_score"] = r["relevance_score"]
+
+    ranked = sorted(merged, key=lambda r: (r["score"], r["relevance_score"] or 0), reverse=True)
+    for r in ranked:
+        r["score"] = round(r["score"], 6)
+    return ranked[:top_k]
+
+
+def _research_output(
+    queries: Dict[str, str], outcomes: List[Tuple[str, Any, Optional[BaseException]]], top_k: int
+) -> Dict[str, Any]:
+    per_facet = {facet: results for facet, results, error in outcomes if error is None}
+    failed = {facet: f"{type(error).__name__}: {error}" for facet, _, error in outcomes if error is not None}
+    if not per_facet:
+        raise next(error for _, _, error in outcomes if error is not None)
+    return {
+        "sub_queries": queries,
+        "results": merge_results(per_facet, top_k),
+        "raw_results": sum(len(r) for r in per_facet.values()),
+        "failed": failed,
+    }
+
+
+def format_results(query: str, research: Dict[str, Any]) -> str:
+    """Merged results as answer-prompt context, best first."""
+    blocks = [
+        f"[{i}] {r['title'] or r['url'] or 'untitled'}" + (f" ({r['url']})" if r["url"] else "") + f"\n{r['content']}"
+        for i, r in enumerate(research["results"], start=1)
+    ]
+    return f"[FINANCE SEARCH RESULTS for: {query}] ---> " + "\n\n".join(blocks)
+
+
+# ---------- sync ----------
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="research-fanout")
+        return _executor
+
+
+def _search_one(search: ResultsFn, query: str, per_query: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    # own step meta per thread: the caller merges them, no shared dict across threads
+    with collect_step_meta() as meta:
+        return search(query, max_results=per_query), meta
+
+
+def fan_out_search(
+    query: str, search: Optional[ResultsFn] = None, top_k: int = 8, per_query: int = 10
+) -> Dict[str, Any]:
+    """Search every facet concurrently; failed facets are reported, not fatal (unless all fail)."""
+    if search is None:
+        from .agent import search_results_tool as search
+
+    queries = sub_queries(query)
+    futures = {
+        facet: _get_executor().submit(contextvars.copy_context().run, _search_one, search, q, per_query)
+        for facet, q in queries.items()
+    }
+    outcomes = []
+    for facet, future in futures.items():
+        try:
+            results, meta = future.result()
+        except Exception as e:
+            outcomes.append((facet, None, e))
+            continue
+        merge_step_meta(meta)
+        outcomes.append((facet, results, None))
+    return _research_output(queries, outcomes, top_k)
+
+
+# ---------- async ----------
+
+async def _search_one_async(
+    search: AsyncResultsFn, query: str, per_query: int
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    with collect_step_meta() as meta:
+        return await search(query, max_results=per_query), meta
+
+
+async def fan_out_search_async(
+    query: str, search: Optional[AsyncResultsFn] = None, top_k: int = 8, per_query: int = 10
+) -> Dict[str, Any]:
+    if search is None:
+        from .agent import search_results_tool_async as search
+
+    queries = sub_queries(query)
+    # gather runs each coroutine as its own task, so each gets its own context copy
+    gathered = await asyncio.gather(
+        *(_search_one_async(search, q, per_query) for q in queries.values()), return_exceptions=True
+    )
+    outcomes = []
+    for facet, outcome in zip(queries, gathered):
+        if isinstance(outcome, BaseException):
+            outcomes.append((facet, None, outcome))
+            continue
+        results, meta = outcome
+        merge_step_meta(meta)
+        outcomes.append((facet, results, None))
+    return _research_output(queries, outcomes, top_k)
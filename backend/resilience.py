@@ -0,0 +1,377 @@
+# backend/resilience.py
+# Resilient call layer for Gemini and Valyu: retries with jittered exponential
+# backoff (tenacity), a deadline per attempt, hedged duplicate requests and a
+# circuit breaker per provider.
+#
+# Hedging: once a provider has enough history, an attempt that is still
+# running after the recent p95 latency gets a duplicate request; whichever
+# answers first wins and the loser's response (e.g. an open stream) is closed.
+# That trims the slow tail at the cost of a few extra calls.
+#
+# Sync calls run on a thread pool per provider, and an attempt's deadline is
+# measured from when a worker starts it, so attempts queued behind hung calls
+# are not timed out (and do not trip the breaker) before they are sent.
+#
+# Retries, hedges, hedge wins and timeouts are added to the current step
+# (backend/step_meta.py) and end up in StepLog.resilience.
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from .config import ResilienceConfig, DEFAULT_RESILIENCE_CONFIG
+from .step_meta import add_counts
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider failed repeatedly; calls fail fast until the breaker resets."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (CircuitOpenError, ValueError, TypeError, KeyError)):
+        return False  # bad input or config: the same call fails again
+    code = getattr(exc, "code", None)
+    if isinstance(code, int) and 400 <= code < 500 and code not in (408, 429):
+        return False  # client errors other than timeout / rate limit
+    return True
+
+
+class LatencyTracker:
+    """Recent successful latencies of one provider."""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half-open after a cool-down."""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half_open" and self._probing):
+                raise CircuitOpenError("circuit open after repeated failures")
+            if state == "half_open":
+                self._probing = True  # this call is the single trial
+
+    def release(self) -> None:
+        """The call never reached the provider: let another call be the trial."""
+        with self._lock:
+            self._probing = False
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            self._probing = False
+            if ok:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._failures += 1
+            if self._failures >= self.failure_threshold or self._opened_at is not None:
+                self._opened_at = time.monotonic()
+
+
+def _close(result: Any) -> None:
+    """Release a response nobody will read: a losing hedge's stream or a late straggler's."""
+    for obj in (result, getattr(result, "_iterator", None)):  # Gemini wraps the stream
+        for name in ("close", "cancel"):
+            method = getattr(obj, name, None)
+            if callable(method):
+                try:
+                    method()
+                except Exception:
+                    pass
+                return
+
+
+async def _aclose(result: Any) -> None:
+    for obj in (result, getattr(result, "_iterator", None)):
+        method = getattr(obj, "aclose", None)
+        if callable(method):
+            try:
+                await method()
+            except Exception:
+                pass
+            return
+    _close(result)
+
+
+class _Call:
+    """One submitted sync call; started_at is set once a worker thread picks it up."""
+
+    def __init__(self, executor: ThreadPoolExecutor, fn: Callable[..., Any], args: Tuple, kwargs: Dict[str, Any]):
+        self.started_at: Optional[float] = None
+        self.started = threading.Event()
+        self.future: Future = executor.submit(self._run, fn, args, kwargs)
+        self.future.add_done_callback(lambda _: self.started.set())  # also when cancelled
+
+    def _run(self, fn: Callable[..., Any], args: Tuple, kwargs: Dict[str, Any]) -> Any:
+        self.started_at = time.monotonic()
+        self.started.set()
+        return fn(*args, **kwargs)
+
+    def abandon(self) -> None:
+        """Drop the call if it is still queued, else close its result when it arrives."""
+        if not self.future.cancel():
+            self.future.add_done_callback(_close_result)
+
+
+def _close_result(future: Future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        _close(future.result())
+
+
+class ResilientCaller:
+    """Retries, deadlines, hedging and a circuit breaker for one provider."""
+
+    def __init__(self, provider: str, config: ResilienceConfig = DEFAULT_RESILIENCE_CONFIG):
+        self.provider = provider
+        self.config = config
+        self.deadline = config.deadline_seconds.get(provider, config.default_deadline_seconds)
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker(config.breaker_failure_threshold, config.breaker_reset_seconds)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"calls": 0, "attempts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0,
+                       "timeouts": 0, "failures": 0, "rejected": 0}
+
+    # ---------- bookkeeping ----------
+
+    def _count(self, **counts: int) -> None:
+        with self._stats_lock:
+            for k, v in counts.items():
+                self._stats[k] += v
+        step = {k: v for k, v in counts.items() if k in ("retries", "hedges", "hedge_wins", "timeouts")}
+        add_counts(**step)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            out = dict(self._stats)
+        out["breaker"] = self.breaker.state
+        out["hedge_delay_s"] = self.hedge_delay()
+        return out
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there is too little history."""
+        cfg = self.config
+        if not cfg.hedge or len(self.latency) < cfg.hedge_min_samples:
+            return None
+        delay = max(cfg.hedge_min_delay_seconds, self.latency.percentile(cfg.hedge_percentile))
+        return delay if delay < self.deadline else None
+
+    def _retrying_kwargs(self) -> Dict[str, Any]:
+        return dict(
+            stop=stop_after_attempt(self.config.max_attempts),
+            wait=wait_random_exponential(multiplier=self.config.backoff_initial_seconds,
+                                         max=self.config.backoff_max_seconds),
+            retry=retry_if_exception(is_retryable),
+            reraise=True,
+        )
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # one pool per provider: threads stuck on a hung Gemini call never delay Valyu
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.config.pool_size, thread_name_prefix=f"resilient-{self.provider}"
+                )
+            return self._executor
+
+    def _check_breaker(self) -> None:
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self._count(rejected=1)
+            raise CircuitOpenError(f"{self.provider}: circuit open after repeated failures") from None
+
+    def _settle(self, ok: bool, timed_out: bool = False) -> None:
+        self.breaker.record(ok)
+        if timed_out:
+            self._count(timeouts=1)
+
+    # ---------- sync ----------
+
+    def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        self._count(calls=1)
+        try:
+            for attempt in Retrying(**self._retrying_kwargs()):
+                with attempt:
+                    if attempt.retry_state.attempt_number > 1:
+                        self._count(retries=1)
+                    self._check_breaker()
+                    return self._attempt(fn, args, kwargs)
+        except BaseException:
+            self._count(failures=1)
+            raise
+
+    def _attempt(self, fn: Callable[..., T], args: Tuple, kwargs: Dict[str, Any]) -> T:
+        self._count(attempts=1)
+        executor = self._get_executor()
+        calls = [_Call(executor, fn, args, kwargs)]
+        # the deadline and the hedge delay run from when a worker starts the call,
+        # not while it waits in the pool queue behind earlier (possibly hung) calls
+        pending = {calls[0].future: (0, calls[0])}
+        try:
+            if not calls[0].started.wait(self.deadline):
+                # every worker is busy: not an answer from the provider, so the breaker
+                # only gives back its half-open trial instead of counting a failure
+                self.breaker.release()
+                self._count(timeouts=1)
+                raise DeadlineExceeded(f"{self.provider}: no free worker within {self.deadline:.1f}s")
+            start = calls[0].started_at or time.monotonic()
+            delay = self.hedge_delay()
+            if delay is not None:
+                done, _ = wait([calls[0].future], timeout=delay)
+                if not done:
+                    calls.append(_Call(executor, fn, args, kwargs))
+                    pending[calls[1].future] = (1, calls[1])
+                    self._count(hedges=1)
+
+            last_exc: Optional[BaseException] = None
+            while pending:
+                remaining = self.deadline - (time.monotonic() - start)
+                done, _ = wait(list(pending), timeout=max(0.0, remaining), return_when=FIRST_COMPLETED)
+                if not done:
+                    # threads cannot be cancelled: the stragglers finish in the background
+                    self._settle(False, timed_out=True)
+                    raise DeadlineExceeded(f"{self.provider}: no response within {self.deadline:.1f}s")
+                for f in done:
+                    idx, call = pending.pop(f)
+                    if f.exception() is None:
+                        self.latency.add(time.monotonic() - call.started_at)
+                        self._settle(True)
+                        if idx > 0:
+                            self._count(hedge_wins=1)
+                        return f.result()
+                    last_exc = f.exception()
+            self._settle(False)
+            raise last_exc
+        finally:
+            for _, call in pending.values():
+                call.abandon()
+
+    # ---------- async ----------
+
+    async def acall(self, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        self._count(calls=1)
+        try:
+            async for attempt in AsyncRetrying(**self._retrying_kwargs()):
+                with attempt:
+                    if attempt.retry_state.attempt_number > 1:
+                        self._count(retries=1)
+                    self._check_breaker()
+                    return await self._attempt_async(fn, args, kwargs)
+        except BaseException:
+            self._count(failures=1)
+            raise
+
+    async def _attempt_async(self, fn: Callable[..., Awaitable[T]], args: Tuple, kwargs: Dict[str, Any]) -> T:
+        self._count(attempts=1)
+        start = time.monotonic()
+        tasks: Dict[asyncio.Task, Tuple[int, float]] = {
+            asyncio.ensure_future(fn(*args, **kwargs)): (0, start)
+        }
+        try:
+            delay = self.hedge_delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(list(tasks), timeout=delay)
+                if not done:
+                    tasks[asyncio.ensure_future(fn(*args, **kwargs))] = (1, time.monotonic())
+                    self._count(hedges=1)
+
+            last_exc: Optional[BaseException] = None
+            while tasks:
+                remaining = self.deadline - (time.monotonic() - start)
+                done, _ = await asyncio.wait(
+                    list(tasks), timeout=max(0.0, remaining), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    self._settle(False, timed_out=True)
+                    raise DeadlineExceeded(f"{self.provider}: no response within {self.deadline:.1f}s")
+                for task in done:
+                    idx, started = tasks.pop(task)
+                    if task.exception() is None:
+                        self.latency.add(time.monotonic() - started)
+                        self._settle(True)
+                        if idx > 0:
+                            self._count(hedge_wins=1)
+                        return task.result()
+                    last_exc = task.exception()
+            self._settle(False)
+            raise last_exc
+        finally:
+            for task in tasks:
+                if task.done() and not task.cancelled() and task.exception() is None:
+                    await _aclose(task.result())  # finished alongside the winner
+                else:
+                    task.cancel()
+
+    def wrap(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """fn with every call going through this caller (sync or async)."""
+        if asyncio.iscoroutinefunction(fn) or asyncio.iscoroutinefunction(getattr(fn, "__call__", None)):
+            async def async_wrapped(*args: Any, **kwargs: Any) -> Any:
+                return await self.acall(fn, *args, **kwargs)
+            return async_wrapped
+
+        def wrapped(*args: Any, **kwargs: Any) -> Any:
+            return self.call(fn, *args, **kwargs)
+        return wrapped
+
+
+_callers: Dict[str, ResilientCaller] = {}
+_callers_lock = threading.Lock()
+
+
+def get_caller(provider: str, config: ResilienceConfig = DEFAULT_RESILIENCE_CONFIG) -> ResilientCaller:
+    """One caller per provider per process, so latency history and breaker are shared."""
+    with _callers_lock:
+        caller = _callers.get(provider)
+        if caller is None:
+            caller = _callers[provider] = ResilientCaller(provider, config)
+        return caller
+
+
+def resilience_stats() -> Dict[str, Dict[str, Any]]:
+    with _callers_lock:
+        callers = dict(_callers)
+    return {name: caller.stats() for name, caller in callers.items()}
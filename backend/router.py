@@ -0,0 +1,123 @@
+# backend/router.py
+# Local search-routing gate. Scores a query with cheap lexical features
+# (tickers, finance keywords, company names, recency words) and returns the
+# probability that web search is needed. Confident queries skip the planning
+# LLM call; only ambiguous ones still ask Gemini to decide SEARCH / NOT SEARCH.
+
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from .config import AgentConfig, DEFAULT_CONFIG
+from .prompts import plan_wants_search
+
+FINANCE_KEYWORDS = frozenset("""
+stock stocks share shares etf etfs earnings revenue revenues profit margin margins
+valuation dividend dividends price prices ipo guidance quarter quarterly q1 q2 q3 q4
+fund funds bond bonds yield yields crypto bitcoin ethereum financials balance
+sheet cash flow eps ebitda buy sell outlook forecast analyst analysts rating
+market cap sector index nasdaq nyse s&p dow
+""".split())
+RECENCY_WORDS = frozenset("latest recent recently today yesterday news now current currently this week month year".split())
+GENERIC_PATTERNS = re.compile(
+    r"\b(what is an?|what are|explain|define|definition of|meaning of|difference between|"
+    r"how do(?:es)? .+ work|in general|basics of|concept of)\b",
+    re.IGNORECASE,
+)
+DOLLAR_TICKER = re.compile(r"\$[A-Z]{1,5}\b")
+UPPER_TOKEN = re.compile(r"\b[A-Z]{2,5}\b")
+DOMAIN = re.compile(r"\b\w+\.(?:ai|com|io|co|net)\b", re.IGNORECASE)
+PROPER_NOUN = re.compile(r"(?<!^)(?<![.?!] )\b[A-Z][A-Za-z]+\b")
+YEAR = re.compile(r"\b20\d\d\b")
+# upper-case tokens that are not tickers
+NOT_TICKERS = frozenset("AI CEO CFO ETF ETFS IPO USA US UK EU GDP CPI API FAQ OK EPS IT".split())
+COMPANY_WORDS = frozenset("company companies inc corp corporation ltd plc startup holdings group".split())
+
+# log-odds weights; the bias makes an empty query lean slightly to NOT SEARCH
+WEIGHTS = {
+    "bias": -0.5,
+    "dollar_ticker": 3.0,
+    "ticker": 2.0,
+    "finance_keyword": 0.8,  # per keyword, capped at 3
+    "recency": 1.5,
+    "company": 1.2,
+    "proper_noun": 1.0,
+    "year": 1.0,
+    "generic": -2.5,
+}
+
+
+class RouteDecision(BaseModel):
+    probability: float  # P(search needed)
+    search: bool  # decision at the threshold
+    confident: bool  # False: fall back to the planning LLM
+    features: Dict[str, Any]
+
+    def explain(self) -> str:
+        verdict = "SEARCH" if self.search else "NOT SEARCH"
+        active = ", ".join(f"{k}={v}" for k, v in self.features.items() if v)
+        return f"Local router decision: {verdict} (p={self.probability:.2f}; {active or 'no features'})."
+
+
+def extract_features(query: str) -> Dict[str, Any]:
+    words = re.findall(r"[a-z0-9&$]+", query.lower())
+    tickers = [t for t in UPPER_TOKEN.findall(query) if t not in NOT_TICKERS]
+    return {
+        "dollar_ticker": len(DOLLAR_TICKER.findall(query)),
+        "ticker": len(tickers),
+        "finance_keyword": sum(w in FINANCE_KEYWORDS for w in words),
+        "recency": sum(w in RECENCY_WORDS for w in words),
+        "company": int(bool(DOMAIN.search(query)) or any(w in COMPANY_WORDS for w in words)),
+        "proper_noun": len(PROPER_NOUN.findall(query)),
+        "year": len(YEAR.findall(query)),
+        "generic": int(bool(GENERIC_PATTERNS.search(query))),
+    }
+
+
+def search_probability(features: Dict[str, Any]) -> float:
+    logit = WEIGHTS["bias"]
+    logit += WEIGHTS["dollar_ticker"] * min(features["dollar_ticker"], 1)
+    logit += WEIGHTS["ticker"] * min(features["ticker"], 1)
+    logit += WEIGHTS["finance_keyword"] * min(features["finance_keyword"], 3)
+    logit += WEIGHTS["recency"] * min(features["recency"], 1)
+    logit += WEIGHTS["company"] * features["company"]
+    logit += WEIGHTS["proper_noun"] * min(features["proper_noun"], 1)
+    logit += WEIGHTS["year"] * min(features["year"], 1)
+    logit += WEIGHTS["generic"] * features["generic"]
+    return 1.0 / (1.0 + math.exp(-logit))
+
+
+def route_query(query: str, config: AgentConfig = DEFAULT_CONFIG) -> RouteDecision:
+    """
+    Search when P(search) >= config.enable_search_threshold. Within
+    config.router_margin of the threshold the decision is not confident.
+    """
+    features = extract_features(query)
+    p = search_probability(features)
+    threshold = config.enable_search_threshold
+    return RouteDecision(
+        probability=p,
+        search=p >= threshold,
+        confident=abs(p - threshold) >= config.router_margin,
+        features=features,
+    )
+
+
+def memory_wants_search(memory: Dict[str, Any]) -> bool:
+    """A local route decision wins; otherwise fall back to reading the LLM plan."""
+    if "route" in memory:
+        return memory["route"] == "search"
+    return plan_wants_search(memory.get("plan", ""))
+
+
+_DECISION = re.compile(r"\b(NOT\s+SEARCH|SEARCH)\b")
+
+
+def parse_plan_decision(plan: str) -> Optional[bool]:
+    """Read the final upper-case SEARCH / NOT SEARCH verdict out of an LLM plan."""
+    matches: List[str] = _DECISION.findall(plan or "")
+    if not matches:
+        return None
+    return not matches[-1].startswith("NOT")
@@ -0,0 +1,98 @@
+# backend/speculation.py
+# Speculative web search: start the search while the planning LLM call is still
+# running, then use or discard the result once the plan is known.
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .models import SpeculationLog
+from .step_meta import collect_step_meta
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculative-search")
+        return _executor
+
+
+class SpeculativeSearch:
+    """Runs `search(query)` on a background thread (backend/graph.py)."""
+
+    def __init__(self, search: Callable[[str], str], query: str):
+        self.search_seconds: Optional[float] = None
+        self.meta: Dict[str, Any] = {}
+        # run in a copy of the caller's context so spans nest under the current run
+        ctx = contextvars.copy_context()
+        self._future: Future = _get_executor().submit(ctx.run, self._run, search, query)
+
+    def _run(self, search: Callable[[str], str], query: str) -> str:
+        start = time.perf_counter()
+        with collect_step_meta() as meta:
+            result = search(query)
+        self.search_seconds = time.perf_counter() - start
+        self.meta = meta
+        return result
+
+    def take(self) -> Tuple[str, SpeculationLog, Dict[str, Any]]:
+        """Wait for the search and return (result, log, step meta)."""
+        start = time.perf_counter()
+        result = self._future.result()
+        waited = time.perf_counter() - start
+        log = SpeculationLog(
+            outcome="used",
+            search_seconds=self.search_seconds,
+            saved_seconds=max(0.0, self.search_seconds - waited),
+        )
+        return result, log, self.meta
+
+    def discard(self) -> SpeculationLog:
+        # cancel() only succeeds if the search never started; otherwise it
+        # finishes in the background and its cost is the wasted spend
+        self._future.cancel()
+        return SpeculationLog(outcome="discarded", search_seconds=self.search_seconds)
+
+
+class AsyncSpeculativeSearch:
+    """Runs `await search(query)` as a task next to the planning call (backend/async_graph.py)."""
+
+    def __init__(self, search: Callable[[str], Awaitable[str]], query: str):
+        self.search_seconds: Optional[float] = None
+        self.meta: Dict[str, Any] = {}
+        self._task = asyncio.create_task(self._run(search, query))
+
+    async def _run(self, search: Callable[[str], Awaitable[str]], query: str) -> str:
+        start = time.perf_counter()
+        with collect_step_meta() as meta:
+            result = await search(query)
+        self.search_seconds = time.perf_counter() - start
+        self.meta = meta
+        return result
+
+    async def take(self) -> Tuple[str, SpeculationLog, Dict[str, Any]]:
+        start = time.perf_counter()
+        result = await self._task
+        waited = time.perf_counter() - start
+        log = SpeculationLog(
+            outcome="used",
+            search_seconds=self.search_seconds,
+            saved_seconds=max(0.0, self.search_seconds - waited),
+        )
+        return result, log, self.meta
+
+    def discard(self) -> SpeculationLog:
+        if self._task.done():
+            # retrieve the outcome so a failed search doesn't log "never retrieved"
+            if not self._task.cancelled():
+                self._task.exception()
+        else:
+            self._task.cancel()
+        return SpeculationLog(outcome="discarded", search_seconds=self.search_seconds)
@@ -0,0 +1,107 @@
+# backend/step_meta.py
+# Per-step metadata collected from the calls a node makes (cache hits, call
+# timings, token counts, payload sizes).
+# A node opens `collect_step_meta()` around its work; LLM/tool wrappers call
+# `annotate()` and the node copies the result into its StepLog. Context
+# variables follow asyncio tasks and `asyncio.to_thread`, so the same code
+# works for backend/graph.py and backend/async_graph.py.
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from .models import ResilienceLog, StepTiming
+
+_current: ContextVar[Optional[Dict[str, Any]]] = ContextVar("step_meta", default=None)
+
+
+@contextmanager
+def collect_step_meta() -> Iterator[Dict[str, Any]]:
+    meta: Dict[str, Any] = {}
+    token = _current.set(meta)
+    try:
+        yield meta
+    finally:
+        _current.reset(token)
+
+
+def annotate(**fields: Any) -> None:
+    """Attach fields to the step being collected; a no-op outside a node."""
+    meta = _current.get()
+    if meta is not None:
+        meta.update(fields)
+
+
+def mark_cache(hit: bool) -> None:
+    """A step counts as served from cache only if every cached call in it hit."""
+    meta = _current.get()
+    if meta is not None:
+        meta["cache_hit"] = meta.get("cache_hit", True) and hit
+
+
+def record_call(kind: str, seconds: float, **counts: Optional[int]) -> None:
+    """
+    Add one call's time to `<kind>_seconds` ("llm" or "tool") and its counts
+    (prompt_tokens, response_tokens, input_bytes, output_bytes) to the step.
+    Several calls in one step are summed.
+    """
+    meta = _current.get()
+    if meta is None:
+        return
+    key = f"{kind}_seconds"
+    meta[key] = meta.get(key, 0.0) + seconds
+    add_counts(**counts)
+
+
+def add_counts(**counts: Optional[int]) -> None:
+    """Add to numeric step fields (summed across calls); None values are skipped."""
+    meta = _current.get()
+    if meta is None:
+        return
+    for name, value in counts.items():
+        if value is not None:
+            meta[name] = meta.get(name, 0) + value
+
+
+def merge_step_meta(other: Dict[str, Any]) -> None:
+    """Fold meta collected elsewhere (e.g. on a worker thread) into the current step."""
+    if "cache_hit" in other:
+        mark_cache(other["cache_hit"])
+    add_counts(**{k: v for k, v in other.items() if k != "cache_hit" and isinstance(v, (int, float))})
+
+
+@contextmanager
+def timed_call(kind: str) -> Iterator[Dict[str, int]]:
+    """Time the block as one `kind` call; fill the yielded dict with its counts."""
+    counts: Dict[str, int] = {}
+    start = time.perf_counter()
+    try:
+        yield counts
+    finally:
+        record_call(kind, time.perf_counter() - start, **counts)
+
+
+def step_timing(meta: Dict[str, Any], started: float) -> StepTiming:
+    """StepTiming for a node that started at `started` (time.perf_counter())."""
+    fields = {k: meta[k] for k in StepTiming.model_fields if k in meta}
+    return StepTiming(wall_seconds=time.perf_counter() - started, **fields)
+
+
+def track_first_token(
+    meta: Dict[str, Any], started: float, on_token: Callable[[str], None]
+) -> Callable[[str], None]:
+    """on_token that also records `first_token_seconds` (since `started`) for the step."""
+
+    def forward(chunk: str) -> None:
+        if "first_token_seconds" not in meta:
+            meta["first_token_seconds"] = time.perf_counter() - started
+        on_token(chunk)
+
+    return forward
+
+
+def resilience_log(meta: Dict[str, Any]) -> Optional[ResilienceLog]:
+    """ResilienceLog if any call in the step was retried, hedged or timed out."""
+    fields = {k: meta[k] for k in ResilienceLog.model_fields if meta.get(k)}
+    return ResilienceLog(**fields) if fields else None
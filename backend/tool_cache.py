@@ -0,0 +1,118 @@
+# backend/tool_cache.py
+# In-process TTL cache with request coalescing for the Valyu tools.
+#
+# Identical calls made while one is already in flight wait for that call instead
+# of going upstream again, so N concurrent runs asking about the same company
+# cost one search. Results are then served from memory until the tool's TTL
+# runs out. Per-tool hit rate and time saved are exposed via `stats()`.
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple, TypeVar
+
+from .config import ToolCacheConfig, DEFAULT_TOOL_CACHE_CONFIG
+from .step_meta import mark_cache
+
+T = TypeVar("T")
+
+
+class ToolCache:
+    def __init__(self, config: ToolCacheConfig = DEFAULT_TOOL_CACHE_CONFIG):
+        self.config = config
+        self._lock = threading.Lock()
+        # key -> (expires_at, value, upstream seconds), oldest first
+        self._entries: OrderedDict[Hashable, Tuple[float, Any, float]] = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _tool_stats(self, tool: str) -> Dict[str, float]:
+        return self._stats.setdefault(
+            tool, {"hits": 0, "coalesced": 0, "misses": 0, "errors": 0, "upstream_s": 0.0, "saved_s": 0.0}
+        )
+
+    def call(self, tool: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Return fn(*args, **kwargs), from cache or a shared in-flight call when possible."""
+        if not self.config.enabled:
+            return fn(*args, **kwargs)
+
+        key = (tool, args, tuple(sorted(kwargs.items())))
+        with self._lock:
+            stats = self._tool_stats(tool)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                stats["hits"] += 1
+                stats["saved_s"] += entry[2]
+                mark_cache(True)
+                return entry[1]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+
+        if not owner:
+            start = time.perf_counter()
+            value, cost = future.result()  # re-raises the owner's error
+            with self._lock:
+                stats["coalesced"] += 1
+                stats["saved_s"] += max(0.0, cost - (time.perf_counter() - start))
+            mark_cache(True)
+            return value
+
+        mark_cache(False)
+        start = time.perf_counter()
+        try:
+            value = fn(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                stats["errors"] += 1
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        cost = time.perf_counter() - start
+
+        ttl = self.config.ttl_seconds.get(tool, 0)
+        with self._lock:
+            stats["misses"] += 1
+            stats["upstream_s"] += cost
+            if ttl > 0:
+                self._entries[key] = (time.monotonic() + ttl, value, cost)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.config.max_entries:
+                    self._entries.popitem(last=False)
+            del self._inflight[key]
+        future.set_result((value, cost))
+        return value
+
+    def cached(self, tool: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+        """Decorator form of `call`."""
+
+        def decorator(fn: Callable[..., T]) -> Callable[..., T]:
+            @functools.wraps(fn)
+            def wrapper(*args: Any, **kwargs: Any) -> T:
+                return self.call(tool, fn, *args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-tool counters plus hit_rate (hits + coalesced over all calls)."""
+        with self._lock:
+            out = {}
+            for tool, s in self._stats.items():
+                served = s["hits"] + s["coalesced"]
+                total = served + s["misses"] + s["errors"]
+                out[tool] = {**s, "hit_rate": served / total if total else 0.0}
+            return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+
+
+tool_cache = ToolCache()
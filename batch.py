@@ -0,0 +1,147 @@
+# batch.py
+# Batch entry point next to main.run_agent_with_query: runs many queries through
+# the async pipeline with bounded concurrency and per-provider rate limits, and
+# writes each trace as soon as its run finishes.
+#
+#   python batch.py queries.txt --concurrency 64
+#
+# Runs are checkpointed per node (backend/checkpoint.py): after a crash, the
+# same command skips saved runs and resumes the rest without repeating calls.
+
+import argparse
+import asyncio
+import hashlib
+import sys
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from analysis.traces_loader import save_trace, make_trace_name
+from backend import async_graph
+from backend.async_graph import LLMFn, ResultsFn, SearchFn
+from backend.checkpoint import get_checkpoint_store
+from backend.config import AgentConfig, BatchConfig, DEFAULT_BATCH_CONFIG, DEFAULT_CONFIG
+from backend.ratelimit import AsyncRateLimiter
+from backend.resilience import resilience_stats
+from backend.tool_cache import tool_cache
+
+
+async def run_agent_batch_async(
+    queries: Iterable[str],
+    config: BatchConfig = DEFAULT_BATCH_CONFIG,
+    llm: Optional[LLMFn] = None,
+    search: Optional[SearchFn] = None,
+    traces_dir: Optional[Path] = None,
+    agent_config: AgentConfig = DEFAULT_CONFIG,
+    search_results: Optional[ResultsFn] = None,
+    batch_id: Optional[str] = None,
+) -> List[Optional[str]]:
+    """
+    Run every query and save its trace. Returns trace names in input order;
+    a query whose run failed gets None (the error is printed, the batch goes on).
+    With `batch_id`, query i is checkpointed as run "<batch_id>:<i>": running the
+    same batch again skips saved runs and resumes the others where they stopped.
+    """
+    llm = AsyncRateLimiter(config.llm_rps, config.llm_burst).wrap(llm or async_graph.default_llm())
+    # one limiter for both search paths: fan-out sub-queries count against search_rps too
+    search_limiter = AsyncRateLimiter(config.search_rps, config.search_burst)
+    search = search_limiter.wrap(search or async_graph.default_search())
+    search_results = search_limiter.wrap(search_results or async_graph.default_search_results())
+
+    queries = list(queries)
+    results: List[Optional[str]] = [None] * len(queries)
+    store = get_checkpoint_store() if batch_id else None
+    pending = iter(enumerate(queries))
+
+    async def worker() -> None:
+        # a fixed pool of workers pulls from one iterator, so thousands of
+        # queries never turn into thousands of live tasks
+        for idx, query in pending:
+            run_id = f"{batch_id}:{idx}" if batch_id else None
+            try:
+                if run_id is not None:
+                    done = await asyncio.to_thread(store.load, run_id)
+                    if done is not None and done.trace_name is not None:
+                        results[idx] = done.trace_name
+                        continue
+                state = await async_graph.run_agent(
+                    query, llm=llm, search=search, config=agent_config, search_results=search_results,
+                    run_id=run_id,
+                )
+                trace_name = make_trace_name(query)
+                await asyncio.to_thread(save_trace, state, trace_name, traces_dir)
+                if run_id is not None:
+                    await asyncio.to_thread(store.mark_saved, run_id, trace_name)
+                results[idx] = trace_name
+            except Exception as e:
+                print(f"[batch] query {idx} failed: {e}", file=sys.stderr)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, config.concurrency))))
+    return results
+
+
+def run_agent_batch(
+    queries: Iterable[str],
+    config: BatchConfig = DEFAULT_BATCH_CONFIG,
+    llm: Optional[LLMFn] = None,
+    search: Optional[SearchFn] = None,
+    traces_dir: Optional[Path] = None,
+    agent_config: AgentConfig = DEFAULT_CONFIG,
+    search_results: Optional[ResultsFn] = None,
+    batch_id: Optional[str] = None,
+) -> List[Optional[str]]:
+    """Blocking wrapper around run_agent_batch_async."""
+    return asyncio.run(run_agent_batch_async(
+        queries, config, llm, search, traces_dir, agent_config, search_results, batch_id
+    ))
+
+
+def batch_id_for(queries: List[str]) -> str:
+    """Stable id for a list of queries, so rerunning the same file resumes it."""
+    return "batch-" + hashlib.sha1("\n".join(queries).encode()).hexdigest()[:12]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a file of queries (one per line) through the agent.")
+    parser.add_argument("queries_file", type=Path)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_BATCH_CONFIG.concurrency)
+    parser.add_argument("--llm-rps", type=float, default=DEFAULT_BATCH_CONFIG.llm_rps)
+    parser.add_argument("--search-rps", type=float, default=DEFAULT_BATCH_CONFIG.search_rps)
+    parser.add_argument("--speculative-search", action="store_true",
+                        help="start each web search alongside its planning call")
+    parser.add_argument("--local-routing", action="store_true",
+                        help="skip the planning LLM call when the local router is confident")
+    parser.add_argument("--fanout", action="store_true",
+                        help="search fundamentals, news and risks sub-queries in parallel and merge them")
+    parser.add_argument("--no-checkpoint", action="store_true",
+                        help="do not checkpoint runs (a rerun starts every query from scratch)")
+    parser.add_argument("--fresh", action="store_true",
+                        help="forget earlier progress on this file and run every query again")
+    args = parser.parse_args()
+
+    lines = [q.strip() for q in args.queries_file.read_text().splitlines()]
+    config = DEFAULT_BATCH_CONFIG.model_copy(update={
+        "concurrency": args.concurrency,
+        "llm_rps": args.llm_rps,
+        "search_rps": args.search_rps,
+    })
+    agent_config = DEFAULT_CONFIG.model_copy(update={
+        "speculative_search": args.speculative_search,
+        "local_routing": args.local_routing,
+        "research_fanout": args.fanout,
+    })
+    queries = [q for q in lines if q]
+    batch_id = None if args.no_checkpoint else batch_id_for(queries)
+    if batch_id is not None:
+        store = get_checkpoint_store()
+        if args.fresh:
+            store.delete(batch_id + ":")
+        resumable = len(store.unfinished(batch_id + ":"))
+        print(f"{batch_id}: resuming {resumable} unfinished runs" if resumable else batch_id)
+    names = run_agent_batch(queries, config, agent_config=agent_config, batch_id=batch_id)
+    print(f"Saved {sum(n is not None for n in names)}/{len(names)} traces to data/traces/")
+    for tool, stats in tool_cache.stats().items():
+        print(f"{tool}: hit rate {stats['hit_rate']:.1%}, {stats['saved_s']:.1f}s saved, "
+              f"{stats['misses']} upstream calls ({stats['upstream_s']:.1f}s)")
+    for provider, stats in resilience_stats().items():
+        print(f"{provider}: {stats['calls']} calls, {stats['retries']} retries, {stats['hedges']} hedges "
+              f"({stats['hedge_wins']} won), {stats['timeouts']} timeouts, breaker {stats['breaker']}")
@@ -0,0 +1,51 @@
+# benchmarks/bench_async_agent.py
+# Throughput of batch.run_agent_batch against local stand-in backends.
+#
+#   python -m benchmarks.bench_async_agent --queries 2000 --concurrency 1 16 128
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from backend.config import BatchConfig
+from batch import run_agent_batch_async
+from benchmarks.fakes import FakeLLM, FakeSearch
+
+
+def bench(n_queries: int, concurrency: int, llm_latency: float, search_latency: float) -> dict:
+    llm = FakeLLM(latency=llm_latency, jitter=llm_latency / 2)
+    search = FakeSearch(latency=search_latency, jitter=search_latency / 2)
+    # rate limits set high enough that only the concurrency bound matters
+    config = BatchConfig(concurrency=concurrency, llm_rps=1e6, llm_burst=10**6,
+                         search_rps=1e6, search_burst=10**6)
+    queries = [f"Tell me about ticker T{i % 500}" for i in range(n_queries)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        names = asyncio.run(run_agent_batch_async(queries, config, llm, search, Path(tmp)))
+        elapsed = time.perf_counter() - start
+
+    ok = sum(n is not None for n in names)
+    return {
+        "concurrency": concurrency,
+        "queries": n_queries,
+        "ok": ok,
+        "seconds": round(elapsed, 3),
+        "runs_per_sec": round(ok / elapsed, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 128])
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    for c in args.concurrency:
+        # serial runs are slow by design; cap them so the table prints quickly
+        n = min(args.queries, 50) if c == 1 else args.queries
+        print(bench(n, c, args.llm_latency, args.search_latency))
@@ -0,0 +1,110 @@
+# benchmarks/bench_imports.py
+# Cold-start import cost of each entry point. Every entry point is imported in
+# a fresh interpreter under `python -X importtime`; the report shows the total
+# and the packages that take the most of it. Streamlit pages and scripts are
+# not executed: only their top-level imports are, which is what a cold start
+# pays before the first line of the page runs.
+#
+#   python -m benchmarks.bench_imports [--repeat 3] [--top 8] [--history benchmarks/results/import_times.jsonl]
+
+import argparse
+import ast
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import orjson
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# name -> module to import, or script whose top-level imports are run
+ENTRY_POINTS: Dict[str, str] = {
+    "backend.graph": "backend.graph",
+    "backend.async_graph": "backend.async_graph",
+    "main.py": "main.py",
+    "batch.py": "batch.py",
+    "frontend/main.py (Run)": "frontend/main.py",
+    "frontend/app.py (Navigator)": "frontend/app.py",
+    "frontend/viz.py (Visualizer)": "frontend/viz.py",
+}
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_code(target: str) -> str:
+    """Python source that performs the entry point's imports and nothing else."""
+    if not target.endswith(".py"):
+        return f"import {target}"
+    tree = ast.parse((ROOT / target).read_text())
+    # top-level imports only: imports inside functions or tabs are paid when used
+    lines = [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(lines)
+
+
+def measure(target: str) -> Tuple[float, List[Tuple[str, int, int]]]:
+    """(wall seconds, [(module, self us, depth)]) for one fresh interpreter."""
+    code = f"import sys; sys.path[:0] = [{str(ROOT)!r}, {str(ROOT / 'frontend')!r}]\n" + import_code(target)
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, env={**os.environ, "GLASSMIND_TRACING": "off"},
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, _, indent, name = match.groups()
+            modules.append((name, int(self_us), len(indent) // 2))
+    return wall, modules
+
+
+def report(target: str, repeat: int, top: int) -> Dict[str, object]:
+    # the fastest of a few runs: the slower ones mostly measure a cold disk cache
+    wall, modules = min((measure(target) for _ in range(repeat)), key=lambda r: r[0])
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in modules:
+        by_package[name.split(".")[0]] += self_us
+    heaviest = sorted(by_package.items(), key=lambda kv: -kv[1])[:top]
+    return {
+        "import_ms": round(sum(us for _, us, _ in modules) / 1e3, 1),
+        "wall_ms": round(wall * 1e3, 1),  # includes interpreter start-up
+        "modules": len(modules),
+        "top": {name: round(us / 1e3, 1) for name, us in heaviest},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--only", nargs="*", help="entry point names to measure (default: all)")
+    parser.add_argument("--history", type=Path, default=None, help="append the results to this JSONL file")
+    args = parser.parse_args()
+
+    results = {}
+    for name, target in ENTRY_POINTS.items():
+        if args.only and name not in args.only:
+            continue
+        try:
+            row = report(target, args.repeat, args.top)
+        except RuntimeError as e:
+            print(f"{name:<30} import failed: {e}")
+            continue
+        results[name] = row
+        top = ", ".join(f"{pkg} {ms:.0f}" for pkg, ms in row["top"].items())
+        print(f"{name:<30} {row['import_ms']:>8.1f} ms imports, {row['wall_ms']:>8.1f} ms wall, "
+              f"{row['modules']:>5} modules  | {top}")
+
+    if args.history is not None:
+        args.history.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.history, "ab") as f:
+            f.write(orjson.dumps({"at": time.time(), "python": sys.version.split()[0], "entry_points": results}) + b"\n")
+        print(f"appended to {args.history}")
@@ -0,0 +1,105 @@
+# benchmarks/bench_jobs.py
+# Load test of the job-queue agent service (backend/jobs.py) against local
+# stand-in backends. Every job is submitted at once, so the queue saturates:
+# the report shows how long jobs waited for a worker, how long they ran, the
+# throughput, and that the per-provider concurrency caps held. A share of the
+# jobs is cancelled, some while queued and some while running.
+#
+# Runs in a temporary working directory: the queue, checkpoints and traces of
+# the test never touch data/.
+#
+#   python -m benchmarks.bench_jobs [--jobs 500] [--workers 32] [--llm-concurrency 8] [--search-concurrency 8]
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from backend.config import JobServiceConfig
+from backend.jobs import AgentService
+from benchmarks.bench_resilience import percentile
+from benchmarks.fakes import FakeLLM, FakeSearch
+
+
+def ms(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    return {"p50_ms": round(statistics.median(values) * 1e3, 1), "p99_ms": round(percentile(values, 0.99) * 1e3, 1)}
+
+
+def bench(args: argparse.Namespace) -> Dict[str, object]:
+    config = JobServiceConfig(
+        path="jobs.sqlite", workers=args.workers, llm_concurrency=args.llm_concurrency,
+        search_concurrency=args.search_concurrency, max_queued=args.jobs, poll_seconds=args.poll,
+    )
+    llm = FakeLLM(latency=args.llm_latency, jitter=args.llm_latency / 2)
+    search = FakeSearch(latency=args.search_latency, jitter=args.search_latency / 2)
+    service = AgentService(config, llm=llm, search=search, search_results=search.results,
+                           traces_dir=Path("traces")).start()
+    rng = random.Random(0)
+
+    start = time.time()
+    jobs = [service.submit(f"Tell me about ticker T{i}").job_id for i in range(args.jobs)]
+    submitted = time.time() - start
+    # cancel some at the back of the queue right away, some of the first ones once they run
+    cancel_queued = [j for j in jobs[len(jobs) // 2:] if rng.random() < args.cancel_rate]
+    for job_id in cancel_queued:
+        service.cancel(job_id)
+    time.sleep(min(0.5, args.llm_latency * 2))
+    for job_id in jobs[:args.workers]:
+        if rng.random() < args.cancel_rate:
+            service.cancel(job_id)
+
+    while True:
+        counts = service.store.counts()
+        if counts.get("queued", 0) + counts.get("running", 0) == 0:
+            break
+        time.sleep(0.05)
+    elapsed = time.time() - start
+    stats = service.stats()
+    service.stop()
+
+    finished = [service.get(j) for j in jobs]
+    done = [j for j in finished if j.status == "done"]
+    return {
+        "jobs": args.jobs,
+        "status": counts,
+        "submit_ms_per_job": round(submitted / args.jobs * 1e3, 3),
+        "seconds": round(elapsed, 2),
+        "jobs_per_sec": round(len(done) / elapsed, 1),
+        "queue_wait": ms([j.wait_seconds for j in done]),
+        "run": ms([j.run_seconds for j in done]),
+        "end_to_end": ms([j.finished_at - j.queued_at for j in done]),
+        "llm_peak": f"{stats['llm']['peak']}/{stats['llm']['limit']}",
+        "search_peak": f"{stats['search']['peak']}/{stats['search']['limit']}",
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--search-concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.1)
+    parser.add_argument("--cancel-rate", type=float, default=0.05)
+    parser.add_argument("--poll", type=float, default=0.05)
+    args = parser.parse_args()
+
+    # two LLM calls per run: the LLM cap bounds throughput at about this many runs per second
+    bound = min(args.llm_concurrency / (2 * args.llm_latency), args.search_concurrency / args.search_latency)
+    print(f"{args.jobs} jobs, {args.workers} workers, LLM cap {args.llm_concurrency}, "
+          f"search cap {args.search_concurrency} (bound ~{bound:.0f} runs/s)")
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            for key, value in bench(args).items():
+                print(f"  {key:<18} {value}")
+        finally:
+            os.chdir(cwd)
@@ -0,0 +1,58 @@
+# benchmarks/bench_research.py
+# Fan-out research (backend/research.py) against a local stand-in search: the
+# sub-queries run in parallel, so research latency should track the slowest
+# single call rather than the sum of all of them.
+#
+#   python -m benchmarks.bench_research [--queries 20] [--latency 0.2] [--jitter 0.1]
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from backend.research import FACETS, fan_out_search, fan_out_search_async
+from benchmarks.fakes import FakeSearch
+
+
+def bench_sync(search: FakeSearch, n: int) -> dict:
+    fanout, sequential, raw, kept = [], [], 0, 0
+    for i in range(n):
+        query = f"Tell me about T{i}"
+        start = time.perf_counter()
+        out = fan_out_search(query, search=search.results_sync)
+        fanout.append(time.perf_counter() - start)
+        raw += out["raw_results"]
+        kept += len(out["results"])
+
+        start = time.perf_counter()
+        for facet in FACETS:
+            search.results_sync(f"{query} -- {facet}")
+        sequential.append(time.perf_counter() - start)
+    return {
+        "fanout_p50_ms": round(statistics.median(fanout) * 1e3, 1),
+        "sequential_p50_ms": round(statistics.median(sequential) * 1e3, 1),
+        "raw_results": raw,
+        "kept_results": kept,
+    }
+
+
+async def bench_async(search: FakeSearch, n: int) -> dict:
+    latencies = []
+    for i in range(n):
+        start = time.perf_counter()
+        await fan_out_search_async(f"Tell me about T{i}", search=search.results)
+        latencies.append(time.perf_counter() - start)
+    return {"fanout_p50_ms": round(statistics.median(latencies) * 1e3, 1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    args = parser.parse_args()
+
+    search = FakeSearch(latency=args.latency, jitter=args.jitter)
+    print(f"{len(FACETS)} sub-queries, single call {args.latency * 1e3:.0f} ± {args.jitter * 1e3:.0f} ms")
+    print("sync ", bench_sync(search, args.queries))
+    print("async", asyncio.run(bench_async(search, args.queries)))
@@ -0,0 +1,112 @@
+# benchmarks/bench_resilience.py
+# Tail latency and success rate of calls to a faulty backend, bare versus
+# through backend/resilience.py (retries, deadline, hedging). The fakes inject
+# transient errors and occasional very slow responses.
+#
+#   python -m benchmarks.bench_resilience [--calls 2000] [--error-rate 0.05] [--slow-rate 0.03]
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from backend import async_graph
+from backend.config import ResilienceConfig
+from backend.resilience import ResilientCaller
+from benchmarks.fakes import FakeLLM, FakeSearch
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_calls(fn: Callable[[str], Awaitable[str]], n: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    failures = 0
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        nonlocal failures
+        async with gate:
+            start = time.perf_counter()
+            try:
+                await fn(f"prompt {i}")
+            except Exception:
+                failures += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    elapsed = time.perf_counter() - start
+    return {
+        "success_rate": round(1 - failures / n, 4),
+        "p50_ms": round(statistics.median(latencies) * 1e3, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1e3, 1) if latencies else None,
+        "seconds": round(elapsed, 2),
+    }
+
+
+def config(deadline: float, hedge: bool) -> ResilienceConfig:
+    # short backoff so the benchmark measures the policy, not the sleeps
+    return ResilienceConfig(
+        backoff_initial_seconds=0.01, backoff_max_seconds=0.1,
+        default_deadline_seconds=deadline, hedge=hedge, hedge_min_samples=20,
+        breaker_failure_threshold=10**6,
+    )
+
+
+async def bench_calls(args: argparse.Namespace) -> None:
+    faults = dict(error_rate=args.error_rate, slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    modes = {
+        "bare": lambda llm: llm,
+        "retries + deadline": lambda llm: ResilientCaller("fake", config(args.deadline, hedge=False)).wrap(llm),
+        "retries + deadline + hedging": lambda llm: ResilientCaller("fake", config(args.deadline, hedge=True)).wrap(llm),
+    }
+    print(f"{args.calls} calls, latency {args.latency * 1e3:.0f} ms, {args.error_rate:.0%} errors, "
+          f"{args.slow_rate:.0%} slow ({args.slow_latency * 1e3:.0f} ms)")
+    for label, make in modes.items():
+        llm = FakeLLM(latency=args.latency, jitter=args.latency / 2, **faults)
+        fn = make(llm)
+        row = await run_calls(fn, args.calls, args.concurrency)
+        print(f"  {label:<30} {row}  backend calls={llm.calls + llm.errors}")
+
+
+async def bench_agent(args: argparse.Namespace) -> None:
+    """Whole runs: a failing search degrades to an answer without research."""
+    faults = dict(error_rate=args.error_rate, slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    for label, resilient in (("bare", False), ("resilient", True)):
+        llm = FakeLLM(latency=args.latency, **faults)
+        search = FakeSearch(latency=args.latency * 2, **faults)
+        llm_fn, search_fn = llm, search
+        if resilient:
+            llm_fn = ResilientCaller("fake-llm", config(args.deadline, hedge=True)).wrap(llm)
+            search_fn = ResilientCaller("fake-search", config(args.deadline * 2, hedge=True)).wrap(search)
+        ok, degraded, retries = 0, 0, 0
+        n = args.calls // 10
+        for i in range(n):
+            try:
+                state = await async_graph.run_agent(f"Tell me about T{i}", llm_fn, search_fn)
+            except Exception:
+                continue
+            ok += 1
+            degraded += any((s.tool_output or "").startswith("[ERROR]") for s in state.steps)
+            retries += sum(s.resilience.retries for s in state.steps if s.resilience)
+        print(f"  agent {label:<10} completed {ok}/{n}, degraded {degraded}, retries recorded {retries}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--deadline", type=float, default=0.5)
+    args = parser.parse_args()
+
+    asyncio.run(bench_calls(args))
+    asyncio.run(bench_agent(args))
@@ -0,0 +1,54 @@
+# benchmarks/bench_step_table.py
+# Behavior metrics over N steps: the list-of-dicts path (steps_to_df +
+# compute_behavior_metrics) against the Parquet step table + vectorized metrics.
+#
+#   python -m benchmarks.bench_step_table --steps 1000000
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from analysis.behavior_analysis import steps_to_df, compute_behavior_metrics
+from analysis.step_table import (
+    steps_table, _write_part, load_step_table, compute_step_metrics, time_bucketed_trends,
+)
+from benchmarks.synthetic import make_traces
+
+
+def timed(fn):
+    start = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    n_traces = args.steps // 3
+    # small payloads: only step structure matters here
+    traces = list(make_traces(n_traces, result_chars=100, answer_chars=100))
+    now = time.time()
+
+    old, old_s = timed(lambda: compute_behavior_metrics(steps_to_df(traces)))
+    print(f"steps_to_df + compute_behavior_metrics: {old_s:.3f}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        table_dir = Path(tmp)
+        table, build_s = timed(lambda: steps_table(
+            (f"t{i}", t, now - i * 60) for i, t in enumerate(traces)
+        ))
+        _, write_s = timed(lambda: _write_part(table, table_dir))
+        print(f"one-off step table build: {build_s:.3f}s, parquet write: {write_s:.3f}s")
+
+        loaded, load_s = timed(lambda: load_step_table(table_dir))
+        new, metrics_s = timed(lambda: compute_step_metrics(loaded))
+        _, trends_s = timed(lambda: time_bucketed_trends(loaded, "1D"))
+        print(f"load_step_table: {load_s:.3f}s, compute_step_metrics: {metrics_s:.3f}s, "
+              f"daily trends: {trends_s:.3f}s")
+        print(f"speedup (load + metrics vs old path): {old_s / (load_s + metrics_s):.1f}x")
+
+    assert new["total_steps"] == old["total_steps"] and new["tool_counts"] == old["tool_counts"]
+    print(f"{new['total_steps']} steps, tool usage rate {new['tool_usage_rate']:.3f}")
@@ -0,0 +1,65 @@
+# benchmarks/bench_trace_codec.py
+# Size and encode/decode time of the binary trace codec against the JSON format.
+#
+#   python -m benchmarks.bench_trace_codec [--repeats 50]
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import orjson
+
+from analysis.trace_codec import encode_trace, decode_trace, decode_meta
+from analysis.traces_loader import TRACES_DIR, load_trace
+from backend import async_graph
+from benchmarks.fakes import FakeLLM, FakeSearch
+
+
+def _time(fn: Callable[[], object], repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e3
+
+
+def synthetic_trace(result_chars: int) -> Dict:
+    llm, search = FakeLLM(latency=0), FakeSearch(latency=0, result_chars=result_chars)
+    return asyncio.run(async_graph.run_agent("Tell me about NVDA", llm, search)).model_dump()
+
+
+def bench(name: str, trace: Dict, repeats: int) -> List[Dict]:
+    codecs = {
+        "json indent=2": (lambda t: json.dumps(t, indent=2).encode(), lambda b: json.loads(b)),
+        "orjson indent=2": (lambda t: orjson.dumps(t, option=orjson.OPT_INDENT_2), orjson.loads),
+        "gmtrace": (encode_trace, decode_trace),
+    }
+    rows = []
+    for codec, (enc, dec) in codecs.items():
+        blob = enc(trace)
+        assert dec(blob) == trace
+        rows.append({
+            "trace": name,
+            "codec": codec,
+            "bytes": len(blob),
+            "encode_ms": round(_time(lambda: enc(trace), repeats), 3),
+            "decode_ms": round(_time(lambda: dec(blob), repeats), 3),
+        })
+    blob = encode_trace(trace)
+    rows.append({"trace": name, "codec": "gmtrace meta only", "bytes": len(blob),
+                 "decode_ms": round(_time(lambda: decode_meta(blob), repeats), 4)})
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    inputs = {p.name[:40]: load_trace(p) for p in sorted(Path(TRACES_DIR).glob("*.json"))}
+    inputs["synthetic 200KB search"] = synthetic_trace(200_000)
+    for name, trace in inputs.items():
+        for row in bench(name, trace, args.repeats):
+            print(row)
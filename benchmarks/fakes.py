@@ -0,0 +1,190 @@
+# benchmarks/fakes.py
+# Local stand-ins for Gemini and Valyu: they sleep for a configurable latency
+# and return payloads of realistic size, so benchmarks run offline. Calls are
+# recorded in the step timing like the real backends (tokens ~ chars / 4).
+#
+# Fault injection: `error_rate` makes a call raise FakeBackendError and
+# `slow_rate` makes it take `slow_latency` instead of `latency`, to exercise
+# backend/resilience.py (retries, deadlines, hedging).
+
+import asyncio
+import random
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+
+from backend.step_meta import timed_call
+
+PLAN_TEXT = (
+    "**Decision:** SEARCH\n\n**Reasoning:**\n\n"
+    "*   **Asset:** The query names a specific company or ticker.\n"
+    "*   **Time Horizon:** Recent results and the long-term outlook both matter.\n"
+    "*   **Key Risk Factors/Metrics:** revenue growth, margins, valuation, guidance.\n\n"
+)
+class FakeBackendError(ConnectionError):
+    """Injected transient failure."""
+
+
+FILLER = "Revenue grew year over year while margins held steady despite higher costs. "
+
+
+def fake_plan(prompt: str) -> str:
+    return PLAN_TEXT * 2
+
+
+def fake_answer(prompt: str, answer_chars: int) -> str:
+    return ("## Summary\n" + FILLER * (answer_chars // len(FILLER) + 1))[:answer_chars]
+
+
+def fake_search_result(query: str, result_chars: int) -> str:
+    content = (FILLER * (result_chars // len(FILLER) + 1))[:result_chars]
+    return f"[FINANCE SEARCH RESULTS for: {query}] ---> {content}"
+
+
+def _chunks(text: str, n: int) -> List[str]:
+    size = max(1, -(-len(text) // n))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class _FakeBackend:
+    def __init__(self, latency: float, jitter: float, error_rate: float = 0.0,
+                 slow_rate: float = 0.0, slow_latency: float = 1.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.calls = 0
+        self.errors = 0
+
+    def _delay(self) -> float:
+        if self.slow_rate and random.random() < self.slow_rate:
+            return self.slow_latency
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def _maybe_fail(self) -> None:
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            raise FakeBackendError(f"{type(self).__name__}: injected failure")
+
+
+class FakeLLM(_FakeBackend):
+    """Answers plan prompts with a SEARCH plan and everything else with a long answer."""
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, answer_chars: int = 3000,
+                 stream_chunks: int = 20, **faults: float):
+        super().__init__(latency, jitter, **faults)
+        self.answer_chars = answer_chars
+        self.stream_chunks = stream_chunks
+
+    def _reply(self, prompt: str, call: dict) -> str:
+        self.calls += 1
+        if "SEARCH or NOT SEARCH" in prompt:
+            reply = fake_plan(prompt)
+        else:
+            reply = fake_answer(prompt, self.answer_chars)
+        call.update(
+            prompt_tokens=len(prompt) // 4, response_tokens=len(reply) // 4,
+            input_bytes=len(prompt), output_bytes=len(reply),
+        )
+        return reply
+
+    async def __call__(self, prompt: str, on_token: Optional[Callable[[str], None]] = None) -> str:
+        with timed_call("llm") as call:
+            delay = self._delay()
+            if on_token is None:
+                await asyncio.sleep(delay)
+                self._maybe_fail()
+                return self._reply(prompt, call)
+            # streamed: the first chunk after a quarter of the latency, the rest spread out
+            await asyncio.sleep(delay / 4)
+            self._maybe_fail()
+            reply = self._reply(prompt, call)
+            chunks = _chunks(reply, self.stream_chunks)
+            for i, chunk in enumerate(chunks):
+                if i:
+                    await asyncio.sleep(delay * 3 / 4 / (len(chunks) - 1))
+                on_token(chunk)
+            return reply
+
+    def sync(self, prompt: str, on_token: Optional[Callable[[str], None]] = None) -> str:
+        with timed_call("llm") as call:
+            delay = self._delay()
+            if on_token is None:
+                time.sleep(delay)
+                self._maybe_fail()
+                return self._reply(prompt, call)
+            time.sleep(delay / 4)
+            self._maybe_fail()
+            reply = self._reply(prompt, call)
+            chunks = _chunks(reply, self.stream_chunks)
+            for i, chunk in enumerate(chunks):
+                if i:
+                    time.sleep(delay * 3 / 4 / (len(chunks) - 1))
+                on_token(chunk)
+            return reply
+
+
+class FakeSearch(_FakeBackend):
+    """
+    Valyu stand-in returning one result of `result_chars` characters, or with
+    `results` / `results_sync` a list of structured results. Result lists for
+    sub-queries of the same question overlap (shared URLs, mirrored content),
+    like real searches do.
+    """
+
+    def __init__(self, latency: float = 0.1, jitter: float = 0.0, result_chars: int = 20000, **faults: float):
+        super().__init__(latency, jitter, **faults)
+        self.result_chars = result_chars
+
+    def _result(self, query: str, call: dict) -> str:
+        self.calls += 1
+        result = fake_search_result(query, self.result_chars)
+        call.update(input_bytes=len(query), output_bytes=len(result))
+        return result
+
+    async def __call__(self, query: str) -> str:
+        with timed_call("tool") as call:
+            await asyncio.sleep(self._delay())
+            self._maybe_fail()
+            return self._result(query, call)
+
+    def sync(self, query: str) -> str:
+        with timed_call("tool") as call:
+            time.sleep(self._delay())
+            self._maybe_fail()
+            return self._result(query, call)
+
+    def _results(self, query: str, max_results: int, call: dict) -> List[Dict[str, Any]]:
+        self.calls += 1
+        topic = query.split(" -- ")[0]
+        rng = random.Random(query)
+        per = max(1, self.result_chars // max_results)
+        results = []
+        for i in range(max_results):
+            if i % 3 == 0:  # found by every sub-query of the topic
+                url, body = f"https://example.com/{zlib.crc32(topic.encode())}/shared-{i}", f"{topic} shared {i}"
+            elif i % 3 == 1:  # same text on another site
+                url, body = f"https://mirror{rng.randint(0, 10**6)}.example.org/{i}", f"{topic} mirrored {i}"
+            else:
+                url, body = f"https://example.net/{rng.randint(0, 10**9)}", f"{query} unique {i}"
+            results.append({
+                "title": f"Result {i} for {topic}",
+                "url": url,
+                "content": (body + ". " + FILLER * (per // len(FILLER) + 1))[:per],
+                "relevance_score": round(1.0 - i / max_results, 3),
+            })
+        call.update(input_bytes=len(query), output_bytes=sum(len(r["content"]) for r in results))
+        return results
+
+    async def results(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
+        with timed_call("tool") as call:
+            await asyncio.sleep(self._delay())
+            self._maybe_fail()
+            return self._results(query, max_results, call)
+
+    def results_sync(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
+        with timed_call("tool") as call:
+            time.sleep(self._delay())
+            self._maybe_fail()
+            return self._results(query, max_results, call)
@@ -0,0 +1,297 @@
+# benchmarks/suite.py
+# End-to-end benchmark suite: agent orchestration, trace I/O, memory diffs and
+# behavior analytics, all against local stand-ins (no API keys, no network).
+# Results are written as JSON so runs on different commits can be compared.
+#
+#   python -m benchmarks.suite                                  # default sizes
+#   python -m benchmarks.suite --preset full --out results/main.json
+#   python -m benchmarks.suite --compare results/main.json      # flag regressions
+#   python -m benchmarks.suite --only trace_io memory
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+
+from benchmarks.synthetic import make_long_trace, make_trace, make_traces
+
+RESULTS_DIR = Path("benchmarks/results")
+
+PRESETS: Dict[str, Dict[str, Any]] = {
+    "quick": {"trace_counts": [1000], "steps": 300_000, "memory_keys": [1000], "agent_runs": 200},
+    "default": {"trace_counts": [1000, 10_000], "steps": 1_000_000, "memory_keys": [1000, 10_000], "agent_runs": 1000},
+    "full": {"trace_counts": [1000, 10_000, 100_000], "steps": 3_000_000, "memory_keys": [1000, 10_000, 50_000], "agent_runs": 5000},
+}
+
+
+def measure(fn: Callable[[], Any], repeats: int = 1) -> float:
+    """Best wall time of `repeats` calls, in seconds."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def result(name: str, seconds: float, per: int = 1, unit: str = "item", **extra: Any) -> Dict[str, Any]:
+    """One measurement; `per_item_us` is what regression checks compare."""
+    return {
+        "name": name,
+        "seconds": round(seconds, 6),
+        "count": per,
+        "unit": unit,
+        "per_item_us": round(seconds / per * 1e6, 3),
+        **extra,
+    }
+
+
+# ---------- benchmarks ----------
+
+def bench_agent(cfg: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """run_agent orchestration overhead per step, with zero-latency backends."""
+    from backend import async_graph
+    from backend.cassette import cassette_from_trace, use_cassette
+    from backend.config import TracingConfig
+    from backend.graph import run_agent
+    from benchmarks.fakes import FakeLLM, FakeSearch
+    from observability.tracing import Tracer, set_tracer
+
+    runs = cfg["agent_runs"]
+    out = []
+    for tracing in (False, True):
+        # an exporter-less tracer: measures span recording, not file writes
+        previous = set_tracer(Tracer(TracingConfig(enabled=tracing), exporters=[]))
+        label = "tracing_on" if tracing else "tracing_off"
+
+        # sync pipeline replaying a realistic trace (20 KB search, 3 KB answer)
+        trace = make_trace(0)
+        cassette = cassette_from_trace(trace)
+        steps = 0
+
+        def sync_runs():
+            nonlocal steps
+            with use_cassette(cassette):
+                for _ in range(runs):
+                    cassette.rewind()
+                    steps += len(run_agent(trace["user_query"]).steps)
+
+        seconds = measure(sync_runs)
+        out.append(result(f"agent.sync_replay.{label}", seconds, steps, "step"))
+
+        llm, search = FakeLLM(latency=0), FakeSearch(latency=0)
+
+        async def async_runs():
+            n = 0
+            for i in range(runs):
+                n += len((await async_graph.run_agent(f"Tell me about T{i}", llm, search)).steps)
+            return n
+
+        start = time.perf_counter()
+        steps = asyncio.run(async_runs())
+        out.append(result(f"agent.async_fakes.{label}", time.perf_counter() - start, steps, "step"))
+        set_tracer(previous)
+    return out
+
+
+def bench_trace_io(cfg: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """save_trace / load_traces throughput per format and scale."""
+    from analysis.traces_loader import load_traces, save_trace
+    from backend.models import AgentState
+
+    out = []
+    for n in cfg["trace_counts"]:
+        states = [AgentState(**t) for t in make_traces(n)]
+        for fmt in ("json", "binary"):
+            with tempfile.TemporaryDirectory() as tmp:
+                tmp_dir = Path(tmp)
+                seconds = measure(lambda: [
+                    save_trace(s, f"t{i}", tmp_dir, fmt=fmt) for i, s in enumerate(states)
+                ])
+                size = sum(p.stat().st_size for p in tmp_dir.iterdir())
+                out.append(result(f"trace_io.save.{fmt}.{n}", seconds, n, "trace", bytes=size))
+                loaded: List[dict] = []
+                seconds = measure(lambda: loaded.extend(load_traces(tmp_dir)))
+                assert len(loaded) == n
+                out.append(result(f"trace_io.load.{fmt}.{n}", seconds, n, "trace"))
+
+    # the full save path with the derived indexes (trace index, aggregates,
+    # search rows, step table), in a scratch working directory so data/ is left
+    # alone: the saves themselves, and until the background indexer has caught up
+    from analysis.traces_loader import flush_index_updates
+
+    n = cfg["trace_counts"][0]
+    states = [AgentState(**t) for t in make_traces(n)]
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            start = time.perf_counter()
+            for i, s in enumerate(states):
+                save_trace(s, f"t{i}")
+            saved = time.perf_counter() - start
+            flush_index_updates()
+            indexed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+    out.append(result(f"trace_io.save_indexed.json.{n}", saved, n, "trace"))
+    out.append(result(f"trace_io.save_indexed.flushed.json.{n}", indexed, n, "trace"))
+    return out
+
+
+def bench_memory(cfg: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """dict_diff and compute_memory_timeline(s) over large memories."""
+    from analysis.memory_analysis import compute_memory_timeline, compute_memory_timelines, dict_diff, step_memories
+
+    out = []
+    for n_keys in cfg["memory_keys"]:
+        # JSON round trip: values are distinct objects, as in traces loaded from disk
+        snap = orjson.loads(orjson.dumps(make_long_trace(20, n_keys, snapshots=True)))
+        pairs = [(s["memory_before"], s["memory_after"]) for s in snap["steps"]]
+        seconds = measure(lambda: [dict_diff(b, a) for b, a in pairs], repeats=5)
+        out.append(result(f"memory.dict_diff.{n_keys}_keys", seconds, len(pairs), "diff"))
+
+        seconds = measure(lambda: compute_memory_timeline(snap), repeats=5)
+        out.append(result(f"memory.timeline.snapshots.{n_keys}_keys", seconds, len(snap["steps"]), "step"))
+
+        patched = orjson.loads(orjson.dumps(make_long_trace(20, n_keys)))
+        seconds = measure(lambda: compute_memory_timeline(patched), repeats=5)
+        out.append(result(f"memory.timeline.patches.{n_keys}_keys", seconds, len(patched["steps"]), "step"))
+
+        seconds = measure(lambda: step_memories(patched), repeats=5)
+        out.append(result(f"memory.step_memories.patches.{n_keys}_keys", seconds, len(patched["steps"]), "step"))
+
+        # many traces at once, one process per core
+        many = [orjson.loads(orjson.dumps(make_long_trace(20, n_keys, seed=s))) for s in range(8)]
+        seconds = measure(lambda: compute_memory_timelines(many), repeats=3)
+        out.append(result(f"memory.timelines.pool.{n_keys}_keys", seconds, len(many), "trace"))
+    return out
+
+
+def bench_behavior(cfg: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """steps_to_df + compute_behavior_metrics, and the Parquet step table path."""
+    from analysis.behavior_analysis import compute_behavior_metrics, steps_to_df
+    from analysis.step_table import _write_part, compute_step_metrics, load_step_table, steps_table
+
+    n_traces = cfg["steps"] // 3
+    traces = list(make_traces(n_traces, result_chars=100, answer_chars=100))
+    n_steps = sum(len(t["steps"]) for t in traces)
+
+    df = None
+
+    def to_df():
+        nonlocal df
+        df = steps_to_df(traces)
+
+    out = [result(f"behavior.steps_to_df.{n_steps}", measure(to_df), n_steps, "step")]
+    out.append(result(f"behavior.compute_behavior_metrics.{n_steps}",
+                      measure(lambda: compute_behavior_metrics(df), repeats=3), n_steps, "step"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        now = time.time()
+        table = steps_table((f"t{i}", t, now) for i, t in enumerate(traces))
+        _write_part(table, Path(tmp))
+        loaded = None
+
+        def load():
+            nonlocal loaded
+            loaded = load_step_table(Path(tmp))
+
+        out.append(result(f"behavior.load_step_table.{n_steps}", measure(load, repeats=3), n_steps, "step"))
+        out.append(result(f"behavior.compute_step_metrics.{n_steps}",
+                          measure(lambda: compute_step_metrics(loaded), repeats=3), n_steps, "step"))
+    return out
+
+
+BENCHMARKS: Dict[str, Callable[[Dict[str, Any]], List[Dict[str, Any]]]] = {
+    "agent": bench_agent,
+    "trace_io": bench_trace_io,
+    "memory": bench_memory,
+    "behavior": bench_behavior,
+}
+
+
+# ---------- results ----------
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(preset: str = "default", only: Optional[List[str]] = None) -> Dict[str, Any]:
+    cfg = PRESETS[preset]
+    results = []
+    for name, bench in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        print(f"[{name}]", file=sys.stderr)
+        for row in bench(cfg):
+            print(f"  {row['name']:<48} {row['seconds']:>10.4f}s  {row['per_item_us']:>12.3f} us/{row['unit']}",
+                  file=sys.stderr)
+            results.append(row)
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "preset": preset,
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.10) -> List[Dict[str, Any]]:
+    """
+    Per benchmark present in both runs: per-item time ratio current / baseline.
+    status is "regression" past 1 + threshold, "improvement" below 1 - threshold.
+    """
+    base = {r["name"]: r for r in baseline["results"]}
+    rows = []
+    for r in current["results"]:
+        old = base.get(r["name"])
+        if old is None or not old["per_item_us"]:
+            continue
+        ratio = r["per_item_us"] / old["per_item_us"]
+        status = "regression" if ratio > 1 + threshold else "improvement" if ratio < 1 - threshold else "same"
+        rows.append({"name": r["name"], "baseline_us": old["per_item_us"], "current_us": r["per_item_us"],
+                     "ratio": round(ratio, 3), "status": status})
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GlassMind benchmark suite.")
+    parser.add_argument("--preset", choices=list(PRESETS), default="default")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS))
+    parser.add_argument("--out", type=Path, default=None, help="results JSON (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", type=Path, default=None, help="baseline results JSON")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown counted as a regression")
+    args = parser.parse_args()
+
+    report = run_suite(args.preset, args.only)
+    out = args.out or RESULTS_DIR / f"{report['meta']['commit'] or 'latest'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(f"results written to {out}", file=sys.stderr)
+
+    if args.compare:
+        rows = compare(report, json.loads(args.compare.read_text()), args.threshold)
+        for row in rows:
+            print(f"{row['status']:<12} {row['name']:<48} {row['baseline_us']:>12.3f} -> {row['current_us']:>12.3f} us"
+                  f"  (x{row['ratio']})")
+        regressions = [r for r in rows if r["status"] == "regression"]
+        print(f"{len(regressions)} regressions against {args.compare}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
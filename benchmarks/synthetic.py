@@ -0,0 +1,156 @@
+# benchmarks/synthetic.py
+# Synthetic traces shaped like real agent runs (plan -> research -> answer),
+# for benchmarks that need thousands or millions of steps without running the agent.
+
+import random
+from typing import Any, Dict, Iterator, Optional
+
+from benchmarks.fakes import fake_answer, fake_plan, fake_search_result
+
+TICKERS = ["NVDA", "AAPL", "MSFT", "TSLA", "AMZN", "GOOGL", "META", "AMD", "NFLX", "JPM"]
+
+
+def make_trace(
+    i: int,
+    rng: Optional[random.Random] = None,
+    result_chars: int = 20_000,
+    answer_chars: int = 3_000,
+    search_rate: float = 0.8,
+) -> Dict[str, Any]:
+    """One trace dict in the current StepLog shape (memory patches, not snapshots)."""
+    rng = rng or random.Random(i)
+    query = f"Tell me about {rng.choice(TICKERS)} earnings outlook #{i}"
+    plan = fake_plan(query)
+    searched = rng.random() < search_rate
+    research = fake_search_result(query, result_chars) if searched else None
+    answer = fake_answer(query, answer_chars)
+
+    def timing(kind: Optional[str], seconds: float, in_bytes: int, out_bytes: int) -> Dict[str, Any]:
+        t: Dict[str, Any] = {"wall_seconds": seconds * rng.uniform(1.0, 1.05)}
+        if kind is not None:
+            t.update({f"{kind}_seconds": seconds, "input_bytes": in_bytes, "output_bytes": out_bytes})
+        if kind == "llm":
+            t.update(prompt_tokens=in_bytes // 4, response_tokens=out_bytes // 4)
+        return t
+
+    steps = [{
+        "step_id": 1, "node": "plan", "thought": plan, "tool": "planning tool",
+        "tool_input": None, "tool_output": None, "memory_before": None, "memory_after": None,
+        "memory_patch": {"changed": {"plan": plan}, "removed": []},
+        "cache_hit": rng.random() < 0.3, "speculation": None,
+        "timing": timing("llm", rng.lognormvariate(0.0, 0.4), len(query) + 400, len(plan)),
+    }]
+    if searched:
+        steps.append({
+            "step_id": 2, "node": "research", "thought": "Using web_search_tool based on plan.",
+            "tool": "web_search_tool", "tool_input": query, "tool_output": research,
+            "memory_before": None, "memory_after": None,
+            "memory_patch": {"changed": {"research_raw": research}, "removed": []},
+            "cache_hit": rng.random() < 0.3, "speculation": None,
+            "timing": timing("tool", rng.lognormvariate(0.7, 0.5), len(query) + 100, len(research)),
+        })
+    else:
+        steps.append({
+            "step_id": 2, "node": "research", "thought": "Skipping web search, plan said no.",
+            "tool": None, "tool_input": None, "tool_output": None,
+            "memory_before": None, "memory_after": None,
+            "memory_patch": {"changed": {}, "removed": []}, "cache_hit": None, "speculation": None,
+            "timing": timing(None, rng.uniform(0.0001, 0.001), 0, 0),
+        })
+    steps.append({
+        "step_id": 3, "node": "answer", "thought": "Generating final answer from context.",
+        "tool": "answer_tool", "tool_input": None, "tool_output": None,
+        "memory_before": None, "memory_after": None,
+        "memory_patch": {"changed": {}, "removed": []},
+        "cache_hit": rng.random() < 0.3, "speculation": None,
+        "timing": timing("llm", rng.lognormvariate(1.0, 0.5), len(research or "") + 600, len(answer)),
+    })
+
+    memory = {"plan": plan}
+    if searched:
+        memory["research_raw"] = research
+    return {
+        "user_query": query,
+        "memory": memory,
+        "memory_base": {},
+        "steps": steps,
+        "final_answer": answer,
+    }
+
+
+def make_traces(n: int, seed: int = 0, **kwargs: Any) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    for i in range(n):
+        yield make_trace(i, rng, **kwargs)
+
+
+def make_large_memory(n_keys: int, value_chars: int = 200, rng: Optional[random.Random] = None) -> Dict[str, Any]:
+    """Agent memory with `n_keys` entries: long strings, small nested dicts and lists."""
+    rng = rng or random.Random(0)
+    memory: Dict[str, Any] = {}
+    for k in range(n_keys):
+        kind = k % 3
+        if kind == 0:
+            memory[f"note_{k}"] = fake_search_result(f"key {k}", value_chars)
+        elif kind == 1:
+            memory[f"metrics_{k}"] = {"ticker": rng.choice(TICKERS), "pe": rng.uniform(5, 80),
+                                      "growth": [rng.uniform(-0.2, 0.5) for _ in range(8)]}
+        else:
+            memory[f"sources_{k}"] = [f"https://example.com/{k}/{j}" for j in range(5)]
+    return memory
+
+
+def mutate_memory(memory: Dict[str, Any], fraction: float, rng: random.Random) -> Dict[str, Any]:
+    """Copy of `memory` with about `fraction` of the keys changed, a few removed and added."""
+    out = dict(memory)
+    keys = list(memory)
+    for key in rng.sample(keys, max(1, int(len(keys) * fraction))):
+        if rng.random() < 0.1:
+            del out[key]
+        elif isinstance(out[key], str):
+            out[key] = out[key] + " (updated)"
+        else:
+            out[key] = {"replaced": rng.random()}
+    out[f"new_{rng.getrandbits(32)}"] = "fresh entry"
+    return out
+
+
+def make_long_trace(
+    n_steps: int,
+    n_keys: int,
+    value_chars: int = 200,
+    change_fraction: float = 0.01,
+    snapshots: bool = False,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    A trace of `n_steps` steps over a large memory. snapshots=True writes the
+    old full memory_before/memory_after format instead of memory patches.
+    """
+    from backend.memory_delta import make_patch
+
+    rng = random.Random(seed)
+    base = make_large_memory(n_keys, value_chars, rng)
+    memory = base
+    steps = []
+    for i in range(n_steps):
+        after = mutate_memory(memory, change_fraction, rng)
+        step = {
+            "step_id": i + 1, "node": ("plan", "research", "answer")[i % 3],
+            "thought": f"step {i}", "tool": None, "tool_input": None, "tool_output": None,
+            "memory_before": None, "memory_after": None, "memory_patch": None,
+            "cache_hit": None, "speculation": None, "timing": None,
+        }
+        if snapshots:
+            step["memory_before"], step["memory_after"] = memory, after
+        else:
+            step["memory_patch"] = make_patch(memory, after)
+        steps.append(step)
+        memory = after
+    return {
+        "user_query": "long synthetic run",
+        "memory": memory,
+        "memory_base": base,
+        "steps": steps,
+        "final_answer": "done",
+    }
@@ -9,7 +9,7 @@ if PROJECT_ROOT not in sys.path:
 
 import streamlit as st
 import pandas as pd
-from analysis.traces_loader import load_traces
+from analysis.trace_index import ensure_index, list_traces
 
 st.set_page_config(page_title="GlassMind Navigator", layout="wide")
 
@@ -17,21 +17,23 @@ st.title("GlassMind Navigator – Investment Research Agent (Glass Box)")
 st.caption("Fully observable investment research assistant – every decision, tool call, and memory update is visible.")
 
 
-traces = load_traces()
-if not traces:
+# list traces from the metadata index; only the selected trace is loaded
+ensure_index()
+handles = list_traces()
+if not handles:
     st.warning("No traces found in data/traces yet.")
     st.stop()
 
-trace_names = [f"Trace {i+1}" for i in range(len(traces))]
-choice = st.selectbox("Select a trace", options=list(range(len(traces))), format_func=lambda i: trace_names[i])
+trace_names = [f"Trace {i+1}" for i in range(len(handles))]
+choice = st.selectbox("Select a trace", options=list(range(len(handles))), format_func=lambda i: trace_names[i])
 
-trace = traces[choice]
+trace = handles[choice].load()
 steps = trace["steps"]
 
 # Show basic info
 st.subheader("Overview")
 st.write(f"User query: `{trace['user_query']}`")
-st.write(f"Final answer (first 200 chars): {trace.get('final_answer', '')[:200]}…")
+st.write(f"Final answer (first 200 chars): {(trace.get('final_answer') or '')[:200]}…")
 
 # Steps table
 st.subheader("Step Timeline")
@@ -46,9 +48,10 @@ df = pd.DataFrame([
 ])
 st.dataframe(df, width="stretch")
 
-from analysis.memory_analysis import compute_memory_timeline
+from analysis.memory_analysis import compute_memory_timeline, step_memories
 
 timeline = compute_memory_timeline(trace)
+memories = step_memories(trace)
 
 
 # Memory timeline – show diff-ish view
@@ -56,14 +59,15 @@ st.subheader("Memory Timeline")
 
 selected_step_idx = st.slider("Select step", min_value=1, max_value=len(steps), value=1)
 selected_step = steps[selected_step_idx - 1]
+memory_before, memory_after = memories[selected_step_idx - 1]
 
 col1, col2 = st.columns(2)
 with col1:
     st.markdown("**Memory Before**")
-    st.json(selected_step["memory_before"])
+    st.json(memory_before)
 with col2:
     st.markdown("**Memory After**")
-    st.json(selected_step["memory_after"])
+    st.json(memory_after)
 
 st.markdown("**Thought at this step**")
 st.write(selected_step["thought"])
@@ -76,18 +80,18 @@ if selected_step["tool"]:
     st.json(selected_step.get("tool_output"))
 
 
-from analysis.behavior_analysis import steps_to_df, compute_behavior_metrics
+from analysis.aggregates import ensure_aggregates, read_aggregates
 
-all_traces = load_traces()
-df_all = steps_to_df(all_traces)
-metrics = compute_behavior_metrics(df_all)
+# O(1) totals maintained by save_trace
+ensure_aggregates()
+metrics = read_aggregates()
 
 st.subheader("Behavior Patterns (across all traces)")
 st.write(metrics)
 
-st.bar_chart(df_all["node"].value_counts())
-if df_all["tool"].notna().any():
-    st.bar_chart(df_all["tool"].value_counts(dropna=True))
+st.bar_chart(pd.Series(metrics["node_counts"], name="count"))
+if metrics["tool_counts"]:
+    st.bar_chart(pd.Series(metrics["tool_counts"], name="count"))
 
 
 st.markdown(
@@ -3,7 +3,6 @@
 import os
 import sys
 import streamlit as st
-from datetime import datetime
 
 # --- Ensure project root is importable ---
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -11,8 +10,8 @@ PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
-from backend.graph import run_agent
-from analysis.traces_loader import save_trace
+from backend.config import DEFAULT_CONFIG
+from backend.jobs import QueueFull, get_service
 
 
 st.set_page_config(page_title="Run New Trace", layout="wide")
@@ -26,20 +25,72 @@ user_query = st.text_input(
     placeholder="e.g., 'Is Nvidia stock a good buy?', 'Explain Bitcoin's long-term outlook', etc."
 )
 
+fanout = st.checkbox(
+    "Parallel research (fundamentals, news and risks sub-queries, merged top results)",
+    value=DEFAULT_CONFIG.research_fanout,
+)
+config = DEFAULT_CONFIG.model_copy(update={"research_fanout": fanout})
+
 # --- Run button ---
+# runs go through the local job queue (backend/jobs.py): the page submits a job
+# and polls it, so a slow run never holds the session and workers are bounded.
+# Every job is checkpointed; a failed or cancelled one resumes where it stopped.
+service = get_service()
 if st.button("🚀 Run Agent"):
     if not user_query.strip():
         st.error("Please enter a query before running the agent.")
         st.stop()
+    try:
+        st.session_state["job_id"] = service.submit(user_query, config).job_id
+    except QueueFull:
+        st.error("The agent queue is full right now. Please try again in a minute.")
+        st.stop()
+
+job_id = st.session_state.get("job_id")
+if job_id is None or service.get(job_id) is None:
+    st.stop()
+
+job = service.get(job_id)
+if not job.finished and st.button("✋ Cancel run"):
+    service.cancel(job_id)
+elif job.status in ("failed", "cancelled") and job.trace_name is None and st.button(f"🔁 Resume run for: {job.user_query[:60]}"):
+    service.requeue(job_id)
+
 
-    with st.spinner("Agent thinking... generating trace..."):
-        # Run the agent
-        state = run_agent(user_query)
+@st.fragment(run_every=service.config.poll_seconds)
+def job_progress(job_id: str) -> None:
+    # only this fragment reruns on every poll; the page script has already returned
+    job = service.get(job_id)
+    if job.finished:
+        st.rerun()  # the whole page: draw the finished job with its buttons
+    if job.status == "queued":
+        st.status(f"Queued, position {service.position(job_id) or 1}...")
+    elif job.answer:
+        # the answer streamed so far, written by the worker as it arrives
+        st.status("Agent writing the answer...")
+        st.markdown(job.answer + " ▌")
+    else:
+        st.status("Agent thinking... planning and researching...")
 
-        # Save trace
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        trace_name = f"trace_{timestamp}"
-        save_trace(state, trace_name)
 
-    st.success(f"Trace generated successfully: **{trace_name}.json**")
-    st.info("Go to **GlassMind Navigator** page to view this trace.")
+job = service.get(job_id)
+if not job.finished:
+    job_progress(job_id)
+else:
+    status = st.status("Agent thinking... planning and researching...")
+    answer_box = st.empty()
+    answer_box.markdown(job.answer or "")
+    if job.status == "cancelled":
+        status.update(label="Cancelled", state="error")
+        st.warning("The run was cancelled. Its completed steps are checkpointed.")
+    elif job.status == "failed":
+        status.update(label="Failed", state="error")
+        st.error(f"The run failed: {job.error}. Its completed steps are checkpointed.")
+    else:
+        status.update(label="Done", state="complete")
+        if job.first_token_seconds is not None:
+            st.caption(f"Waited {job.wait_seconds:.2f}s in the queue; first answer token "
+                       f"{job.first_token_seconds:.2f}s into the answer step, complete after {job.run_seconds:.2f}s.")
+    if job.trace_name is not None:
+        st.success(f"Trace generated successfully: **{job.trace_name}**")
+        st.info("Go to **GlassMind Navigator** page to view this trace.")
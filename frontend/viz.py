@@ -1,3 +1,4 @@
+import json
 import os
 import sys
 
@@ -10,8 +11,15 @@ if PROJECT_ROOT not in sys.path:
 import streamlit as st
 import pandas as pd
 
-from analysis.traces_loader import load_traces
-from analysis.behavior_analysis import steps_to_df, compute_behavior_metrics
+from analysis.trace_index import ensure_index, index_version, list_traces
+from analysis.step_table import (
+    ensure_step_table, load_step_table, time_bucketed_trends, latency_percentiles,
+)
+from analysis.aggregates import ensure_aggregates, read_aggregates
+
+from analysis.memory_analysis import step_memories
+from analysis.memory_diff import describe_diff
+from analysis.search_index import FAILURE_QUERY, FIELDS as SEARCH_FIELDS, ensure_search_index, search
 
 # Optional: memory timeline helper (if implemented)
 try:
@@ -28,26 +36,38 @@ st.set_page_config(
 )
 
 # ----------------- LOAD TRACES -----------------
-traces = load_traces()
-if not traces:
+# the sidebar is built from the metadata index; only the selected trace is loaded
+ensure_index()
+handles = list_traces()
+if not handles:
     st.error("❗ No traces found in `data/traces` yet. Run your agent to generate at least one trace.")
     st.stop()
 
+
+@st.cache_resource
+def load_steps(version):
+    # `version` changes whenever save_trace adds a trace, invalidating the cache
+    ensure_step_table()
+    return load_step_table()
+
+
 # ----------------- SIDEBAR -----------------
 st.sidebar.title("📁 Trace Explorer")
 
 trace_names = [
-    f"Trace {i+1} – {t.get('user_query', '')[:40]}..."
-    for i, t in enumerate(traces)
+    f"Trace {i+1} – {h.query[:40]}..."
+    for i, h in enumerate(handles)
 ]
 choice = st.sidebar.selectbox(
     "Select a trace",
-    options=list(range(len(traces))),
+    options=list(range(len(handles))),
     format_func=lambda i: trace_names[i],
 )
 
-trace = traces[choice]
+trace = handles[choice].load()
 steps = trace["steps"]
+# full before/after snapshots, rebuilt from memory patches for new traces
+memories = {s["step_id"]: m for s, m in zip(steps, step_memories(trace))}
 
 st.sidebar.markdown("### 🧵 Steps")
 st.sidebar.write(f"Total steps: **{len(steps)}**")
@@ -83,7 +103,7 @@ with tab_overview:
 
     with col_b:
         st.markdown("**Final answer (truncated)**")
-        st.write(trace.get("final_answer", "")[:600] + "…")
+        st.write((trace.get("final_answer") or "")[:600] + "…")
 
     st.markdown("---")
     st.subheader("Step Timeline")
@@ -94,6 +114,10 @@ with tab_overview:
                 "Step": s["step_id"],
                 "Node": s["node"],
                 "Tool": s["tool"],
+                "Seconds": (s.get("timing") or {}).get("wall_seconds"),
+                "First token (s)": (s.get("timing") or {}).get("first_token_seconds"),
+                "Started at (s)": (s.get("timing") or {}).get("offset_seconds"),
+                "Parallel with": ", ".join((s.get("timing") or {}).get("parallel_with") or []),
                 "Thought": s["thought"],
             }
             for s in steps
@@ -119,13 +143,14 @@ with tab_step:
     st.markdown("### 🧠 Thought at this step")
     st.write(selected_step["thought"])
 
+    memory_before, memory_after = memories[selected_step_id]
     col1, col2 = st.columns(2)
     with col1:
         st.markdown("### 🗂 Memory Before")
-        st.json(selected_step.get("memory_before", {}))
+        st.json(memory_before)
     with col2:
         st.markdown("### 📌 Memory After")
-        st.json(selected_step.get("memory_after", {}))
+        st.json(memory_after)
 
     if selected_step["tool"]:
         st.markdown("### 🛠 Tool Call Details")
@@ -137,16 +162,44 @@ with tab_step:
             st.markdown("**Output**")
             st.json(selected_step.get("tool_output"))
 
+    packing = selected_step.get("packing")
+    if packing:
+        st.markdown("### ✂️ Context Packing")
+        pcol1, pcol2, pcol3 = st.columns(3)
+        pcol1.metric("Research tokens", packing["original_tokens"])
+        pcol2.metric("Sent to the LLM", packing["packed_tokens"], f"-{packing['saved_tokens']}", delta_color="inverse")
+        pcol3.metric("Budget", packing["budget_tokens"])
+        st.dataframe(
+            pd.DataFrame(packing["passages"]).rename(columns={
+                "index": "Passage", "tokens": "Tokens", "score": "BM25", "kept": "Kept", "preview": "Starts with",
+            }),
+            width="stretch",
+            height=250,
+        )
+
     # Optional memory timeline diff (if you implemented it)
     if HAS_MEMORY_TIMELINE:
         try:
-            st.markdown("### 🧬 Memory Change Summary (Timeline View)")
+            st.markdown("### 🧬 Memory Changes")
             timeline = compute_memory_timeline(trace)
-            # If your compute_memory_timeline returns a list indexed by step-1:
-            if isinstance(timeline, list) and len(timeline) >= selected_step_id:
-                st.json(timeline[selected_step_id - 1])
-            else:
+            entry = next((t for t in timeline if t["step_id"] == selected_step_id), None)
+            if entry is None:
                 st.write("Memory timeline format not recognized.")
+            elif not entry["diff"]:
+                st.write("No memory changes at this step.")
+            else:
+                # compact patch: changed nested values and the lines/words edited in long text
+                st.dataframe(
+                    pd.DataFrame(describe_diff(entry["diff"], memory_before)).rename(columns={
+                        "path": "Path", "change": "Change", "removed": "Removed", "added": "Added",
+                    }),
+                    width="stretch",
+                )
+                patch_size = len(json.dumps(entry["diff"], default=str))
+                memory_size = len(json.dumps(memory_after, default=str))
+                st.caption(f"Patch: {patch_size:,} characters of JSON for a {memory_size:,}-character memory.")
+                with st.expander("Patch (JSON)"):
+                    st.json(entry["diff"])
         except Exception as e:
             st.warning(f"Could not render memory timeline: {e}")
 
@@ -154,12 +207,15 @@ with tab_step:
 with tab_behavior:
     st.subheader("Behavior Patterns (across all traces)")
 
-    all_traces = traces  # already loaded
-    df_all = steps_to_df(all_traces)
-    metrics = compute_behavior_metrics(df_all)
+    # totals come from the aggregates maintained by save_trace, not a full scan
+    ensure_aggregates()
+    windows = {"All time": None, "Last 24h": 24 * 3600, "Last 7 days": 7 * 24 * 3600}
+    window = st.selectbox("Window", options=list(windows), index=0)
+    metrics = read_aggregates(windows[window])
 
     # Top metrics row
-    mcol1, mcol2, mcol3 = st.columns(3)
+    mcol0, mcol1, mcol2, mcol3 = st.columns(4)
+    mcol0.metric("Traces", metrics.get("total_traces", 0))
     mcol1.metric("Total steps", metrics.get("total_steps", 0))
     mcol2.metric("Tool calls", str(metrics.get("tool_calls", 0)))
     mcol3.metric(
@@ -168,13 +224,29 @@ with tab_behavior:
     )
 
     st.markdown("#### 🔧 Tool Usage")
-    if df_all["tool"].notna().any():
-        st.bar_chart(df_all["tool"].value_counts(dropna=True))
+    if metrics["tool_counts"]:
+        st.bar_chart(pd.Series(metrics["tool_counts"], name="count"))
     else:
         st.write("No tool calls recorded yet.")
 
     st.markdown("#### 🔁 Node Frequency")
-    st.bar_chart(df_all["node"].value_counts())
+    st.bar_chart(pd.Series(metrics["node_counts"], name="count"))
+
+    steps_all = load_steps(index_version())
+
+    st.markdown("#### 📈 Trend")
+    bucket = st.selectbox("Bucket", options=["1h", "1D", "1W"], index=1)
+    trends = time_bucketed_trends(steps_all, bucket)
+    st.line_chart(trends[["steps", "tool_calls"]])
+
+    st.markdown("#### ⏱️ Latency Percentiles (seconds)")
+    lcol1, lcol2 = st.columns(2)
+    with lcol1:
+        st.markdown("**Per node** (node wall time)")
+        st.dataframe(latency_percentiles(steps_all, by="node"), width="stretch")
+    with lcol2:
+        st.markdown("**Per tool** (time inside the LLM / tool call)")
+        st.dataframe(latency_percentiles(steps_all, by="tool", column="call_seconds"), width="stretch")
 
     st.markdown("#### Raw Metrics JSON")
     st.json(metrics)
@@ -183,13 +255,14 @@ with tab_behavior:
 with tab_errors:
     st.subheader("Error Replay Mode")
 
-    # Simple heuristic: any step with 'error' in thought or tool_output
-    failed_steps = []
-    for s in steps:
-        thought_text = (s.get("thought") or "").lower()
-        tool_out_text = str(s.get("tool_output") or "").lower()
-        if "error" in thought_text or "error" in tool_out_text:
-            failed_steps.append(s)
+    # failure points come from the full-text index (analysis/search_index.py):
+    # steps whose thought or tool output mentions an error or a failure
+    ensure_search_index()
+    trace_id = handles[choice].trace_id
+    failed_ids = {
+        h.step_id for h in search(FAILURE_QUERY, fields=["thought", "tool_output"], trace_id=trace_id, limit=len(steps))
+    }
+    failed_steps = [s for s in steps if s["step_id"] in failed_ids]
 
     if failed_steps:
         st.write(f"Detected **{len(failed_steps)}** potential failure points.")
@@ -198,15 +271,41 @@ with tab_errors:
                 st.markdown("**Thought**")
                 st.write(fs["thought"])
                 st.markdown("**Memory Before**")
-                st.json(fs.get("memory_before", {}))
+                st.json(memories[fs["step_id"]][0])
                 st.markdown("**Memory After**")
-                st.json(fs.get("memory_after", {}))
+                st.json(memories[fs["step_id"]][1])
                 if fs.get("tool"):
                     st.markdown("**Tool Output**")
                     st.json(fs.get("tool_output"))
     else:
         st.success("✅ No obvious failure points detected in this trace.")
 
+    st.markdown("---")
+    st.markdown("### 🔎 Search all traces")
+    st.caption("Every word must match; `word*` matches prefixes and `OR` allows either word. "
+               "Example: `valyu empty nvda`.")
+    col_q, col_f, col_n = st.columns([3, 2, 1])
+    with col_q:
+        search_text = st.text_input("Search text", value="", placeholder="error* OR fail*")
+    with col_f:
+        search_fields = st.multiselect("Fields", list(SEARCH_FIELDS), default=[])
+    with col_n:
+        node_options = ["any"] + sorted({s["node"] for s in steps} | {"plan", "research", "answer"})
+        search_node = st.selectbox("Node", node_options)
+    if search_text.strip():
+        hits = search(search_text, fields=search_fields, node=None if search_node == "any" else search_node, limit=100)
+        if hits:
+            st.dataframe(
+                pd.DataFrame([
+                    {"Score": h.score, "Query": h.query[:60], "Step": h.step_id, "Node": h.node,
+                     "Tool": h.tool, "Match": h.snippet, "Trace": h.trace_id}
+                    for h in hits
+                ]),
+                width="stretch",
+            )
+        else:
+            st.info("No matching steps.")
+
 # ----------------- DISCLAIMER -----------------
 st.markdown(
     "---\n"
@@ -1,11 +1,11 @@
 # run_once.py
 from uuid import uuid4
-from analysis.traces_loader import save_trace
+from analysis.traces_loader import save_trace, make_trace_name
 from backend.graph import run_agent
-from langsmith.run_helpers import traceable
+from observability.tracing import traced
 
 
-@traceable(name="glassmind-navigator")
+@traced("glassmind-navigator")
 def main(query):
     
     
@@ -24,9 +24,7 @@ def run_agent_with_query(query: str) -> str:
     state = run_agent(query)
 
     # Make a clean trace name
-    ts = uuid4().hex
-    safe_snippet = "".join(c for c in query[:20] if c.isalnum() or c in ("-", "_")).rstrip()
-    trace_name = f"trace_{ts}_{safe_snippet or 'query'}"
+    trace_name = make_trace_name(query)
 
     save_trace(state, trace_name)
     return trace_name
@@ -0,0 +1,148 @@
+# observability/exporters.py
+# Span exporters for observability/tracing.py. They run on the tracer's
+# background thread and receive finished spans in batches.
+#
+#   JsonlFileExporter  one OTLP-style JSON span per line (data/spans/spans.jsonl)
+#   LangSmithExporter  forwards spans as LangSmith runs in one batch request
+
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+from observability.tracing import Span, _truncate
+
+
+class SpanExporter:
+    def export(self, spans: List[Span]) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, str):
+        return {"stringValue": value}
+    return {"stringValue": orjson.dumps(value, default=str).decode()}
+
+
+def _attributes(span: Span) -> Dict[str, Any]:
+    inputs = span.inputs()
+    return {**span.attributes, "inputs": inputs} if inputs else span.attributes
+
+
+def otlp_span(span: Span) -> Dict[str, Any]:
+    """Span in the OTLP/JSON field layout (ids hex encoded, times in unix ns)."""
+    return {
+        "traceId": f"{span.trace_id:032x}",
+        "spanId": f"{span.span_id:016x}",
+        "parentSpanId": f"{span.parent_id:016x}" if span.parent_id is not None else "",
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [
+            {"key": k, "value": _otlp_value(_truncate(v))} for k, v in _attributes(span).items()
+        ],
+        "status": {"code": "STATUS_CODE_ERROR", "message": span.error} if span.error
+        else {"code": "STATUS_CODE_OK"},
+    }
+
+
+class JsonlFileExporter(SpanExporter):
+    """Appends one JSON span per line; a whole batch is written with one call."""
+
+    def __init__(self, path: str = "data/spans/spans.jsonl"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, spans: List[Span]) -> None:
+        data = b"".join(orjson.dumps(otlp_span(s), default=str) + b"\n" for s in spans)
+        with self._lock:
+            if self._file is None:
+                self._file = self.path.open("ab")
+            self._file.write(data)
+            self._file.flush()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _run_id(span_id: int) -> uuid.UUID:
+    return uuid.UUID(int=span_id)
+
+
+def _dotted_order(span: Span) -> str:
+    # LangSmith orders runs by "<start><run id>" segments from the root down
+    parts = []
+    node: Optional[Span] = span
+    while node is not None:
+        start = datetime.fromtimestamp(node.start_ns / 1e9, tz=timezone.utc)
+        parts.append(start.strftime("%Y%m%dT%H%M%S%fZ") + str(_run_id(node.span_id)))
+        node = node.parent
+    return ".".join(reversed(parts))
+
+
+class LangSmithExporter(SpanExporter):
+    """
+    Forwards spans as LangSmith runs with batch_ingest_runs, replacing the
+    per-call network round trips of @traceable. The client is created on the
+    first export, so constructing the exporter needs no network or API key.
+    """
+
+    def __init__(self, client: Any = None, project_name: Optional[str] = None):
+        self._client = client
+        self.project_name = project_name
+
+    def _get_client(self):
+        if self._client is None:
+            from langsmith import Client
+
+            self._client = Client()
+        return self._client
+
+    def _run(self, span: Span) -> Dict[str, Any]:
+        attrs = dict(span.attributes)
+        output = attrs.pop("output", None)
+        root = span
+        while root.parent is not None:
+            root = root.parent
+        run = {
+            "id": _run_id(span.span_id),
+            "trace_id": _run_id(root.span_id),
+            "dotted_order": _dotted_order(span),
+            "parent_run_id": _run_id(span.parent_id) if span.parent_id is not None else None,
+            "name": span.name,
+            "run_type": span.kind,
+            "start_time": datetime.fromtimestamp(span.start_ns / 1e9, tz=timezone.utc),
+            "end_time": datetime.fromtimestamp(span.end_ns / 1e9, tz=timezone.utc),
+            "inputs": _truncate(span.inputs()),
+            "outputs": {"output": _truncate(output)} if output is not None else {},
+            "error": span.error,
+            "extra": {"metadata": _truncate(attrs)},
+        }
+        if self.project_name:
+            run["session_name"] = self.project_name
+        return run
+
+    def export(self, spans: List[Span]) -> None:
+        self._get_client().batch_ingest_runs(create=[self._run(s) for s in spans])
+
+    def shutdown(self) -> None:
+        if self._client is not None and hasattr(self._client, "flush"):
+            self._client.flush()
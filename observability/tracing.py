@@ -0,0 +1,408 @@
+# observability/tracing.py
+# In-process span tracer. Finished spans go into a fixed-size ring buffer and
+# onto one bounded queue per exporter; a background thread flushes each queue
+# in batches (observability/exporters.py), so the request path never waits on
+# disk or network.
+#
+# Sampling is head-based: the root span decides once, every descendant follows
+# that decision, so a trace is either recorded whole or not at all.
+#
+#   from observability.tracing import traced
+#
+#   @traced("plan_node")
+#   def plan_node(...): ...
+
+import asyncio
+import atexit
+import functools
+import inspect
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from backend.config import TracingConfig, DEFAULT_TRACING_CONFIG
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTRIBUTE_CHARS = 4000  # long prompts / search dumps are truncated when a span ends
+
+
+def _truncate(value: Any) -> Any:
+    if isinstance(value, str) and len(value) > MAX_ATTRIBUTE_CHARS:
+        return value[:MAX_ATTRIBUTE_CHARS] + f"... [{len(value)} chars]"
+    if isinstance(value, dict):
+        return {k: _truncate(v) for k, v in value.items()}
+    return value
+
+
+class Span:
+    """One timed operation. Plain slots class: created on every traced call."""
+
+    __slots__ = (
+        "trace_id", "span_id", "parent", "name", "kind",
+        "start_ns", "end_ns", "attributes", "error", "raw_inputs", "input_values",
+    )
+
+    def __init__(self, name: str, kind: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.trace_id = parent.trace_id if parent is not None else random.getrandbits(128)
+        self.span_id = random.getrandbits(64)
+        self.parent = parent
+        self.name = name
+        self.kind = kind  # "chain", "llm" or "tool" (LangSmith run types)
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        # (positional parameter names, args, kwargs) of a traced call, until resolve_inputs()
+        self.raw_inputs: Optional[Tuple[Tuple[str, ...], tuple, dict]] = None
+        self.input_values: Optional[Dict[str, Any]] = None
+
+    def resolve_inputs(self) -> None:
+        """
+        Replace raw_inputs with truncated primitives (other values as type
+        names), so a finished span held in the ring or an export queue does
+        not keep the call arguments alive.
+        """
+        if self.raw_inputs is None:
+            return
+        names, args, kwargs = self.raw_inputs
+        self.raw_inputs = None
+        self.input_values = {
+            k: _truncate(v) if isinstance(v, (str, int, float, bool)) or v is None else type(v).__name__
+            for k, v in dict(zip(names, args), **kwargs).items()
+        }
+
+    def inputs(self) -> Dict[str, Any]:
+        """Call arguments by name; values other than str/number/bool as type names."""
+        self.resolve_inputs()
+        return self.input_values or {}
+
+    @property
+    def parent_id(self) -> Optional[int]:
+        return self.parent.span_id if self.parent is not None else None
+
+    @property
+    def duration_seconds(self) -> Optional[float]:
+        return (self.end_ns - self.start_ns) / 1e9 if self.end_ns is not None else None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def __repr__(self) -> str:
+        return f"Span({self.name!r}, {self.duration_seconds}s, error={self.error!r})"
+
+
+# current span, or _UNSAMPLED inside a trace the root decided not to record
+_UNSAMPLED = object()
+_current: ContextVar[Any] = ContextVar("current_span", default=None)
+
+
+class BatchQueue:
+    """
+    Bounded span queue for one exporter. Appends are a single deque operation
+    (atomic under the GIL, no lock on the request path). When full, spans are
+    dropped per `drop_policy` and counted in `dropped`.
+    """
+
+    def __init__(self, exporter, max_queue: int, drop_policy: str, batch_size: int):
+        if drop_policy not in ("drop_newest", "drop_oldest"):
+            raise ValueError(f"unknown drop policy {drop_policy!r}")
+        self.exporter = exporter
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.drop_policy = drop_policy
+        # drop_oldest: deque(maxlen) evicts from the left on append
+        self._queue: Deque[Span] = deque(maxlen=max_queue if drop_policy == "drop_oldest" else None)
+        self.enqueued = 0
+        self.dropped = 0
+        self.exported = 0
+        self.failed_batches = 0
+
+    def put(self, span: Span) -> None:
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            if self.drop_policy == "drop_newest":
+                return
+        self._queue.append(span)
+        self.enqueued += 1
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def drain(self) -> None:
+        """Export everything queued so far, batch_size spans per exporter call."""
+        while self._queue:
+            batch: List[Span] = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.popleft())
+            except IndexError:
+                pass
+            try:
+                self.exporter.export(batch)
+                self.exported += len(batch)
+            except Exception as e:  # an exporter must never take the agent down
+                self.failed_batches += 1
+                logger.warning("%s failed: %s", type(self.exporter).__name__, e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "exporter": type(self.exporter).__name__,
+            "queued": len(self._queue),
+            "enqueued": self.enqueued,
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "failed_batches": self.failed_batches,
+        }
+
+
+class Tracer:
+    def __init__(self, config: TracingConfig = DEFAULT_TRACING_CONFIG, exporters: Optional[List[Any]] = None):
+        self.config = config
+        self.enabled = config.enabled
+        self.sample_rate = config.sample_rate
+        self._ring: List[Optional[Span]] = [None] * config.ring_size
+        self._seq = itertools.count()  # next() is atomic under the GIL
+        self._finished = 0
+        self.queues = [
+            BatchQueue(e, config.max_queue, config.drop_policy, config.batch_size)
+            for e in (exporters if exporters is not None else _build_exporters(config))
+        ]
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if self.queues:
+            self._thread = threading.Thread(target=self._flush_loop, name="span-exporter", daemon=True)
+            self._thread.start()
+
+    # ---------- recording ----------
+
+    def start_span(
+        self, name: str, kind: str = "chain", attributes: Optional[Dict[str, Any]] = None
+    ) -> Tuple[Optional[Span], Optional[Token]]:
+        """
+        Open a span under the current one. Returns (span, token); span is None
+        when the trace is not sampled. Always pair with end_span(span, token).
+        """
+        parent = _current.get()
+        if parent is _UNSAMPLED:
+            return None, None
+        if parent is None and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return None, _current.set(_UNSAMPLED)
+        span = Span(name, kind, parent, attributes if attributes is not None else {})
+        return span, _current.set(span)
+
+    def end_span(self, span: Optional[Span], token: Optional[Token], error: Optional[BaseException] = None) -> None:
+        if token is not None:
+            _current.reset(token)
+        if span is not None:
+            if error is not None:
+                span.error = f"{type(error).__name__}: {error}"
+            self._finish(span)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "chain", **attributes: Any) -> Iterator[Optional[Span]]:
+        """Record the block as a span; yields None when disabled or not sampled."""
+        if not self.enabled:
+            yield None
+            return
+        span, token = self.start_span(name, kind, attributes)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, token, e)
+            raise
+        self.end_span(span, token)
+
+    def _finish(self, span: Span) -> None:
+        span.end_ns = time.time_ns()
+        span.resolve_inputs()
+        seq = next(self._seq)
+        self._ring[seq % len(self._ring)] = span
+        self._finished = seq + 1
+        for q in self.queues:
+            q.put(span)
+        if self.queues and len(self.queues[0]) >= self.config.batch_size:
+            self._wake.set()
+
+    def recent(self, n: Optional[int] = None) -> List[Span]:
+        """Most recently finished spans from the ring buffer, oldest first."""
+        size = len(self._ring)
+        end = self._finished
+        n = min(n or size, size, end)
+        spans = [self._ring[i % size] for i in range(end - n, end)]
+        return [s for s in spans if s is not None]
+
+    # ---------- exporting ----------
+
+    def _flush_loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.config.flush_interval_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        for q in self.queues:
+            q.drain()
+
+    def shutdown(self) -> None:
+        """Stop the flush thread, export what is queued and close exporters."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        for q in self.queues:
+            q.exporter.shutdown()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"finished": self._finished, "queues": [q.stats() for q in self.queues]}
+
+
+def _build_exporters(config: TracingConfig) -> List[Any]:
+    from observability.exporters import JsonlFileExporter, LangSmithExporter
+
+    builders = {
+        "jsonl": lambda: JsonlFileExporter(config.jsonl_path),
+        "langsmith": LangSmithExporter,
+    }
+    unknown = set(config.exporters) - set(builders)
+    if unknown:
+        raise ValueError(f"unknown span exporters: {sorted(unknown)}")
+    return [builders[name]() for name in config.exporters]
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def config_from_env(config: TracingConfig = DEFAULT_TRACING_CONFIG) -> TracingConfig:
+    """
+    GLASSMIND_TRACING=off disables tracing, GLASSMIND_TRACE_SAMPLE sets the
+    sample rate and GLASSMIND_SPAN_EXPORTERS (comma separated) the exporters.
+    With LangSmith tracing switched on in the environment, spans are also
+    forwarded there.
+    """
+    update: Dict[str, Any] = {}
+    if os.getenv("GLASSMIND_TRACING", "on").lower() in ("0", "off", "false"):
+        update["enabled"] = False
+    if os.getenv("GLASSMIND_TRACE_SAMPLE"):
+        update["sample_rate"] = float(os.environ["GLASSMIND_TRACE_SAMPLE"])
+    exporters = list(config.exporters)
+    if os.getenv("GLASSMIND_SPAN_EXPORTERS") is not None:
+        exporters = [e for e in os.environ["GLASSMIND_SPAN_EXPORTERS"].split(",") if e]
+    langsmith_on = any(
+        os.getenv(var, "").lower() == "true" for var in ("LANGSMITH_TRACING", "LANGCHAIN_TRACING_V2")
+    )
+    if langsmith_on and "langsmith" not in exporters:
+        exporters.append("langsmith")
+    update["exporters"] = exporters
+    return config.model_copy(update=update)
+
+
+def get_tracer() -> Tracer:
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer(config_from_env())
+                atexit.register(_tracer.shutdown)
+    return _tracer
+
+
+def set_tracer(tracer: Tracer) -> Optional[Tracer]:
+    """Install `tracer` as the process tracer; returns the previous one."""
+    global _tracer
+    with _tracer_lock:
+        previous, _tracer = _tracer, tracer
+    return previous
+
+
+def current_span() -> Optional[Span]:
+    span = _current.get()
+    return span if isinstance(span, Span) else None
+
+
+def _positional_names(fn: Callable) -> Tuple[str, ...]:
+    """
+    Names for positional arguments, read once from inspect.signature(), which
+    follows __wrapped__: a function already under @recorded or @cached gets its
+    own parameters, not the wrapper's (*args, **kwargs). Zipping the call's args
+    with these matches Signature.bind_partial at a tenth of the cost per span.
+    """
+    try:
+        params = list(inspect.signature(fn).parameters.values())
+    except (TypeError, ValueError):  # builtins without a signature: keyword arguments only
+        return ()
+    names = []
+    for p in params:
+        if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD):
+            names.append(p.name)
+        elif p.kind is p.VAR_POSITIONAL:
+            break
+    return tuple(names)
+
+
+def traced(name: Optional[str] = None, kind: str = "chain", capture_io: bool = True) -> Callable:
+    """
+    Decorator recording each call as a span. With capture_io the call
+    arguments and a string return value are kept on the span, truncated to
+    primitives when it ends; exporters turn them into attributes on the
+    background thread, off the request path.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or fn.__name__
+        arg_names = _positional_names(fn)
+
+        def _record_inputs(span: Optional[Span], args, kwargs) -> None:
+            if span is not None and capture_io:
+                span.raw_inputs = (arg_names, args, kwargs)
+
+        def _record_output(span: Optional[Span], result: Any) -> None:
+            if span is not None and capture_io and isinstance(result, str):
+                span.attributes["output"] = _truncate(result)
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                tracer = get_tracer()
+                if not tracer.enabled:
+                    return await fn(*args, **kwargs)
+                span, token = tracer.start_span(span_name, kind)
+                try:
+                    _record_inputs(span, args, kwargs)
+                    result = await fn(*args, **kwargs)
+                except BaseException as e:
+                    tracer.end_span(span, token, e)
+                    raise
+                _record_output(span, result)
+                tracer.end_span(span, token)
+                return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tracer = get_tracer()
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            span, token = tracer.start_span(span_name, kind)
+            try:
+                _record_inputs(span, args, kwargs)
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                tracer.end_span(span, token, e)
+                raise
+            _record_output(span, result)
+            tracer.end_span(span, token)
+            return result
+        return wrapper
+
+    return decorator
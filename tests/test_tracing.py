@@ -0,0 +1,30 @@
+import functools
+
+from backend.config import TracingConfig
+from observability.tracing import Tracer, set_tracer, traced
+
+
+def _passthrough(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def test_traced_records_positional_inputs_through_wrappers():
+    @traced("llm", kind="llm")
+    @_passthrough
+    def llm(prompt, model="m", use_cache=True):
+        return "answer"
+
+    tracer = Tracer(TracingConfig(exporters=[]), exporters=[])
+    previous = set_tracer(tracer)
+    try:
+        assert llm("hello", "gemini", use_cache=False) == "answer"
+    finally:
+        set_tracer(previous)
+
+    span = tracer.recent(1)[0]
+    assert span.raw_inputs is None
+    assert span.inputs() == {"prompt": "hello", "model": "gemini", "use_cache": False}
+    assert span.attributes["output"] == "answer"